@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import time
+
+import pyodbc
+from dotenv import load_dotenv
+
+from db_helpers import MAX_PARAMS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # export() refuses to run without it
+    pa = pq = None
+
+# Load environment variables
+load_dotenv()
+
+# Copies WalkHistory and WalkReflections into Parquet files so reports run
+# against local columnar files (analytics_query.py) instead of the live
+# database. Each table is read in keyset chunks on its identity key
+# (WHERE key > watermark ORDER BY key) and every chunk becomes one part file:
+#
+#   <root>/walks/part-<first key>-<last key>.parquet
+#   <root>/reflections/part-...parquet
+#   <root>/_state.json      {"walks": {"watermark": <last key>, ...}, ...}
+#
+# The watermark is saved after each part, so a run that stops halfway resumes
+# where it left off and a later run only copies rows added since. Rows are
+# only ever inserted into these tables; walks removed later by the retention
+# policy stay in the export.
+#
+# Identities are handed out at insert time but only become visible at commit,
+# so a slow walk_complete can commit a key below one that was already
+# exported. Every hole below the watermark is kept in the state as a gap
+# ([first, last, seen at]) and looked up again on the following runs; gaps
+# older than GAP_LOOKBACK_SECONDS are dropped (rolled-back inserts and
+# identity cache jumps leave holes that never fill).
+
+EXPORT_TABLES = {
+    "walks": {
+        "table": "WalkHistory",
+        "key": "WalkID",
+        "columns": {
+            "WalkID": "int32",
+            "UserID": "int32",
+            "WalkDate": "timestamp",
+            "DistanceKm": "float64",
+            "DurationMinutes": "int32",
+            "CaloriesBurned": "int32",
+            "PosesCompleted": "int32",
+            "StepsEstimated": "int32",
+        },
+    },
+    "reflections": {
+        "table": "WalkReflections",
+        "key": "ReflectionID",
+        "columns": {
+            "ReflectionID": "int32",
+            "WalkID": "int32",
+            "QuestionText": "string",
+            "AnswerText": "string",
+        },
+    },
+}
+
+DEFAULT_CHUNK_ROWS = 50000
+GAP_LOOKBACK_SECONDS = int(os.getenv("ANALYTICS_GAP_LOOKBACK_SECONDS", 3600))
+STATE_FILE = "_state.json"
+
+
+def default_export_path():
+    return os.getenv("ANALYTICS_EXPORT_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "exports"
+    )
+
+
+def _arrow_type(name):
+    return {
+        "int32": pa.int32(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("ms"),
+        "string": pa.string(),
+    }[name]
+
+
+def schema_for(spec):
+    return pa.schema([(column, _arrow_type(kind)) for column, kind in spec["columns"].items()])
+
+
+def load_state(root):
+    path = os.path.join(root, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(root, state):
+    path = os.path.join(root, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def write_part(out_dir, schema, rows):
+    """Writes key-ordered row tuples as one Parquet part. Returns (first key, last key)."""
+    # Row tuples -> one Python list per column, then one Arrow array each
+    data = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(data, schema)], schema=schema
+    )
+    first, last = data[0][0], data[0][-1]
+    # Written under a dot name first; readers skip hidden files, so a
+    # half-written part is never picked up
+    filename = f"part-{first:010d}-{last:010d}.parquet"
+    tmp = os.path.join(out_dir, "." + filename)
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, os.path.join(out_dir, filename))
+    return first, last
+
+
+def find_gaps(keys, after, seen_at):
+    """The runs of identities missing from sorted `keys` (all above `after`), as [first, last, seen_at]."""
+    gaps = []
+    previous = after
+    for key in keys:
+        if key > previous + 1:
+            gaps.append([previous + 1, key - 1, seen_at])
+        previous = key
+    return gaps
+
+
+def fill_gaps(cursor, spec, columns, gaps, now, lookback=GAP_LOOKBACK_SECONDS):
+    """
+    Looks the open gaps up again. Returns (rows that committed since, gaps
+    still open). Gaps older than `lookback` seconds are given up on.
+    """
+    gaps = [gap for gap in gaps if now - gap[2] <= lookback]
+    key = spec["key"]
+    found = []
+    per_query = (MAX_PARAMS - 1) // 2
+    for start in range(0, len(gaps), per_query):
+        chunk = gaps[start:start + per_query]
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM {spec['table']} "
+            f"WHERE {' OR '.join(f'{key} BETWEEN ? AND ?' for _ in chunk)} ORDER BY {key}",
+            *[bound for gap in chunk for bound in gap[:2]]
+        )
+        found.extend(cursor.fetchall())
+
+    still_open = []
+    keys = sorted(row[0] for row in found)
+    for first, last, seen_at in gaps:
+        inside = [k for k in keys if first <= k <= last]
+        still_open.extend([lo, hi, seen_at] for lo, hi, _ in find_gaps(inside + [last + 1], first - 1, seen_at))
+    return found, still_open
+
+
+def export_table(conn, root, name, chunk_rows=DEFAULT_CHUNK_ROWS, state=None):
+    """
+    Appends the rows of one EXPORT_TABLES entry above its watermark, plus
+    any that have since committed inside an open gap, as Parquet parts.
+    Returns (rows, parts) written.
+    """
+    spec = EXPORT_TABLES[name]
+    state = state if state is not None else load_state(root)
+    table_state = state.setdefault(name, {"watermark": 0, "rows": 0, "parts": 0})
+    table_state.setdefault("gaps", [])
+    out_dir = os.path.join(root, name)
+    os.makedirs(out_dir, exist_ok=True)
+    schema = schema_for(spec)
+    columns = list(spec["columns"])
+    cursor = conn.cursor()
+    rows_written = parts = 0
+
+    def record(rows, gaps):
+        nonlocal rows_written, parts
+        if rows:
+            write_part(out_dir, schema, rows)
+            table_state["rows"] += len(rows)
+            table_state["parts"] += 1
+            rows_written += len(rows)
+            parts += 1
+        table_state["gaps"] = gaps
+        table_state["exported_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        save_state(root, state)
+
+    # Late commits below the watermark first
+    if table_state["gaps"]:
+        late, still_open = fill_gaps(cursor, spec, columns, table_state["gaps"], int(time.time()))
+        record(late, still_open)
+
+    sql = (f"SELECT TOP (?) {', '.join(columns)} FROM {spec['table']} "
+           f"WHERE {spec['key']} > ? ORDER BY {spec['key']}")
+    while True:
+        cursor.execute(sql, chunk_rows, table_state["watermark"])
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        gaps = find_gaps([row[0] for row in rows], table_state["watermark"], int(time.time()))
+        table_state["watermark"] = rows[-1][0]
+        record(rows, table_state["gaps"] + gaps)
+        if len(rows) < chunk_rows:
+            break
+    return rows_written, parts
+
+
+def export(conn, root=None, tables=None, chunk_rows=DEFAULT_CHUNK_ROWS, full=False):
+    """Exports every table (or `tables`) incrementally. full=True starts over. Returns {name: (rows, parts)}."""
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the analytics export (pip install pyarrow)")
+    root = root or default_export_path()
+    os.makedirs(root, exist_ok=True)
+    state = load_state(root)
+    results = {}
+    for name in tables or EXPORT_TABLES:
+        if full:
+            state.pop(name, None)
+            table_dir = os.path.join(root, name)
+            if os.path.isdir(table_dir):
+                for part in os.listdir(table_dir):
+                    os.remove(os.path.join(table_dir, part))
+            save_state(root, state)
+        results[name] = export_table(conn, root, name, chunk_rows, state)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export walk history and reflections to Parquet")
+    parser.add_argument("--out", default=default_export_path(), help="export directory (ANALYTICS_EXPORT_PATH)")
+    parser.add_argument("--table", action="append", choices=list(EXPORT_TABLES), help="only this table")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--full", action="store_true", help="drop the existing export and start over")
+    args = parser.parse_args()
+
+    CONN_STR = (
+        r'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={os.getenv("DB_SERVER")};'
+        f'DATABASE={os.getenv("DB_DATABASE")};'
+        f'UID={os.getenv("DB_USER")};'
+        f'PWD={os.getenv("DB_PASSWORD")};'
+    )
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+        started = time.perf_counter()
+        for name, (rows, parts) in export(conn, args.out, args.table, args.chunk_rows, args.full).items():
+            print(f"✅ {name}: {rows} new row(s) in {parts} part(s)")
+        print(f"📦 Export in {args.out} ({time.perf_counter() - started:.1f}s)")
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
@@ -0,0 +1,152 @@
+import argparse
+import os
+
+import numpy as np
+
+from analytics_export import default_export_path
+
+try:
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # load_table() refuses to run without it
+    pc = pq = None
+
+# Reports over the Parquet export written by analytics_export.py. Everything
+# here reads local files only - the database is never queried - and each
+# aggregate runs over whole columns at once (NumPy / Arrow compute) rather
+# than row by row, so a few million walks take well under a second.
+
+WALK_COLUMNS = ["UserID", "WalkDate", "DistanceKm", "DurationMinutes", "CaloriesBurned", "StepsEstimated"]
+PERIODS = ("day", "week", "month")
+
+
+def load_table(root, name, columns=None):
+    """One exported table as an Arrow table, reading only `columns` from disk."""
+    if pq is None:
+        raise RuntimeError("pyarrow is required for analytics queries (pip install pyarrow)")
+    path = os.path.join(root, name)
+    if not os.path.isdir(path) or not any(f.endswith(".parquet") for f in os.listdir(path)):
+        raise FileNotFoundError(f"No {name} export in {root} - run analytics_export.py first")
+    return pq.read_table(path, columns=columns)
+
+
+def load_walks(root, user_id=None):
+    """
+    Walks as {column: numpy array}. Missing numbers become 0, walks without
+    a user get UserID 0 (as in walk_stats.py) and undated walks are dropped.
+    """
+    table = load_table(root, "walks", WALK_COLUMNS)
+    table = table.filter(pc.is_valid(table["WalkDate"]))
+    if user_id is not None:
+        table = table.filter(pc.equal(pc.fill_null(table["UserID"], 0), user_id))
+    walks = {column: table[column].fill_null(0).to_numpy() for column in WALK_COLUMNS if column != "WalkDate"}
+    walks["WalkDate"] = table["WalkDate"].to_numpy().astype("datetime64[ms]")
+    return walks
+
+
+def summary(walks):
+    distance = walks["DistanceKm"]
+    if not len(distance):
+        return {"walks": 0}
+    return {
+        "walks": len(distance),
+        "users": len(np.unique(walks["UserID"])),
+        "distance_km": round(float(distance.sum()), 2),
+        "mean_distance_km": round(float(distance.mean()), 2),
+        "median_distance_km": round(float(np.median(distance)), 2),
+        "p90_distance_km": round(float(np.percentile(distance, 90)), 2),
+        "duration_minutes": int(walks["DurationMinutes"].sum()),
+        "calories": int(walks["CaloriesBurned"].sum()),
+        "steps": int(walks["StepsEstimated"].sum()),
+        "first_walk": str(walks["WalkDate"].min().astype("datetime64[D]")),
+        "last_walk": str(walks["WalkDate"].max().astype("datetime64[D]")),
+    }
+
+
+def period_starts(dates, period):
+    """First day of the day / week (Monday) / month each datetime64 falls in."""
+    days = dates.astype("datetime64[D]")
+    if period == "day":
+        return days
+    if period == "week":
+        # 1970-01-01 was a Thursday: three days after a Monday
+        offset = (days.astype(np.int64) + 3) % 7
+        return days - offset.astype("timedelta64[D]")
+    if period == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+
+def by_period(walks, period="week"):
+    """Walks, distance and minutes per period, oldest first."""
+    starts, index = np.unique(period_starts(walks["WalkDate"], period), return_inverse=True)
+    count = np.bincount(index, minlength=len(starts))
+    distance = np.bincount(index, weights=walks["DistanceKm"], minlength=len(starts))
+    minutes = np.bincount(index, weights=walks["DurationMinutes"], minlength=len(starts))
+    # Distinct users per period: one int64 key per (period, user) pair
+    pairs = np.unique(index.astype(np.int64) << 32 | walks["UserID"].astype(np.int64))
+    users = np.bincount(pairs >> 32, minlength=len(starts))
+    return [
+        {"period_start": str(start), "walks": int(c), "users": int(u), "distance_km": round(float(d), 2),
+         "duration_minutes": int(m)}
+        for start, c, u, d, m in zip(starts, count, users, distance, minutes)
+    ]
+
+
+def by_hour(walks):
+    """Walks per hour of the day (0-23), by the server-local time in WalkDate."""
+    hours = (walks["WalkDate"].astype("datetime64[h]") - walks["WalkDate"].astype("datetime64[D]")).astype(np.int64)
+    return np.bincount(hours, minlength=24).tolist()
+
+
+def top_questions(root, limit=10):
+    """The most answered reflection questions with their mean answer length."""
+    table = load_table(root, "reflections", ["QuestionText", "AnswerText"])
+    table = table.filter(pc.is_valid(table["QuestionText"]))
+    lengths = pc.fill_null(pc.utf8_length(table["AnswerText"]), 0)
+    grouped = table.append_column("AnswerLength", lengths).group_by("QuestionText").aggregate(
+        [("AnswerLength", "count"), ("AnswerLength", "mean")]
+    )
+    grouped = grouped.sort_by([("AnswerLength_count", "descending")]).slice(0, limit)
+    return [
+        {"question": q, "answers": n, "mean_answer_chars": round(mean or 0, 1)}
+        for q, n, mean in zip(grouped["QuestionText"].to_pylist(), grouped["AnswerLength_count"].to_pylist(),
+                              grouped["AnswerLength_mean"].to_pylist())
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports over the Parquet analytics export")
+    parser.add_argument("report", choices=["summary", "periods", "hours", "questions"])
+    parser.add_argument("--root", default=default_export_path(), help="export directory (ANALYTICS_EXPORT_PATH)")
+    parser.add_argument("--user", type=int, help="only this user's walks (0 = walks without a user)")
+    parser.add_argument("--period", choices=PERIODS, default="week")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        if args.report == "questions":
+            print("\n--- 💬 TOP REFLECTION QUESTIONS ---")
+            for row in top_questions(args.root, args.limit):
+                print(f"{row['answers']:<8} | {row['mean_answer_chars']:<8} | {row['question']}")
+        else:
+            walks = load_walks(args.root, args.user)
+            if args.report == "summary":
+                print("\n--- 🚶 WALK SUMMARY ---")
+                for key, value in summary(walks).items():
+                    print(f"{key:<20} {value}")
+            elif args.report == "periods":
+                print(f"\n--- 📅 WALKS PER {args.period.upper()} ---")
+                print(f"{'Start':<12} | {'Walks':<7} | {'Users':<6} | {'Dist (km)':<10} | {'Mins'}")
+                print("-" * 55)
+                for row in by_period(walks, args.period):
+                    print(f"{row['period_start']:<12} | {row['walks']:<7} | {row['users']:<6} | "
+                          f"{row['distance_km']:<10} | {row['duration_minutes']}")
+            else:
+                print("\n--- 🕒 WALKS PER HOUR ---")
+                counts = by_hour(walks)
+                peak = max(counts) or 1
+                for hour, count in enumerate(counts):
+                    print(f"{hour:02d}:00 | {count:<7} | {'#' * round(40 * count / peak)}")
+    except Exception as e:
+        print(f"❌ Error: {e}")
@@ -1,21 +1,38 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 import pyodbc
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
 import json
 import os
+import random
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
+from db_pool import PoolExhausted, pool_from_env
+from db_helpers import MAX_PARAMS, bulk_insert, insert_returning
+from catalog_cache import CatalogCache, load_catalog
+from geo import place_checkpoints, route_coordinates, simplify
+from loop_planner import LoopPlanner
+import poi_service
+from push_dispatch import PushDispatcher, TokenBucket
+from push_subscriptions import parse_subscription, store_from_env
+from reminder_scheduler import ReminderScheduler
+from poi_index import PLACE_TYPES
+from retention import RetentionPolicy, apply_retention
+from routines import fetch_routines
+from route_store import (
+    ROUTE_LODS, decode_thumb, lod_polylines, pack_lods, pack_routes, route_summary, unpack_routes,
+)
+import walk_router
+from walk_router import NoRoute
+from walk_stats import read_stats, record_walk
+from walk_history import build_history_query, decode_cursor, encode_cursor, parse_fields, rows_to_json
 
 # Load environment variables from .env file
 load_dotenv()
 
-try:
-    from pywebpush import webpush, WebPushException
-except Exception as e:
-    print(f"\n❌ CRITICAL IMPORT ERROR: {e}\n")
-
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag", "X-Next-Cursor"])
 
 # --- DATABASE CONFIGURATION (SECURE) ---
 # Now reading from environment variables defined in .env
@@ -27,6 +44,9 @@ CONN_STR = (
     f'PWD={os.getenv("DB_PASSWORD")};'
 )
 
+# Shared connection pool - sized through DB_POOL_MIN / DB_POOL_MAX in .env
+DB_POOL = pool_from_env(CONN_STR)
+
 # --- NOTIFICATION CONFIGURATION ---
 # Public key is safe to keep in code
 VAPID_PUBLIC_KEY = "BAata_vEteQWcos37gHCP_Rf9NPLymVZSs2CwhcJQ9BPL6Aabgv7P1qTXia4Ti8eo3p0xgaGuUqcXWknTXNbJNc"
@@ -35,13 +55,34 @@ VAPID_PUBLIC_KEY = "BAata_vEteQWcos37gHCP_Rf9NPLymVZSs2CwhcJQ9BPL6Aabgv7P1qTXia4
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY")
 VAPID_CLAIMS = {"sub": os.getenv("VAPID_EMAIL")}
 
-# In-memory storage for subscriptions (Use a DB table in production)
-SUBSCRIPTIONS = []
+# Reminders go out on background workers - PUSH_WORKERS in .env, capped at
+# PUSH_RATE_PER_SEC sends per second (bursts of PUSH_BURST) when set
+PUSH_RATE = float(os.getenv("PUSH_RATE_PER_SEC", 0))
+PUSH = PushDispatcher(
+    VAPID_PRIVATE_KEY, VAPID_CLAIMS, workers=int(os.getenv("PUSH_WORKERS", 16)),
+    rate_limit=TokenBucket(PUSH_RATE, int(os.getenv("PUSH_BURST", 0)) or None) if PUSH_RATE > 0 else None,
+)
+
+REMINDER_MESSAGE = json.dumps({
+    "title": "Yoga Walk Time! 🌿",
+    "body": "The sun is out. Time to keep your streak alive!",
+    "url": "/"
+})
+
+# Push subscriptions - SQL Server, or a SQLite file at PUSH_STORE_PATH
+SUBSCRIPTIONS = store_from_env(DB_POOL)
+
+# Walk history retention - HISTORY_RETENTION_COUNT / _DAYS / _SCOPE in .env.
+# With HISTORY_RETENTION_MODE=background, run retention.py on a schedule instead.
+RETENTION_POLICY = RetentionPolicy.from_env()
+RETENTION_INLINE = os.getenv("HISTORY_RETENTION_MODE", "inline") != "background"
 
 def get_db():
     if 'db' not in g:
         try:
-            g.db = pyodbc.connect(CONN_STR)
+            g.db = DB_POOL.acquire()
+        except PoolExhausted:
+            raise
         except Exception as e:
             print(f"❌ Database Connection Error: {e}")
             return None
@@ -51,19 +92,50 @@ def get_db():
 def close_db(error):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        DB_POOL.release(db, discard=isinstance(error, pyodbc.Error))
+
+@app.errorhandler(PoolExhausted)
+def handle_pool_exhausted(error):
+    print(f"⏳ {error}")
+    response = jsonify({"error": "Database busy, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+def _load_catalog():
+    conn = get_db()
+    if not conn:
+        raise RuntimeError("Database not connected")
+    return load_catalog(conn.cursor())
+
+# Poses, themes and reflection questions only change when seed_mssql.py runs
+CATALOG = CatalogCache(_load_catalog, ttl=int(os.getenv("CATALOG_TTL", 3600)))
 
 # --- HELPER FUNCTIONS ---
-def generate_checkpoints(origin, destination, count):
-    checkpoints = []
-    for i in range(count):
-        checkpoints.append({
-            "id": i + 1,
-            "label": f"Checkpoint {i + 1}",
-            "lat": origin["lat"],
-            "lng": origin["lng"],
-        })
-    return checkpoints
+MAX_CHECKPOINTS = 50
+MAX_WELLNESS_RADIUS = 10000
+MAX_WELLNESS_LIMIT = 50
+WELLNESS_MAX_AGE = 300
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+MAX_SAVED_ROUTES_PAGE_SIZE = 200
+MAX_ROUTE_ALTERNATIVES = 3
+LOOP_DISTANCE_RANGE_M = (500, 20000)
+
+def generate_checkpoints(origin, destination, count, route=None, min_spacing_m=0.0, pois=None, snap_radius_m=150.0):
+    """
+    Spreads checkpoints evenly along the route geometry when one is given,
+    otherwise along the straight line from origin to destination.
+    """
+    if route:
+        coords = route_coordinates(route)
+    else:
+        coords = [(origin["lat"], origin["lng"]), (destination["lat"], destination["lng"])]
+
+    positions = place_checkpoints(coords, count, min_spacing_m, pois, snap_radius_m)
+    return [
+        {"id": i + 1, "label": f"Checkpoint {i + 1}", **position}
+        for i, position in enumerate(positions)
+    ]
 
 def parse_iso_datetime(value):
     if not value:
@@ -83,62 +155,74 @@ def parse_iso_datetime(value):
 
 @app.route("/api/poses", methods=["GET"])
 def get_all_poses():
-    conn = get_db()
-    if not conn: return jsonify({"error": "Database not connected"}), 500
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, instructions, benefits, animation_url, difficulty_tag FROM poses")
-        columns = [column[0] for column in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    catalog = CATALOG.get()
+    if not catalog: return jsonify({"error": "Database not connected"}), 500
+    return jsonify(catalog.poses)
 
 @app.route("/api/themes", methods=["GET"])
 def get_themes():
-    conn = get_db()
-    if not conn: return jsonify({"error": "Database not connected"}), 500
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT ThemeID, Title FROM WalkThemes")
-        themes = [{"id": row.ThemeID, "title": row.Title} for row in cursor.fetchall()]
-        return jsonify(themes)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    catalog = CATALOG.get()
+    if not catalog: return jsonify({"error": "Database not connected"}), 500
+    return jsonify(catalog.themes)
 
 @app.route("/api/theme/<int:theme_id>/questions", methods=["GET"])
 def get_theme_questions(theme_id):
-    conn = get_db()
-    try:
-        cursor = conn.cursor()
-        # UPDATED: Fetch all 3 parts of the question
-        query = "SELECT TOP 5 OriginalQuestion, FollowupQuestion1, FollowupQuestion2 FROM ReflectionQuestions WHERE ThemeID = ? ORDER BY NEWID()"
-        cursor.execute(query, theme_id)
-        
-        questions = []
-        for row in cursor.fetchall():
-            questions.append({
-                "q1": row.OriginalQuestion,
-                "q2": row.FollowupQuestion1,
-                "q3": row.FollowupQuestion2
-            })
-            
-        return jsonify(questions)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    catalog = CATALOG.get()
+    if not catalog: return jsonify({"error": "Database not connected"}), 500
+    # Fetch all 3 parts of 5 random questions, sampled in memory
+    return jsonify(catalog.sample_questions(theme_id, 5))
+
+@app.route("/api/catalog/refresh", methods=["POST"])
+def refresh_catalog():
+    """Drops the cached catalog so the next read reloads it (call after seeding)."""
+    CATALOG.invalidate()
+    return jsonify(CATALOG.info())
 
 @app.route("/api/journey", methods=["POST"])
 def create_journey():
     data = request.get_json()
     origin = data.get("origin")
     destination = data.get("destination")
-    checkpoint_count = data.get("checkpoint_count", 5)
+    difficulty = data.get("difficulty")
+    seed = data.get("seed")
 
     if not origin or not destination:
         return jsonify({"error": "origin and destination required"}), 400
+    if difficulty is not None and not isinstance(difficulty, str):
+        return jsonify({"error": "difficulty must be a string"}), 400
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+        return jsonify({"error": "seed must be an integer or a string"}), 400
+    try:
+        checkpoint_count = int(data.get("checkpoint_count", 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "checkpoint_count must be an integer"}), 400
+    if not 0 <= checkpoint_count <= MAX_CHECKPOINTS:
+        return jsonify({"error": f"checkpoint_count must be between 0 and {MAX_CHECKPOINTS}"}), 400
+
+    # Hand back the seed so the same journey can be requested again
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    # Without a route from the client, walk the local street graph if one is loaded
+    route = data.get("route")
+    routed = None
+    if route is None and walk_router.ROUTER is not None:
+        try:
+            routed = walk_router.ROUTER.route(origin, destination)[0]
+            route = routed["coords"]
+        except (NoRoute, KeyError, TypeError, ValueError):
+            pass  # Straight line, as before
 
-    checkpoints = generate_checkpoints(origin, destination, checkpoint_count)
-    conn = get_db()
+    try:
+        checkpoints = generate_checkpoints(
+            origin, destination, checkpoint_count,
+            route=route,
+            min_spacing_m=float(data.get("min_spacing_m") or 0),
+            pois=data.get("pois"),
+            snap_radius_m=float(data.get("snap_radius_m") or 150),
+        )
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        return jsonify({"error": f"Invalid route options: {e}"}), 400
     
     fallback_pose = {
         "name": "Deep Breathing", "duration": "1 min", "benefits": "Relaxes the mind.",
@@ -146,39 +230,32 @@ def create_journey():
         "gif": "https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjEx/placeholder.gif"
     }
 
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = f"SELECT TOP {checkpoint_count} name, benefits, instructions, animation_url, difficulty_tag FROM poses ORDER BY NEWID()"
-            cursor.execute(query)
-            columns = [column[0] for column in cursor.description]
-            random_poses = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-            for i, cp in enumerate(checkpoints):
-                if i < len(random_poses):
-                    pose = random_poses[i]
-                    cp["exercise"] = {
-                        "name": pose["name"],
-                        "duration": "30 sec", 
-                        "benefits": pose["benefits"], 
-                        "instructions": pose["instructions"],
-                        "gif": pose["animation_url"] or fallback_pose["gif"],
-                        "difficultyTag": pose.get("difficulty_tag") or None
-                    }
-                else:
-                    cp["exercise"] = fallback_pose
-        except Exception as e:
-            print(f"⚠️ Journey Warning: {e}")
-            for cp in checkpoints: cp["exercise"] = fallback_pose
-    else:
-        for cp in checkpoints: cp["exercise"] = fallback_pose
-
-    return jsonify({"route": [], "checkpoints": checkpoints})
+    # Poses come from the cached catalog - no database round-trip per journey
+    catalog = CATALOG.get()
+    random_poses = catalog.pose_sampler.sample(checkpoint_count, difficulty, seed) if catalog else []
+
+    for i, cp in enumerate(checkpoints):
+        if i < len(random_poses):
+            pose = random_poses[i]
+            cp["exercise"] = {
+                "name": pose["name"],
+                "duration": "30 sec", 
+                "benefits": pose["benefits"], 
+                "instructions": pose["instructions"],
+                "gif": pose["animation_url"] or fallback_pose["gif"],
+                "difficultyTag": pose.get("difficulty_tag") or None
+            }
+        else:
+            cp["exercise"] = fallback_pose
+
+    return jsonify({"route": routed["coords"] if routed else [], "checkpoints": checkpoints, "seed": seed})
 
 # --- WALK COMPLETE (Saves Reflections) ---
 @app.route("/api/walk_complete", methods=["POST"])
 def walk_complete():
     print("📥 Receiving Walk Data...") 
+    conn = get_db()
+    if not conn: return jsonify({"error": "Database not connected"}), 500
     try:
         data = request.get_json()
         
@@ -188,54 +265,27 @@ def walk_complete():
         steps_est = int(distance * 1250)
         calories_est = int(distance * 60)
         walk_date = datetime.now() # Explicitly capture time
+        user_id = int(data["user_id"]) if data.get("user_id") is not None else None
         
         reflections = data.get("reflections_data", [])
 
-        conn = get_db()
         cursor = conn.cursor()
         
-        # --- HISTORY RETENTION: Cap at 50 entries ---
-        # Check current count and remove oldest if at limit
-        cursor.execute("SELECT COUNT(*) FROM WalkHistory")
-        current_count = cursor.fetchone()[0]
-        
-        if current_count >= 50:
-            # Get IDs of oldest walks (ordered by WalkDate ASC) that need to be deleted
-            # We keep 49 so the new walk will be the 50th
-            excess_count = current_count - 49
-            cursor.execute("""
-                SELECT TOP (?) WalkID 
-                FROM WalkHistory 
-                ORDER BY WalkDate ASC
-            """, excess_count)
-            old_walk_ids = [row[0] for row in cursor.fetchall()]
-            
-            if old_walk_ids:
-                # Delete associated reflections first (foreign key constraint)
-                placeholders = ','.join(['?'] * len(old_walk_ids))
-                cursor.execute(f"""
-                    DELETE FROM WalkReflections 
-                    WHERE WalkID IN ({placeholders})
-                """, old_walk_ids)
-                
-                # Delete oldest walk history entries
-                cursor.execute(f"""
-                    DELETE FROM WalkHistory 
-                    WHERE WalkID IN ({placeholders})
-                """, old_walk_ids)
-                
-                print(f"🗑️  Removed {len(old_walk_ids)} oldest walk(s) to maintain 50-entry limit")
-        
-        SQL_INSERT = """
-            INSERT INTO WalkHistory 
-            (DistanceKm, DurationMinutes, CaloriesBurned, PosesCompleted, StepsEstimated, Notes, WalkDate)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(SQL_INSERT, distance, duration_min, calories_est, poses_done, steps_est, 'Yoga Walk Session', walk_date)
-        
-        cursor.execute("SELECT @@IDENTITY")
-        row = cursor.fetchone()
-        walk_id = row[0] if row else 0
+        walk_id = insert_returning(
+            cursor, "WalkHistory",
+            ["UserID", "DistanceKm", "DurationMinutes", "CaloriesBurned", "PosesCompleted", "StepsEstimated", "Notes", "WalkDate"],
+            [user_id, distance, duration_min, calories_est, poses_done, steps_est, 'Yoga Walk Session', walk_date],
+            returning="WalkID",
+        ) or 0
+
+        # --- STATS ROLLUPS (same transaction, so they never drift from history) ---
+        record_walk(cursor, user_id, walk_date, distance, duration_min, calories_est, poses_done, steps_est)
+
+        # --- HISTORY RETENTION (one set-based batch, same transaction) ---
+        if RETENTION_INLINE:
+            removed = apply_retention(cursor, RETENTION_POLICY, user_id=user_id)
+            if removed:
+                print(f"🗑️  Removed {removed} walk(s) outside the retention policy")
 
         if reflections and walk_id:
             print(f"   📝 Saving {len(reflections)} reflections...")
@@ -246,11 +296,7 @@ def walk_complete():
                 if a_text: 
                     reflection_rows.append((walk_id, q_text, a_text))
             
-            if reflection_rows:
-                cursor.executemany("""
-                    INSERT INTO WalkReflections (WalkID, QuestionText, AnswerText)
-                    VALUES (?, ?, ?)
-                """, reflection_rows)
+            bulk_insert(cursor, "WalkReflections", ["WalkID", "QuestionText", "AnswerText"], reflection_rows)
 
         conn.commit()
         print(f"✅ Walk Saved Successfully! ID: {walk_id}")
@@ -278,24 +324,59 @@ def get_walk_reflections(walk_id):
 
 @app.route("/api/walk_history", methods=["GET"])
 def get_walk_history():
+    """
+    Walks newest first, one page at a time.
+    ?limit=<page size>&cursor=<next_cursor from the previous page>
+    &since=<ISO date: only walks after it>&fields=<comma-separated columns>
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+        fields = parse_fields(request.args.get("fields"))
+        cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    since = parse_iso_datetime(request.args.get("since"))
+    if request.args.get("since") and not since:
+        return jsonify({"error": "since must be an ISO date"}), 400
+
     conn = get_db()
     if not conn: return jsonify({"error": "Database not connected"}), 500
     try:
-        cursor = conn.cursor()
-        query = """
-            SELECT WalkID, WalkDate, DistanceKm, DurationMinutes, 
-                   CaloriesBurned, PosesCompleted, StepsEstimated 
-            FROM WalkHistory 
-            ORDER BY WalkDate DESC
-        """
-        cursor.execute(query)
-        columns = [column[0] for column in cursor.description]
-        history = []
-        for row in cursor.fetchall():
-            record = dict(zip(columns, row))
-            if record['WalkDate']: record['WalkDate'] = record['WalkDate'].isoformat()
-            history.append(record)
-        return jsonify({"count": len(history), "history": history})
+        cursor_db = conn.cursor()
+        sql, params = build_history_query(fields, limit, cursor, since)
+        cursor_db.execute(sql, *params)
+        rows = cursor_db.fetchmany(limit + 1)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.WalkDate, last.WalkID)
+
+        body = '{"count":%d,"history":%s,"next_cursor":%s}' % (
+            len(rows), rows_to_json(rows, fields), json.dumps(next_cursor)
+        )
+        return app.response_class(body, mimetype="application/json")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/stats", methods=["GET"])
+def get_walk_stats():
+    """
+    Lifetime totals, current / best streak and weekly totals from the rollup
+    tables - constant work however long the history is.
+    ?user_id=<id, omit for walks logged without a user>&weeks=<1-104, default 12>
+    """
+    try:
+        user_id = int(request.args["user_id"]) if request.args.get("user_id") else None
+        weeks = min(max(int(request.args.get("weeks", 12)), 1), 104)
+    except ValueError:
+        return jsonify({"error": "user_id and weeks must be integers"}), 400
+
+    conn = get_db()
+    if not conn: return jsonify({"error": "Database not connected"}), 500
+    try:
+        return jsonify(read_stats(conn.cursor(), user_id, weeks))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -325,7 +406,12 @@ def create_saved_route():
         return jsonify({"error": "Destination lat/lng required"}), 400
 
     created_at = parse_iso_datetime(created_at_raw) or datetime.utcnow()
-    routes_json = json.dumps(routes)
+    try:
+        routes_packed, steps_packed = pack_routes(routes)
+        lods_packed, thumb_polyline = pack_lods(routes, int(active_route_index))
+        route_count, distance_m = route_summary(routes, int(active_route_index))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return jsonify({"error": "Invalid routes"}), 400
 
     conn = get_db()
     if not conn:
@@ -333,28 +419,31 @@ def create_saved_route():
 
     try:
         cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO saved_routes
-            (name, note, destination_lat, destination_lng, destination_label, routes_json, active_route_index, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            name,
-            note,
-            float(destination["lat"]),
-            float(destination["lng"]),
-            destination_label,
-            routes_json,
-            int(active_route_index),
-            created_at,
+        new_id = insert_returning(
+            cursor, "saved_routes",
+            ["name", "note", "destination_lat", "destination_lng", "destination_label",
+             "routes_packed", "steps_packed", "lods_packed", "thumb_polyline",
+             "route_count", "distance_m", "active_route_index", "created_at"],
+            [
+                name,
+                note,
+                float(destination["lat"]),
+                float(destination["lng"]),
+                destination_label,
+                routes_packed,
+                steps_packed,
+                lods_packed,
+                thumb_polyline,
+                route_count,
+                distance_m,
+                int(active_route_index),
+                created_at,
+            ],
+            returning="id",
         )
-        print("[SavedRoutes Debug] create_saved_route insert executed")
-        cursor.execute("SELECT @@IDENTITY")
-        row = cursor.fetchone()
         conn.commit()
-        print("[SavedRoutes Debug] create_saved_route committed", {"id": int(row[0]) if row else None})
-
-        saved_id = int(row[0]) if row else None
+        saved_id = int(new_id) if new_id is not None else None
+        print("[SavedRoutes Debug] create_saved_route committed", {"id": saved_id})
         return jsonify({
             "id": saved_id,
             "name": name,
@@ -370,38 +459,153 @@ def create_saved_route():
             conn.rollback()
         return jsonify({"error": str(e)}), 500
 
+def saved_route_summary(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "note": row.note,
+        "destination": {"lat": row.destination_lat, "lng": row.destination_lng},
+        "destinationLabel": row.destination_label,
+        "routeCount": row.route_count,
+        "distance": row.distance_m,
+        "activeRouteIndex": row.active_route_index,
+        "createdAt": row.created_at.isoformat() if row.created_at else None
+    }
+
+SAVED_ROUTE_SUMMARY_COLUMNS = """
+    id, name, note, destination_lat, destination_lng, destination_label,
+    route_count, distance_m, active_route_index, created_at
+"""
+
 @app.route("/api/saved_routes", methods=["GET"])
 def get_saved_routes():
+    """
+    Summary metadata for saved routes, newest first. Geometry is never read
+    here - fetch /api/saved_routes/<id> for the routes themselves.
+    ?limit=<page size>&cursor=<X-Next-Cursor from the previous page>
+    &lod=thumb (adds a few-dozen-point "thumbnail" of the active route)
+
+    The ETag comes from the table's row count and newest id / created_at, so
+    a client that already has the list gets a 304 before any row is read.
+    """
+    lod = request.args.get("lod")
+    if lod not in (None, "thumb"):
+        return jsonify({"error": "The list only serves lod=thumb"}), 400
+    try:
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+        if limit is not None:
+            limit = min(max(limit, 1), MAX_SAVED_ROUTES_PAGE_SIZE)
+        page_cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     conn = get_db()
     if not conn:
         return jsonify({"error": "Database not connected"}), 500
 
     try:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, name, note, destination_lat, destination_lng, destination_label, routes_json, active_route_index, created_at
+        cursor.execute("SELECT COUNT(*), MAX(id), MAX(created_at) FROM saved_routes")
+        count, newest_id, newest_at = cursor.fetchone()
+        version = f"{count}:{newest_id}:{newest_at.isoformat() if newest_at else ''}"
+        etag = hashlib.sha1(f"{version}|{lod}|{limit}|{request.args.get('cursor')}".encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        where, params = "", []
+        if page_cursor:
+            created_at, last_id = page_cursor
+            where = "WHERE created_at < ? OR (created_at = ? AND id < ?)"
+            params = [created_at, created_at, last_id]
+        top = "TOP (?)" if limit else ""
+        thumb_column = ", thumb_polyline" if lod else ""
+        cursor.execute(f"""
+            SELECT {top} {SAVED_ROUTE_SUMMARY_COLUMNS}{thumb_column}
             FROM saved_routes
-            ORDER BY created_at DESC
-        """)
-        routes = []
+            {where}
+            ORDER BY created_at DESC, id DESC
+        """, *([limit + 1] if limit else []), *params)
         rows = cursor.fetchall()
         print("[SavedRoutes Debug] get_saved_routes row count", len(rows))
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        routes = []
         for row in rows:
-            routes.append({
-                "id": row.id,
-                "name": row.name,
-                "note": row.note,
-                "destination": {"lat": row.destination_lat, "lng": row.destination_lng},
-                "destinationLabel": row.destination_label,
-                "routes": json.loads(row.routes_json) if row.routes_json else [],
-                "activeRouteIndex": row.active_route_index,
-                "createdAt": row.created_at.isoformat() if row.created_at else None
-            })
-        return jsonify(routes)
+            saved = saved_route_summary(row)
+            if lod:
+                saved["thumbnail"] = decode_thumb(row.thumb_polyline)
+            routes.append(saved)
+
+        response = jsonify(routes)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
     except Exception as e:
         print("[SavedRoutes Debug] get_saved_routes error", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/saved_routes/<int:saved_id>", methods=["GET"])
+def get_saved_route(saved_id):
+    """
+    One saved route with its geometry decoded. steps=0 leaves out the
+    turn-by-turn steps (their column is then not read at all), and
+    lod=high|medium|low|thumb serves a precomputed simplified tier instead
+    of every vertex.
+    """
+    include_steps = request.args.get("steps", "1") != "0"
+    lod = request.args.get("lod")
+    if lod is not None and lod not in ROUTE_LODS:
+        return jsonify({"error": f"lod must be one of: {', '.join(ROUTE_LODS)}"}), 400
+
+    conn = get_db()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cursor = conn.cursor()
+        steps_column = "steps_packed" if include_steps else "NULL AS steps_packed"
+        lods_column = "lods_packed" if lod else "NULL AS lods_packed"
+        cursor.execute(f"""
+            SELECT {SAVED_ROUTE_SUMMARY_COLUMNS}, routes_packed, {steps_column}, {lods_column}, routes_json
+            FROM saved_routes
+            WHERE id = ?
+        """, saved_id)
+        row = cursor.fetchone()
+        if not row:
+            return jsonify({"error": "Saved route not found"}), 404
+
+        saved = saved_route_summary(row)
+        polylines = lod_polylines(row.lods_packed, lod) if lod else None
+        if row.routes_packed is not None:
+            routes = unpack_routes(row.routes_packed, row.steps_packed, polylines)
+        else:
+            # Saved before the compact format and not migrated yet
+            routes = json.loads(row.routes_json) if row.routes_json else []
+            if not include_steps:
+                for route in routes:
+                    route.pop("steps", None)
+        if lod and polylines is None:
+            # No stored tiers for this row yet - simplify on the fly
+            tolerance_m, max_points = ROUTE_LODS[lod]
+            for route in routes:
+                if route.get("coords"):
+                    simplified = simplify(route_coordinates(route["coords"]), tolerance_m, max_points)
+                    route["coords"] = [{"lat": float(lat), "lng": float(lng)} for lat, lng in simplified]
+        saved["routes"] = routes
+        saved["lod"] = lod or "full"
+        return jsonify(saved)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/saved_routes/<int:saved_id>", methods=["DELETE"])
 def delete_saved_route(saved_id):
     conn = get_db()
@@ -423,57 +627,7 @@ def get_routines():
     conn = get_db()
     if not conn: return jsonify({"error": "Database not connected"}), 500
     try:
-        cursor = conn.cursor()
-        
-        # 1. Fetch all Routines
-        cursor.execute("SELECT RoutineID, Name, Description, Duration, CoverImage FROM Routines ORDER BY CreatedAt DESC")
-        routines_db = cursor.fetchall()
-        
-        routines_list = []
-        
-        for r in routines_db:
-            routine_id = r.RoutineID
-            
-            # 2. UPDATED QUERY: Left Join to fetch Benefits, Instructions, Animation, and Difficulty
-            cursor.execute("""
-                SELECT 
-                    rp.PoseID, 
-                    rp.PoseName, 
-                    rp.Duration, 
-                    p.benefits, 
-                    p.instructions, 
-                    p.animation_url,
-                    p.difficulty_tag
-                FROM RoutinePoses rp
-                LEFT JOIN poses p ON rp.PoseID = p.id
-                WHERE rp.RoutineID = ? 
-                ORDER BY rp.OrderIndex ASC
-            """, routine_id)
-            
-            poses_data = []
-            for p in cursor.fetchall():
-                poses_data.append({
-                    "id": p.PoseID,
-                    "name": p.PoseName,
-                    "duration": p.Duration,
-                    "benefits": p.benefits if p.benefits else "Benefits unavailable for this custom pose.",
-                    "instructions": p.instructions if p.instructions else "Follow the audio cues.",
-                    "gif": p.animation_url if p.animation_url else "",
-                    "difficultyTag": p.difficulty_tag if p.difficulty_tag else None
-                })
-
-            routines_list.append({
-                "id": routine_id,
-                "title": r.Name,
-                "description": r.Description or "Custom Routine",
-                "duration": r.Duration or "5 min",
-                "coverImage": r.CoverImage,
-                "poses": poses_data,
-                "poseCount": len(poses_data),
-                "isCustom": True
-            })
-            
-        return jsonify(routines_list)
+        return jsonify(fetch_routines(conn.cursor()))
     except Exception as e:
         print(f"Error fetching routines: {e}")
         return jsonify({"error": str(e)}), 500
@@ -494,26 +648,25 @@ def create_routine():
     try:
         cursor = conn.cursor()
         
-        # 1. Insert the Main Routine
-        cursor.execute("""
-            INSERT INTO Routines (Name, Description, Duration, CoverImage) 
-            VALUES (?, ?, ?, ?)
-        """, name, desc, duration, cover_image)
-        
-        # 2. Get the new Routine ID
-        cursor.execute("SELECT @@IDENTITY")
-        row = cursor.fetchone()
-        if not row:
+        # 1. Insert the Main Routine and get its new ID in the same round-trip
+        new_id = insert_returning(
+            cursor, "Routines",
+            ["Name", "Description", "Duration", "CoverImage"],
+            [name, desc, duration, cover_image],
+            returning="RoutineID",
+        )
+        if new_id is None:
              return jsonify({"error": "Failed to retrieve new ID"}), 500
-        routine_id = int(row[0])
-
-        # 3. Insert all the Poses for this routine
-        for index, pose in enumerate(poses):
-            cursor.execute("""
-                INSERT INTO RoutinePoses (RoutineID, PoseID, PoseName, Duration, OrderIndex)
-                VALUES (?, ?, ?, ?, ?)
-            """, routine_id, pose.get('id'), pose.get('name'), pose.get('duration'), index)
-            
+        routine_id = int(new_id)
+
+        # 2. Insert all the Poses for this routine in one batch
+        bulk_insert(
+            cursor, "RoutinePoses",
+            ["RoutineID", "PoseID", "PoseName", "Duration", "OrderIndex"],
+            [(routine_id, pose.get('id'), pose.get('name'), pose.get('duration'), index)
+             for index, pose in enumerate(poses)],
+        )
+
         conn.commit()
         return jsonify({"message": "Routine created", "id": routine_id}), 201
     except Exception as e:
@@ -533,43 +686,270 @@ def delete_routine(id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- LOCAL ROUTING ---
+
+# Loop walks steer past wellness spots already in the POI index (no Overpass
+# call on the request path)
+LOOP_PLANNER = LoopPlanner(walk_router.ROUTER, poi_service.indexed_pois) if walk_router.ROUTER else None
+
+def parse_point(raw):
+    """"lat,lng" -> {"lat", "lng"}. Raises ValueError."""
+    lat, lng = (float(part) for part in raw.split(","))
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("lat/lng out of range")
+    return {"lat": lat, "lng": lng}
+
+@app.route("/api/route", methods=["GET"])
+def get_route():
+    """
+    Foot routes over the local walk graph, shortest first, in the same shape
+    MapPage builds from OSRM. ?origin=lat,lng&destination=lat,lng&alternatives=0-3
+    """
+    if walk_router.ROUTER is None:
+        return jsonify({"error": "Local routing is not configured (WALK_GRAPH_PATH)"}), 503
+    try:
+        origin = parse_point(request.args["origin"])
+        destination = parse_point(request.args["destination"])
+        alternatives = min(max(int(request.args.get("alternatives", 0)), 0), MAX_ROUTE_ALTERNATIVES)
+    except (KeyError, ValueError):
+        return jsonify({"error": "origin and destination required as lat,lng; alternatives must be an integer"}), 400
+
+    try:
+        return jsonify({"routes": walk_router.ROUTER.route(origin, destination, alternatives)})
+    except NoRoute as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route("/api/route/loop", methods=["GET"])
+def get_loop_route():
+    """
+    Walks that start and end at one point and are about `distance` meters
+    long, best first, each listing the wellness spots it passes ("pois").
+    ?origin=lat,lng&distance=3000&alternatives=0-3&types=Water,Nature
+    """
+    if LOOP_PLANNER is None:
+        return jsonify({"error": "Local routing is not configured (WALK_GRAPH_PATH)"}), 503
+    try:
+        origin = parse_point(request.args["origin"])
+        distance = float(request.args["distance"])
+        alternatives = min(max(int(request.args.get("alternatives", 0)), 0), MAX_ROUTE_ALTERNATIVES)
+    except (KeyError, ValueError):
+        return jsonify({"error": "origin (lat,lng) and distance required; alternatives must be an integer"}), 400
+    low, high = LOOP_DISTANCE_RANGE_M
+    if not low <= distance <= high:
+        return jsonify({"error": f"distance must be between {low} and {high} meters"}), 400
+
+    types = [t.strip().title() for t in request.args.get("types", "").split(",") if t.strip()]
+    unknown = [t for t in types if t not in PLACE_TYPES]
+    if unknown:
+        return jsonify({"error": f"Unknown types: {', '.join(unknown)}"}), 400
+
+    try:
+        routes = LOOP_PLANNER.loops(origin, distance, alternatives, types or None)
+    except NoRoute as e:
+        return jsonify({"error": str(e)}), 404
+    if not routes:
+        return jsonify({"error": "No loop of that length from here"}), 404
+    return jsonify({"routes": routes})
+
+# --- WELLNESS SPOTS ---
+
+@app.route("/api/wellness_spots", methods=["GET"])
+def get_wellness_spots():
+    """
+    Named Water / Viewpoint / Nature spots around a point, nearest first.
+    ?lat=&lon=&radius=<m>&types=Water,Nature&limit=&stream=1
+    With stream=1 the answer is NDJSON, one place per line, sent as each map tile resolves.
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius = int(request.args.get("radius", 3000))
+        limit = int(request.args.get("limit", 10))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon required; radius and limit must be integers"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat/lon out of range"}), 400
+    radius = min(max(radius, 100), MAX_WELLNESS_RADIUS)
+    limit = min(max(limit, 1), MAX_WELLNESS_LIMIT)
+
+    types = [t.strip().title() for t in request.args.get("types", "").split(",") if t.strip()]
+    unknown = [t for t in types if t not in PLACE_TYPES]
+    if unknown:
+        return jsonify({"error": f"Unknown types: {', '.join(unknown)}"}), 400
+
+    if request.args.get("stream") in ("1", "true"):
+        def generate():
+            for place in poi_service.stream_wellness_locations(lat, lon, radius, limit, types):
+                yield json.dumps(place) + "\n"
+        response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    places = poi_service.get_wellness_locations(lat, lon, radius, limit, types)
+    if places is None:
+        # Overpass is down or the circuit is open - don't let anyone cache "no spots here"
+        response = jsonify({"error": "Wellness spots are temporarily unavailable"})
+        response.headers["Cache-Control"] = "no-store"
+        response.headers["Retry-After"] = str(int(poi_service.OVERPASS.breaker.reset_after))
+        return response, 503
+
+    response = jsonify(places)
+    response.headers["Cache-Control"] = f"public, max-age={WELLNESS_MAX_AGE}"
+    response.add_etag()
+    return response.make_conditional(request)
+
+# --- DIAGNOSTICS ---
+
+@app.route("/api/db/pool", methods=["GET"])
+def get_pool_stats():
+    """Connection pool counters, used to size DB_POOL_MIN / DB_POOL_MAX."""
+    return jsonify(DB_POOL.stats())
+
+@app.route("/api/poi/stats", methods=["GET"])
+def get_poi_stats():
+    """Overpass client, tile cache and POI index counters."""
+    return jsonify({
+        "overpass": poi_service.OVERPASS.stats(),
+        "tile_cache": poi_service.TILE_CACHE.stats(),
+        "indexed_pois": len(poi_service.POI_INDEX),
+    })
+
+@app.route("/api/route/stats", methods=["GET"])
+def get_route_stats():
+    """Walk graph size, route cache and loop planner counters."""
+    if walk_router.ROUTER is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **walk_router.ROUTER.stats(), "loops": LOOP_PLANNER.stats()})
+
 # --- NEW NOTIFICATION ROUTES ---
 
 @app.route("/api/subscribe", methods=["POST"])
 def subscribe():
-    """Saves a user's push notification subscription."""
-    subscription_info = request.json
-    # In a real app, save this to a database linked to the UserID
-    if subscription_info and subscription_info not in SUBSCRIPTIONS:
-        SUBSCRIPTIONS.append(subscription_info)
-        print(f"✅ New subscriber! Total: {len(SUBSCRIPTIONS)}")
-    return jsonify({"success": True}), 201
+    """
+    Saves a user's push notification subscription (once per endpoint). Besides
+    the browser's PushSubscription fields the body may carry "timezone" (IANA
+    name) and "user_id", which reminders are targeted by.
+    """
+    data = request.get_json(silent=True)
+    try:
+        subscription = parse_subscription(data)
+        timezone = data.get("timezone") or None
+        if timezone is not None:
+            ZoneInfo(timezone)
+        user_id = int(data["user_id"]) if data.get("user_id") is not None else None
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({"error": f"Invalid subscription: {e}"}), 400
+
+    try:
+        if SUBSCRIPTIONS.upsert(subscription, user_id=user_id, timezone=timezone):
+            print(f"✅ New subscriber! ({timezone or 'no timezone'})")
+        return jsonify({"success": True}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def prune_subscriptions(endpoints):
+    """Drops subscriptions the push service reported gone. Runs on a push job thread."""
+    SUBSCRIPTIONS.delete(endpoints)
+    print(f"🗑️ Pruned {len(endpoints)} expired subscription(s)")
+
+def walked_since(user_ids, since):
+    """The users among `user_ids` with a WalkHistory entry at or after `since` (an aware datetime)."""
+    # WalkDate holds the server's local time
+    since = since.astimezone().replace(tzinfo=None)
+    user_ids = list(user_ids)
+    walked = set()
+    conn = DB_POOL.acquire()
+    try:
+        cursor = conn.cursor()
+        chunk_size = MAX_PARAMS - 100
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            cursor.execute(f"""
+                SELECT DISTINCT UserID FROM WalkHistory
+                WHERE UserID IN ({', '.join('?' * len(chunk))}) AND WalkDate >= ?
+            """, *chunk, since)
+            walked.update(row[0] for row in cursor.fetchall())
+    finally:
+        DB_POOL.release(conn)
+    return walked
+
+# Daily reminder at each subscriber's local REMINDER_LOCAL_TIME, spread over
+# REMINDER_WINDOW_MINUTES. Set REMINDER_SCHEDULER=1 on exactly one process
+# (not on every Gunicorn worker) to run it.
+SCHEDULER = ReminderScheduler(
+    SUBSCRIPTIONS, PUSH, REMINDER_MESSAGE, walked_since,
+    local_time=os.getenv("REMINDER_LOCAL_TIME", "18:00"),
+    window_minutes=int(os.getenv("REMINDER_WINDOW_MINUTES", 60)),
+    tick=int(os.getenv("REMINDER_TICK_SECONDS", 30)),
+    on_gone=prune_subscriptions,
+)
+if os.getenv("REMINDER_SCHEDULER") in ("1", "true"):
+    SCHEDULER.start()
+
+def parse_segment(data):
+    """
+    Reminder targeting from a JSON body: user_ids, timezones,
+    active_within_days, inactive_for_days. Raises ValueError.
+    """
+    now = datetime.now()
+    segment = {}
+    if data.get("user_ids"):
+        segment["user_ids"] = [int(user_id) for user_id in data["user_ids"]]
+    if data.get("timezones"):
+        segment["timezones"] = [str(tz) for tz in data["timezones"]]
+    if data.get("active_within_days") is not None:
+        segment["active_since"] = now - timedelta(days=float(data["active_within_days"]))
+    if data.get("inactive_for_days") is not None:
+        segment["inactive_since"] = now - timedelta(days=float(data["inactive_for_days"]))
+    return segment
 
 @app.route("/api/trigger_reminders", methods=["POST"])
 def trigger_reminders():
-    """Manually trigger daily reminders."""
-    message = json.dumps({
-        "title": "Yoga Walk Time! 🌿",
-        "body": "The sun is out. Time to keep your streak alive!",
-        "url": "/"
-    })
+    """
+    Queues the daily reminder and returns the job ID at once. Everyone gets
+    it unless the JSON body narrows the segment (see parse_segment).
+    """
+    try:
+        segment = parse_segment(request.get_json(silent=True) or {})
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid segment: {e}"}), 400
+    try:
+        subscriptions = SUBSCRIPTIONS.segment(**segment)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid segment: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-    print(f"🔔 Sending reminders to {len(SUBSCRIPTIONS)} devices...")
-    
-    success_count = 0
-    for sub in SUBSCRIPTIONS:
-        try:
-            webpush(
-                subscription_info=sub,
-                data=message,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims=VAPID_CLAIMS
-            )
-            success_count += 1
-        except WebPushException as ex:
-            print(f"❌ Push failed: {ex}")
-            
-    return jsonify({"message": f"Reminders sent to {success_count} devices."})
+    print(f"🔔 Sending reminders to {len(subscriptions)} devices...")
+    try:
+        job_id = PUSH.submit(subscriptions, REMINDER_MESSAGE, on_gone=prune_subscriptions)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(PUSH.job(job_id)), 202
+
+@app.route("/api/push_jobs/<job_id>", methods=["GET"])
+def get_push_job(job_id):
+    """Progress of a reminder job: devices, sent, failed, gone (pruned) and status."""
+    job = PUSH.job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route("/api/reminders/stats", methods=["GET"])
+def get_reminder_stats():
+    """Scheduled reminder batches, newest first: size, skips, lag and throughput."""
+    return jsonify(SCHEDULER.stats())
+
+@app.route("/api/push/stats", methods=["GET"])
+def get_push_stats():
+    """Push dispatcher counters across all jobs, and subscribers per timezone."""
+    try:
+        timezones = SUBSCRIPTIONS.timezones()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({**PUSH.stats(), "subscribers": sum(timezones.values()),
+                    "timezones": {tz or "unknown": count for tz, count in timezones.items()}})
 
 if __name__ == "__main__":
+    DB_POOL.prefill()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
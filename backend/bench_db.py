@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+
+import pyodbc
+from dotenv import load_dotenv
+
+from db_helpers import bulk_insert, insert_many_returning, insert_returning
+from routines import fetch_routines
+
+# Load environment variables
+load_dotenv()
+
+# Benchmarks that run against the database configured in .env.
+# Everything seeded here happens inside one transaction that is rolled back
+# at the end, so the tables are left untouched.
+#
+# Usage: python bench_db.py [routines]
+#
+# Exits non-zero if GET /api/routines needs more queries as the library grows.
+
+CONN_STR = (
+    r'DRIVER={ODBC Driver 17 for SQL Server};'
+    f'SERVER={os.getenv("DB_SERVER")};'
+    f'DATABASE={os.getenv("DB_DATABASE")};'
+    f'UID={os.getenv("DB_USER")};'
+    f'PWD={os.getenv("DB_PASSWORD")};'
+)
+
+POSE_COLUMNS = ["RoutineID", "PoseID", "PoseName", "Duration", "OrderIndex"]
+
+
+class CountingCursor:
+    """
+    Wraps a pyodbc cursor and counts statements and server round-trips.
+    Without fast_executemany, pyodbc sends executemany() one row at a time.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = 0
+        self.round_trips = 0
+
+    def execute(self, *args):
+        self.statements += 1
+        self.round_trips += 1
+        return self._cursor.execute(*args)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self.statements += 1
+        self.round_trips += 1 if self._cursor.fast_executemany else len(rows)
+        return self._cursor.executemany(sql, rows)
+
+    @property
+    def fast_executemany(self):
+        return self._cursor.fast_executemany
+
+    @fast_executemany.setter
+    def fast_executemany(self, value):
+        self._cursor.fast_executemany = value
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def seed_routines(cursor, routine_count, poses_per_routine):
+    for r in range(routine_count):
+        routine_id = insert_returning(cursor, "Routines", ["Name", "Description", "Duration"],
+                                      [f"Bench Routine {r}", "Benchmark", "5 min"], "RoutineID")
+        bulk_insert(cursor, "RoutinePoses", POSE_COLUMNS,
+                    [(routine_id, None, f"Pose {i}", "30 sec", i) for i in range(poses_per_routine)])
+
+
+def bench_routines(conn, sizes=(10, 100, 500), poses_per_routine=8):
+    print("\n--- 🧘 GET /api/routines: queries vs. library size ---")
+    print(f"{'Routines':<10} | {'Queries':<8} | {'ms'}")
+    print("-" * 32)
+
+    seeded = 0
+    counts = []
+    for n in sizes:
+        seed_routines(conn.cursor(), n - seeded, poses_per_routine)
+        seeded = n
+
+        cursor = CountingCursor(conn.cursor())
+        start = time.perf_counter()
+        fetch_routines(cursor)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        counts.append(cursor.statements)
+        print(f"{n:<10} | {cursor.statements:<8} | {elapsed_ms:.1f}")
+    conn.rollback()
+    return counts
+
+
+def bench_identity_writes(conn, rows=100):
+    print(f"\n--- 🆔 Writes that need the new ID: round-trips for {rows} rows ---")
+    print(f"{'Strategy':<28} | {'Round-trips':<11} | {'ms'}")
+    print("-" * 50)
+
+    def identity_select(cursor):
+        for i in range(rows):
+            cursor.execute("INSERT INTO WalkThemes (Title) VALUES (?)", f"Bench Theme {i}")
+            cursor.execute("SELECT @@IDENTITY")
+            cursor.fetchone()
+
+    def output_per_row(cursor):
+        for i in range(rows):
+            insert_returning(cursor, "WalkThemes", ["Title"], [f"Bench Theme {i}"], "ThemeID")
+
+    def output_multi_row(cursor):
+        insert_many_returning(cursor, "WalkThemes", ["Title"],
+                              [(f"Bench Theme {i}",) for i in range(rows)], ["ThemeID", "Title"])
+
+    strategies = [
+        ("INSERT + SELECT @@IDENTITY", identity_select),
+        ("INSERT ... OUTPUT (per row)", output_per_row),
+        ("INSERT ... OUTPUT (batched)", output_multi_row),
+    ]
+    for label, write in strategies:
+        cursor = CountingCursor(conn.cursor())
+        start = time.perf_counter()
+        write(cursor)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{label:<28} | {cursor.round_trips:<11} | {elapsed_ms:.1f}")
+    conn.rollback()
+
+
+def bench_bulk_insert(conn, sizes=(10, 100, 1000)):
+    print("\n--- 📦 RoutinePoses insert: per-row vs. fast_executemany ---")
+    print(f"{'Rows':<6} | {'Per-row ms':<10} | {'Trips':<6} | {'Batched ms':<10} | {'Trips'}")
+    print("-" * 52)
+
+    routine_id = insert_returning(conn.cursor(), "Routines", ["Name", "Description", "Duration"],
+                                  ["Bench Routine", "Benchmark", "5 min"], "RoutineID")
+    sql = f"INSERT INTO RoutinePoses ({', '.join(POSE_COLUMNS)}) VALUES (?, ?, ?, ?, ?)"
+    for n in sizes:
+        rows = [(routine_id, None, f"Pose {i}", "30 sec", i) for i in range(n)]
+
+        per_row = CountingCursor(conn.cursor())
+        start = time.perf_counter()
+        for row in rows:
+            per_row.execute(sql, *row)
+        per_row_ms = (time.perf_counter() - start) * 1000
+
+        batched = CountingCursor(conn.cursor())
+        start = time.perf_counter()
+        bulk_insert(batched, "RoutinePoses", POSE_COLUMNS, rows)
+        batched_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n:<6} | {per_row_ms:<10.1f} | {per_row.round_trips:<6} | {batched_ms:<10.1f} | {batched.round_trips}")
+    conn.rollback()
+
+
+if __name__ == "__main__":
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+    except Exception as e:
+        print(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+    try:
+        sizes = (int(sys.argv[1]),) if len(sys.argv) > 1 else (10, 100, 500)
+        counts = bench_routines(conn, sizes)
+        bench_identity_writes(conn)
+        bench_bulk_insert(conn)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if len(set(counts)) > 1:
+        print(f"❌ GET /api/routines query count grows with the library: {counts}")
+        sys.exit(1)
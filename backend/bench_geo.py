@@ -0,0 +1,251 @@
+import json
+import os
+import random
+import sys
+import time
+
+import geo
+from loop_planner import LoopPlanner
+from poi_index import PLACE_TYPES, PoiIndex
+from poi_service import haversine, haversine_batch
+from route_store import ROUTE_LODS, pack_lods, pack_routes, unpack_routes
+from tile_cache import tile_for
+from walk_graph import WalkGraph, load_walk_graph
+from walk_router import WalkRouter
+
+# Micro-benchmarks for the geometry kernels. No database or network needed.
+#
+# Usage: python bench_geo.py
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def random_points(n, rng, lat=51.5, lon=-0.12, spread=0.05):
+    lats = [lat + rng.uniform(-spread, spread) for _ in range(n)]
+    lons = [lon + rng.uniform(-spread, spread) for _ in range(n)]
+    return lats, lons
+
+
+def bench_haversine(sizes=(100, 10_000, 1_000_000)):
+    rng = random.Random(42)
+    user_lat, user_lon = 51.5, -0.12
+    backend = "NumPy" if geo.np is not None else "pure Python"
+
+    print(f"\n--- 📏 haversine: scalar loop vs. batch ({backend}) ---")
+    print(f"{'Points':<10} | {'Scalar ms':<10} | {'Batch ms':<10} | {'Speedup'}")
+    print("-" * 48)
+    for n in sizes:
+        lats, lons = random_points(n, rng)
+        if geo.np is not None:
+            # Measure the kernel, not the list -> array conversion
+            lats, lons = geo.np.asarray(lats), geo.np.asarray(lons)
+        scalar_lats, scalar_lons = list(lats), list(lons)
+
+        scalar = timed(lambda: [haversine(user_lat, user_lon, a, b)
+                                for a, b in zip(scalar_lats, scalar_lons)], repeat=1)
+        batch = timed(lambda: haversine_batch(user_lat, user_lon, lats, lons))
+        print(f"{n:<10} | {scalar:<10.2f} | {batch:<10.2f} | {scalar / batch:.0f}x")
+
+
+def bench_top_k(sizes=(100, 10_000, 1_000_000), k=10):
+    rng = random.Random(7)
+
+    print(f"\n--- 🔝 top-{k}: full sort vs. partial selection ---")
+    print(f"{'Points':<10} | {'Sort ms':<10} | {'Top-k ms':<10}")
+    print("-" * 36)
+    for n in sizes:
+        values = [rng.random() for _ in range(n)]
+        array = geo.np.asarray(values) if geo.np is not None else values
+        full = timed(lambda: sorted(range(n), key=values.__getitem__)[:k])
+        partial = timed(lambda: geo.smallest_k(array, k))
+        print(f"{n:<10} | {full:<10.2f} | {partial:<10.2f}")
+
+
+def bench_poi_index(count=300_000, repeat=50):
+    rng = random.Random(3)
+    lats, lons = random_points(count, rng, spread=0.3)
+    by_tile = {}
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        by_tile.setdefault(tile_for(lat, lon), []).append((f"Spot {i}", rng.choice(PLACE_TYPES), lat, lon))
+
+    index = PoiIndex()
+    load_ms = timed(lambda: [index.load_tile(tile, pois) for tile, pois in by_tile.items()], repeat=1)
+
+    print(f"\n--- 🗺️  POI index: {len(index)} POIs (loaded in {load_ms:.0f} ms) ---")
+    queries = [
+        ("nearest(10)", lambda: index.nearest(51.5, -0.12, 10)),
+        ("nearest(10, Water)", lambda: index.nearest(51.5, -0.12, 10, types=["Water"])),
+        ("within(500 m)", lambda: index.within(51.5, -0.12, 500)),
+        ("within(bbox ~2 km)", lambda: index.within_bbox(51.49, -0.13, 51.51, -0.11)),
+    ]
+    for label, query in queries:
+        per_query = timed(lambda: [query() for _ in range(repeat)]) / repeat
+        print(f"{label:<20} | {per_query:.3f} ms")
+
+
+def synthetic_routes(options=3, vertices=2000, steps=40, rng=None):
+    """Saved-route payloads shaped like the ones MapPage builds from OSRM."""
+    rng = rng or random.Random(5)
+    routes = []
+    for r in range(options):
+        lat, lng, coords = 51.5, -0.12, []
+        for _ in range(vertices):
+            lat += rng.uniform(-1e-4, 1e-4)
+            lng += rng.uniform(-1e-4, 1e-4)
+            coords.append({"lat": lat, "lng": lng})
+        per_step = vertices // steps
+        routes.append({
+            "id": f"1700000000000-{r}",
+            "coords": coords,
+            "distance": 4200.5,
+            "duration": 3000.0,
+            "steps": [{
+                "instruction": f"turn left along Street {i}",
+                "distance": 105.2,
+                "maneuver": {"type": "turn", "modifier": "left", "location": [lng, lat]},
+                "name": f"Street {i}",
+                "location": coords[i * per_step],
+                "geometry": coords[i * per_step:(i + 1) * per_step + 1],
+            } for i in range(steps)],
+        })
+    return routes
+
+
+def bench_route_storage(vertices=(200, 2000, 20000)):
+    print("\n--- 🧭 Saved-route storage: routes_json vs. packed polylines ---")
+    print(f"{'Vertices':<9} | {'JSON KB':<8} | {'Packed KB':<9} | {'Ratio':<6} | {'Parse ms':<9} | {'Unpack ms'}")
+    print("-" * 64)
+    for n in vertices:
+        routes = synthetic_routes(vertices=n)
+        raw = json.dumps(routes)
+        routes_packed, steps_packed = pack_routes(routes)
+        # NVARCHAR stores 2 bytes per character, the packed VARCHAR columns 1
+        json_kb = len(raw) * 2 / 1024
+        packed_kb = (len(routes_packed) + len(steps_packed)) / 1024
+        parse = timed(lambda: json.loads(raw))
+        unpack = timed(lambda: unpack_routes(routes_packed, steps_packed))
+        print(f"{n:<9} | {json_kb:<8.0f} | {packed_kb:<9.0f} | {json_kb / packed_kb:<6.1f} | {parse:<9.2f} | {unpack:.2f}")
+
+
+def bench_simplify(vertices=(2000, 20000)):
+    print("\n--- ✂️  Route simplification: points kept per LOD tier ---")
+    print(f"{'Vertices':<9} | " + " | ".join(f"{tier:<7}" for tier in ROUTE_LODS) + " | Write ms")
+    print("-" * 60)
+    for n in vertices:
+        routes = synthetic_routes(options=1, vertices=n, steps=1)
+        lods_packed, _ = pack_lods(routes, 0)
+        kept = {tier: len(geo.decode_polyline(lines[0], 6)) for tier, lines in json.loads(lods_packed).items()}
+        write = timed(lambda: pack_lods(routes, 0), repeat=1)
+        print(f"{n:<9} | " + " | ".join(f"{kept[tier]:<7}" for tier in ROUTE_LODS) + f" | {write:.1f}")
+
+
+def bench_checkpoints(vertices=10_000, counts=(5, 20, 100), pois=500):
+    rng = random.Random(13)
+    route = synthetic_routes(options=1, vertices=vertices, steps=1, rng=rng)[0]
+    coords = [[c["lat"], c["lng"]] for c in route["coords"]]
+    lats, lons = random_points(pois, rng, spread=0.01)
+    spots = [{"lat": lat, "lon": lon} for lat, lon in zip(lats, lons)]
+
+    print(f"\n--- 📍 Checkpoint placement: {vertices} vertices, {pois} POIs ---")
+    print(f"{'Checkpoints':<11} | {'Plain ms':<9} | {'Spaced ms':<9} | {'POI snap ms'}")
+    print("-" * 48)
+    for count in counts:
+        plain = timed(lambda: geo.place_checkpoints(coords, count))
+        spaced = timed(lambda: geo.place_checkpoints(coords, count, min_spacing_m=200))
+        snapped = timed(lambda: geo.place_checkpoints(coords, count, pois=spots))
+        print(f"{count:<11} | {plain:<9.2f} | {spaced:<9.2f} | {snapped:.2f}")
+
+
+def synthetic_city(size=300, rng=None, lat=51.45, lng=-0.2):
+    """A size x size street grid (~25 x 25 km at 300) with a few blocks missing."""
+    rng = rng or random.Random(11)
+    nodes = {(i, j): (lat + i * 0.0008 + rng.uniform(-1e-4, 1e-4), lng + j * 0.0012 + rng.uniform(-1e-4, 1e-4))
+             for i in range(size) for j in range(size)}
+    ways = [([(i, j) for j in range(size) if rng.random() > 0.03], f"Street {i}", "residential")
+            for i in range(size)]
+    ways += [([(i, j) for i in range(size) if rng.random() > 0.03], f"Avenue {j}", "footway")
+             for j in range(size)]
+    return WalkGraph.from_ways(nodes, ways)
+
+
+def bench_routing(pairs=20, alternatives=2):
+    """Routes a fixed, seeded set of origin/destination pairs over WALK_GRAPH_PATH (or a synthetic city)."""
+    extract = os.getenv("WALK_GRAPH_PATH")
+    start = time.perf_counter()
+    graph = load_walk_graph(extract) if extract else synthetic_city()
+    ready_ms = (time.perf_counter() - start) * 1000
+    router = WalkRouter(graph)
+
+    rng = random.Random(19)
+    lats, lngs = list(graph.lats), list(graph.lngs)
+    ods = []
+    for _ in range(pairs):
+        a, b = rng.randrange(len(lats)), rng.randrange(len(lats))
+        ods.append(({"lat": lats[a], "lng": lngs[a]}, {"lat": lats[b], "lng": lngs[b]}))
+
+    print(f"\n--- 🚶 Local routing: {graph.stats()} (ready in {ready_ms:.0f} ms) ---")
+    print(f"{'Pair':<5} | {'km':<6} | {'A* ms':<7} | {f'+{alternatives} alt ms':<11} | {'Routes':<6} | {'Cached ms'}")
+    print("-" * 60)
+    totals = [0.0, 0.0]
+    for i, (origin, destination) in enumerate(ods):
+        src, dst = router.snap(origin), router.snap(destination)
+        shortest = timed(lambda: router.shortest_path(src, dst), repeat=1)
+        with_alts = timed(lambda: router.route(origin, destination, alternatives), repeat=1)
+        cached = timed(lambda: router.route(origin, destination, alternatives))
+        routes = router.route(origin, destination, alternatives)
+        totals[0] += shortest
+        totals[1] += with_alts
+        print(f"{i:<5} | {routes[0]['distance'] / 1000:<6.1f} | {shortest:<7.1f} | {with_alts:<11.1f} | "
+              f"{len(routes):<6} | {cached:.3f}")
+    print(f"{'mean':<5} | {'':<6} | {totals[0] / pairs:<7.1f} | {totals[1] / pairs:<11.1f} |")
+
+
+def bench_loops(origins=10, distances=(1000, 3000, 8000), alternatives=2, pois=2000):
+    """Loop walks from seeded origins over WALK_GRAPH_PATH (or a synthetic city), with random wellness POIs."""
+    extract = os.getenv("WALK_GRAPH_PATH")
+    graph = load_walk_graph(extract) if extract else synthetic_city()
+    rng = random.Random(20)
+    lats, lngs = list(graph.lats), list(graph.lngs)
+    spots = []
+    for i in range(pois):
+        node = rng.randrange(len(lats))
+        spots.append((f"Spot {i}", rng.choice(PLACE_TYPES), lats[node], lngs[node]))
+
+    def poi_source(lat, lng, radius, types):
+        return [s for s in spots if geo.haversine_m(lat, lng, s[2], s[3]) <= radius
+                and (not types or s[1] in types)]
+
+    planner = LoopPlanner(WalkRouter(graph), poi_source)
+    starts = [rng.randrange(len(lats)) for _ in range(origins)]
+    print(f"\n--- 🔁 Loop walks: {graph.stats()}, {pois} POIs, +{alternatives} alternatives ---")
+    print(f"{'Target m':<9} | {'Cold ms':<8} | {'Warm ms':<8} | {'Worst ms':<8} | {'Mean error'}")
+    print("-" * 55)
+    for distance in distances:
+        cold, warm, errors = [], [], []
+        for node in starts:
+            origin = {"lat": lats[node], "lng": lngs[node]}
+            cold.append(timed(lambda: planner.loops(origin, distance, alternatives), repeat=1))
+            warm.append(timed(lambda: planner.loops(origin, distance, alternatives)))
+            loops = planner.loops(origin, distance, alternatives)
+            errors.extend(abs(loop["distance"] - distance) / distance for loop in loops)
+        print(f"{distance:<9} | {sum(cold) / len(cold):<8.1f} | {sum(warm) / len(warm):<8.1f} | "
+              f"{max(cold):<8.1f} | {sum(errors) / max(len(errors), 1):.1%}")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (100, 10_000, 1_000_000)
+    bench_haversine(sizes)
+    bench_top_k(sizes)
+    bench_poi_index()
+    bench_route_storage()
+    bench_simplify()
+    bench_checkpoints()
+    bench_routing()
+    bench_loops()
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+
+from pose_sampler import PoseSampler
+
+
+class CatalogSnapshot:
+    """One immutable, versioned copy of the static catalog tables."""
+
+    def __init__(self, version, poses, themes, questions_by_theme):
+        self.version = version
+        self.loaded_at = time.time()
+        self.poses = poses
+        self.themes = themes
+        self.questions_by_theme = questions_by_theme
+        self.pose_sampler = PoseSampler(poses)
+
+    def sample_questions(self, theme_id, k=5, rng=random):
+        """Random k questions for a theme, drawn in memory (replaces ORDER BY NEWID())."""
+        questions = self.questions_by_theme.get(theme_id, [])
+        if len(questions) <= k:
+            picked = list(questions)
+            rng.shuffle(picked)
+            return picked
+        return rng.sample(questions, k)
+
+
+def load_catalog(cursor):
+    """Reads poses, WalkThemes and ReflectionQuestions in three queries."""
+    cursor.execute("SELECT id, name, instructions, benefits, animation_url, difficulty_tag FROM poses")
+    columns = [column[0] for column in cursor.description]
+    poses = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    cursor.execute("SELECT ThemeID, Title FROM WalkThemes")
+    themes = [{"id": row.ThemeID, "title": row.Title} for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT ThemeID, OriginalQuestion, FollowupQuestion1, FollowupQuestion2
+        FROM ReflectionQuestions
+    """)
+    questions_by_theme = {}
+    for row in cursor.fetchall():
+        questions_by_theme.setdefault(row.ThemeID, []).append({
+            "q1": row.OriginalQuestion,
+            "q2": row.FollowupQuestion1,
+            "q3": row.FollowupQuestion2
+        })
+
+    return poses, themes, questions_by_theme
+
+
+class CatalogCache:
+    """
+    Read-through cache for the catalog tables, which only change when
+    seed_mssql.py runs.
+
+    - `loader()` returns (poses, themes, questions_by_theme) from the database.
+    - Snapshots expire after `ttl` seconds; `invalidate()` expires them now.
+    - Only one thread reloads at a time. While it does, other threads keep
+      serving the previous snapshot, and a failed reload keeps it too.
+    """
+
+    def __init__(self, loader, ttl=3600):
+        self.loader = loader
+        self.ttl = ttl
+        self._snapshot = None
+        self._version = 0
+        self._expires_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            return snapshot
+
+        # Someone else is already reloading - serve what we have meanwhile.
+        blocking = snapshot is None
+        if not self._reload_lock.acquire(blocking=blocking):
+            return snapshot
+        try:
+            if self._snapshot is not None and time.monotonic() < self._expires_at:
+                return self._snapshot
+            return self._reload() or snapshot
+        finally:
+            self._reload_lock.release()
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    def info(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "ttl": self.ttl,
+            "stale": time.monotonic() >= self._expires_at,
+        }
+
+    def _reload(self):
+        try:
+            poses, themes, questions_by_theme = self.loader()
+        except Exception as e:
+            print(f"❌ Catalog reload failed: {e}")
+            if self._snapshot is not None:
+                # Keep serving the old copy and retry shortly, not on every request.
+                self._expires_at = time.monotonic() + min(self.ttl, 30)
+            return None
+
+        self._version += 1
+        self._snapshot = CatalogSnapshot(self._version, poses, themes, questions_by_theme)
+        self._expires_at = time.monotonic() + self.ttl
+        print(f"📚 Catalog v{self._version} loaded: {len(poses)} poses, {len(themes)} themes")
+        return self._snapshot
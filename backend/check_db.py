@@ -0,0 +1,140 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pyodbc
+from dotenv import load_dotenv
+
+from db_helpers import insert_many_returning, insert_returning
+from retention import RetentionPolicy, apply_retention
+from walk_stats import REBUILD_SQL, read_stats, record_walk
+
+# Checks for the T-SQL on the walk_complete write path, run against the
+# database configured in .env (point it at a throwaway database in CI).
+# Every check works inside a transaction that is rolled back, so the
+# tables are left untouched. check_rebuild_stats still locks all the
+# rollup tables while it runs, so keep it away from a live database.
+#
+# Usage: python check_db.py
+
+# Load environment variables
+load_dotenv()
+
+CONN_STR = (
+    r'DRIVER={ODBC Driver 17 for SQL Server};'
+    f'SERVER={os.getenv("DB_SERVER")};'
+    f'DATABASE={os.getenv("DB_DATABASE")};'
+    f'UID={os.getenv("DB_USER")};'
+    f'PWD={os.getenv("DB_PASSWORD")};'
+)
+
+# Far above any real UserID, so the checks never see real history
+CHECK_USER = 2_000_000_000
+
+WALK_COLUMNS = ["UserID", "DistanceKm", "DurationMinutes", "CaloriesBurned", "PosesCompleted",
+                "StepsEstimated", "Notes", "WalkDate"]
+
+
+def insert_walk(cursor, user_id, walk_date, distance=1.0):
+    return insert_returning(cursor, "WalkHistory", WALK_COLUMNS,
+                            [user_id, distance, 10, 60, 3, 1250, "check_db", walk_date], "WalkID")
+
+
+def check_retention_per_user(conn, keep=3, extra=2):
+    """A per-user policy trims the submitting user's oldest walks and leaves everyone else alone."""
+    cursor = conn.cursor()
+    start = datetime(2001, 1, 1)
+    walk_ids = [insert_walk(cursor, CHECK_USER, start + timedelta(days=i)) for i in range(keep + extra)]
+    bystander = insert_walk(cursor, CHECK_USER + 1, start)
+
+    policy = RetentionPolicy(max_walks=keep, per_user=True)
+    removed = apply_retention(cursor, policy, user_id=CHECK_USER)
+
+    cursor.execute("SELECT WalkID FROM WalkHistory WHERE UserID = ? ORDER BY WalkDate", CHECK_USER)
+    kept = [row.WalkID for row in cursor.fetchall()]
+    cursor.execute("SELECT COUNT(*) FROM WalkHistory WHERE WalkID = ?", bystander)
+    bystander_kept = cursor.fetchone()[0]
+    cursor.execute("SELECT @@OPTIONS & 512")  # 512 = NOCOUNT
+    nocount = cursor.fetchone()[0]
+    conn.rollback()
+
+    assert removed == extra, f"removed {removed} walk(s), expected {extra}"
+    assert kept == walk_ids[extra:], f"kept {kept}, expected the newest {walk_ids[extra:]}"
+    assert bystander_kept == 1, "another user's walk was removed"
+    assert not nocount, "the retention batch left NOCOUNT on"
+
+
+def check_record_walk(conn):
+    """RECORD_WALK_SQL binds its parameters and builds the daily, weekly and streak rollups."""
+    cursor = conn.cursor()
+    monday = datetime(2001, 1, 1)
+    for walk_date in (monday, monday + timedelta(hours=2), monday + timedelta(days=1), monday + timedelta(days=3)):
+        record_walk(cursor, CHECK_USER, walk_date, 2.0, 30, 120, 4, 2500)
+    stats = read_stats(cursor, CHECK_USER, weeks=1, today=monday.date() + timedelta(days=3))
+    conn.rollback()
+
+    assert stats["lifetime"]["Walks"] == 4, stats["lifetime"]
+    assert stats["lifetime"]["StepsEstimated"] == 10000, stats["lifetime"]
+    assert stats["weekly"][0]["week_start"] == "2001-01-01" and stats["weekly"][0]["Walks"] == 4, stats["weekly"]
+    assert (stats["current_streak"], stats["best_streak"]) == (1, 2), stats
+
+
+def check_rebuild_stats(conn):
+    """REBUILD_SQL runs as one batch and recomputes the same rollups record_walk() builds."""
+    cursor = conn.cursor()
+    start = datetime(2001, 1, 1, 9)
+    for day in (0, 1, 2, 5):
+        insert_walk(cursor, CHECK_USER, start + timedelta(days=day), distance=2.0)
+    cursor.execute(REBUILD_SQL)
+    users = cursor.fetchone()[0]
+    stats = read_stats(cursor, CHECK_USER, weeks=1, today=start.date() + timedelta(days=5))
+    conn.rollback()
+
+    assert users >= 1, f"rebuilt {users} user(s)"
+    assert stats["lifetime"]["Walks"] == 4, stats["lifetime"]
+    assert (stats["current_streak"], stats["best_streak"]) == (1, 3), stats
+
+
+def check_returning_with_trigger(conn):
+    """insert_returning / insert_many_returning work on a table with an enabled trigger (Msg 334 otherwise)."""
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE CheckTriggered (ID INT IDENTITY(1,1) PRIMARY KEY, Title NVARCHAR(100))")
+    cursor.execute("CREATE TRIGGER CheckTriggered_Insert ON CheckTriggered AFTER INSERT AS SET NOCOUNT ON;")
+    first = insert_returning(cursor, "CheckTriggered", ["Title"], ["one"], "ID")
+    rest = insert_many_returning(cursor, "CheckTriggered", ["Title"], [("two",), ("three",)], ["ID", "Title"])
+    conn.rollback()
+
+    assert first == 1, f"returned {first}"
+    assert sorted(rest) == [(2, "two"), (3, "three")], f"returned {rest}"
+
+
+CHECKS = [
+    check_retention_per_user,
+    check_returning_with_trigger,
+    check_record_walk,
+    check_rebuild_stats,
+]
+
+
+if __name__ == "__main__":
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+    except Exception as e:
+        print(f"❌ Database connection failed: {e}")
+        sys.exit(1)
+
+    failed = 0
+    try:
+        for check in CHECKS:
+            try:
+                check(conn)
+                print(f"✅ {check.__name__}")
+            except Exception as e:
+                conn.rollback()
+                failed += 1
+                print(f"❌ {check.__name__}: {e}")
+    finally:
+        conn.rollback()
+        conn.close()
+    sys.exit(1 if failed else 0)
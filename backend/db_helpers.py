@@ -0,0 +1,122 @@
+# SQL Server caps a statement at 2100 parameters and a VALUES list at 1000 rows
+MAX_PARAMS = 2100
+MAX_VALUES_ROWS = 1000
+
+
+_COLUMN_TYPES = {}
+
+
+def column_types(cursor, table):
+    """
+    {column: T-SQL type} for a table, read from sys.columns once per process
+    and cached. Used to declare table variables shaped like its columns.
+    """
+    types = _COLUMN_TYPES.get(table)
+    if types is None:
+        cursor.execute("""
+            SELECT c.name, TYPE_NAME(c.user_type_id), c.max_length, c.precision, c.scale
+            FROM sys.columns c WHERE c.object_id = OBJECT_ID(?)
+        """, table)
+        types = {}
+        for name, type_name, max_length, precision, scale in cursor.fetchall():
+            if type_name in ("varchar", "char", "varbinary", "binary"):
+                type_name += "(MAX)" if max_length == -1 else f"({max_length})"
+            elif type_name in ("nvarchar", "nchar"):
+                type_name += "(MAX)" if max_length == -1 else f"({max_length // 2})"
+            elif type_name in ("decimal", "numeric"):
+                type_name += f"({precision}, {scale})"
+            elif type_name in ("datetime2", "time", "datetimeoffset"):
+                type_name += f"({scale})"
+            types[name.lower()] = type_name
+        if not types:
+            raise ValueError(f"Unknown table {table}")
+        _COLUMN_TYPES[table] = types
+    return types
+
+
+def _returning_batch(cursor, table, columns, names, values_sql):
+    """
+    An INSERT ... OUTPUT INSERTED ... INTO @out batch that returns `names`.
+    A bare OUTPUT clause is refused (Msg 334) on tables with enabled
+    triggers, so the rows go through a table variable and are read back in
+    the same batch.
+    """
+    types = column_types(cursor, table)
+    declare = ", ".join(f"{n} {types[n.lower()]}" for n in names)
+    return (
+        f"SET NOCOUNT ON; DECLARE @out TABLE ({declare}); "
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"OUTPUT {', '.join('INSERTED.' + n for n in names)} INTO @out "
+        f"VALUES {values_sql}; "
+        f"SET NOCOUNT OFF; SELECT {', '.join(names)} FROM @out;"
+    )
+
+
+def insert_returning(cursor, table, columns, values, returning):
+    """
+    INSERTs one row and returns the `returning` column (a name, or a list of
+    names for a whole row) in the same round-trip via OUTPUT INSERTED ... INTO.
+
+    This saves the separate SELECT @@IDENTITY round-trip, and unlike
+    @@IDENTITY it can never pick up an identity generated by a trigger.
+    The table's column types are looked up once per process.
+    """
+    names = [returning] if isinstance(returning, str) else list(returning)
+    sql = _returning_batch(cursor, table, columns, names, f"({', '.join('?' * len(columns))})")
+    cursor.execute(sql, *values)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0] if isinstance(returning, str) else tuple(row)
+
+
+def insert_many_returning(cursor, table, columns, rows, returning):
+    """
+    INSERTs many rows with multi-row VALUES statements (as few as the
+    parameter limit allows) and returns the OUTPUT rows for all of them.
+
+    SQL Server does not promise OUTPUT rows come back in VALUES order, so
+    include a natural key in `returning` when the caller must match keys to
+    inputs.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    names = [returning] if isinstance(returning, str) else list(returning)
+    chunk = max(1, min(MAX_VALUES_ROWS, (MAX_PARAMS - 1) // len(columns)))
+    placeholder = f"({', '.join('?' * len(columns))})"
+
+    returned = []
+    for start in range(0, len(rows), chunk):
+        batch = rows[start:start + chunk]
+        params = [value for row in batch for value in row]
+        cursor.execute(_returning_batch(cursor, table, columns, names, ", ".join([placeholder] * len(batch))),
+                       *params)
+        for row in cursor.fetchall():
+            returned.append(row[0] if isinstance(returning, str) else tuple(row))
+    return returned
+
+
+def fast_executemany(cursor, sql, rows, chunk_size=1000):
+    """
+    Runs `sql` once per row with pyodbc's fast_executemany, which binds each
+    chunk as a parameter array and sends it in one round-trip instead of one
+    per row. Chunking bounds the parameter buffers pyodbc allocates.
+    """
+    previous = cursor.fast_executemany
+    cursor.fast_executemany = True
+    try:
+        for start in range(0, len(rows), chunk_size):
+            cursor.executemany(sql, rows[start:start + chunk_size])
+    finally:
+        cursor.fast_executemany = previous
+
+
+def bulk_insert(cursor, table, columns, rows, chunk_size=1000):
+    """INSERTs many rows through fast_executemany. Returns the number of rows written."""
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return 0
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    fast_executemany(cursor, sql, rows, chunk_size)
+    return len(rows)
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pyodbc
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection frees up before the checkout timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "returned_at")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.returned_at = now
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of pyodbc connections.
+
+    - Idle connections are handed out LIFO so the warmest one is reused first.
+    - Connections older than `max_age` seconds are recycled on checkout.
+    - Connections idle for longer than `ping_after` seconds get a `SELECT 1`
+      health check before being handed out.
+    - When `max_size` connections are checked out, callers wait up to
+      `timeout` seconds and then get a PoolExhausted error.
+    """
+
+    def __init__(self, conn_str, min_size=1, max_size=10, max_age=1800,
+                 timeout=5.0, ping_after=30, idle_timeout=300):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+
+        self.conn_str = conn_str
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._open = 0
+        self._waiting = 0
+
+        # Counters exposed through stats()
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._timeouts = 0
+
+    # --- CHECKOUT / RETURN ---
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry, stale = self._reserve(deadline)
+            self._close_all(stale)
+
+            if entry is None:
+                try:
+                    entry = _PooledConnection(pyodbc.connect(self.conn_str))
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif not self._is_healthy(entry):
+                self._discard(entry)
+                continue
+
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+            return entry.conn
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not ours (or already returned) - just make sure it is closed.
+            self._close_quietly(conn)
+            return
+
+        if not discard:
+            try:
+                # Never hand an open transaction to the next request.
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._expired(entry):
+            self._discard(entry, recycled=not discard)
+            return
+
+        entry.returned_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def prefill(self):
+        """Opens connections until `min_size` are idle. Safe to call at startup."""
+        while True:
+            with self._cond:
+                if self._open >= self.min_size:
+                    return
+                self._open += 1
+            try:
+                entry = _PooledConnection(pyodbc.connect(self.conn_str))
+            except Exception as e:
+                with self._cond:
+                    self._open -= 1
+                print(f"⚠️ Pool prefill stopped: {e}")
+                return
+            with self._cond:
+                self._created += 1
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            stale = list(self._idle)
+            self._idle.clear()
+            self._open -= len(stale)
+        self._close_all(stale)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": len(self._in_use),
+                "waiting": self._waiting,
+                "created": self._created,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+            }
+
+    # --- INTERNALS ---
+
+    def _reserve(self, deadline):
+        """
+        Returns (entry, stale). `entry` is an idle connection, or None when the
+        caller has been granted a slot to open a new one. `stale` holds expired
+        connections that must be closed outside the lock.
+        """
+        stale = []
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    while self._idle:
+                        entry = self._idle.pop()
+                        if self._expired(entry, now):
+                            self._open -= 1
+                            self._recycled += 1
+                            stale.append(entry)
+                            continue
+                        self._trim_idle(now, stale)
+                        return entry, stale
+
+                    if self._open < self.max_size:
+                        self._open += 1
+                        return None, stale
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolExhausted(
+                            f"No database connection available after {self.timeout}s "
+                            f"({self.max_size} checked out)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _trim_idle(self, now, stale):
+        # Oldest idle connections sit at the left end of the deque.
+        while (self._idle and self._open > self.min_size
+               and now - self._idle[0].returned_at > self.idle_timeout):
+            stale.append(self._idle.popleft())
+            self._open -= 1
+            self._recycled += 1
+
+    def _expired(self, entry, now=None):
+        if not self.max_age:
+            return False
+        return (now or time.monotonic()) - entry.created_at > self.max_age
+
+    def _is_healthy(self, entry):
+        if getattr(entry.conn, "closed", False):
+            return False
+        if time.monotonic() - entry.returned_at < self.ping_after:
+            return True
+        try:
+            entry.conn.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, entry, recycled=False):
+        self._close_quietly(entry.conn)
+        with self._cond:
+            self._open -= 1
+            if recycled:
+                self._recycled += 1
+            else:
+                self._discarded += 1
+            self._cond.notify()
+
+    def _close_all(self, entries):
+        for entry in entries:
+            self._close_quietly(entry.conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def pool_from_env(conn_str):
+    """Builds a pool sized from the DB_POOL_* variables in .env."""
+    return ConnectionPool(
+        conn_str,
+        min_size=int(os.getenv("DB_POOL_MIN", 1)),
+        max_size=int(os.getenv("DB_POOL_MAX", 10)),
+        max_age=float(os.getenv("DB_POOL_MAX_AGE", 1800)),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", 30)),
+        idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+    )
@@ -0,0 +1,357 @@
+import bisect
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python paths below are used instead
+    np = None
+
+EARTH_RADIUS_M = 6371000.0
+
+
+# --- ROUTE GEOMETRY PARSING ---
+
+def decode_polyline(encoded, precision=5):
+    """Decodes a Google / OSRM encoded polyline into a list of (lat, lng)."""
+    factor = 10 ** precision
+    coords = []
+    index = lat = lng = 0
+    length = len(encoded)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        coords.append((lat / factor, lng / factor))
+
+    return coords
+
+
+def encode_polyline(coords, precision=5):
+    """Encodes (lat, lng) pairs as a Google / OSRM polyline (inverse of decode_polyline)."""
+    factor = 10 ** precision
+    chars = []
+    prev_lat = prev_lng = 0
+
+    for lat, lng in coords:
+        lat, lng = int(round(lat * factor)), int(round(lng * factor))
+        for delta in (lat - prev_lat, lng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        prev_lat, prev_lng = lat, lng
+
+    return "".join(chars)
+
+
+def route_coordinates(geometry):
+    """
+    Normalizes a route geometry into a sequence of (lat, lng) pairs (an
+    (n, 2) array when NumPy is available).
+
+    Accepts an encoded polyline string, a GeoJSON LineString (or an OSRM route
+    object carrying one under "geometry"), a list of {"lat", "lng"} points as
+    the frontend stores them, or a raw list of [lng, lat] pairs.
+    """
+    if isinstance(geometry, str):
+        return decode_polyline(geometry)
+
+    if isinstance(geometry, dict):
+        if "geometry" in geometry:
+            return route_coordinates(geometry["geometry"])
+        if "coords" in geometry:
+            return route_coordinates(geometry["coords"])
+        if geometry.get("type") == "LineString":
+            return route_coordinates(geometry.get("coordinates", []))
+        raise ValueError("Unsupported route geometry object")
+
+    if isinstance(geometry, (list, tuple)):
+        if np is not None and geometry and not isinstance(geometry[0], dict):
+            # GeoJSON order, flipped to (lat, lng) in one vectorized step;
+            # a third value per point (elevation) is dropped
+            return np.asarray(geometry, dtype=np.float64)[:, [1, 0]]
+        coords = []
+        for point in geometry:
+            if isinstance(point, dict):
+                coords.append((float(point["lat"]), float(point.get("lng", point.get("lon")))))
+            else:
+                # GeoJSON order, elevation dropped
+                coords.append((float(point[1]), float(point[0])))
+        return coords
+
+    raise ValueError("Unsupported route geometry")
+
+
+# --- DISTANCES ---
+
+def cumulative_distances(coords):
+    """Distance in meters from the first vertex to every vertex of the route."""
+    if np is not None:
+        points = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+        lat, lng = points[:, 0], points[:, 1]
+        a = (np.sin(np.diff(lat) / 2) ** 2
+             + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2)
+        segments = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+        return np.concatenate(([0.0], np.cumsum(segments)))
+
+    cum = [0.0]
+    for (lat1, lng1), (lat2, lng2) in zip(coords, coords[1:]):
+        cum.append(cum[-1] + haversine_m(lat1, lng1, lat2, lng2))
+    return cum
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters between two points."""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def haversine_many(lat, lng, lats, lngs, radius=EARTH_RADIUS_M):
+    """
+    Distances from one point to many (meters unless `radius` says otherwise).
+    Returns a NumPy array when NumPy is available, otherwise a list computed
+    point by point.
+    """
+    if np is not None:
+        lats = np.radians(np.asarray(lats, dtype=np.float64))
+        lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+        lat, lng = math.radians(lat), math.radians(lng)
+        a = (np.sin((lats - lat) / 2) ** 2
+             + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2)
+        return 2 * radius * np.arcsin(np.sqrt(a))
+
+    scale = radius / EARTH_RADIUS_M
+    return [haversine_m(lat, lng, lat2, lng2) * scale for lat2, lng2 in zip(lats, lngs)]
+
+
+def smallest_k(values, k):
+    """Indices of the k smallest values, nearest first, without a full sort."""
+    n = len(values)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    if np is not None:
+        values = np.asarray(values)
+        idx = np.argpartition(values, k - 1)[:k] if k < n else np.arange(n)
+        return idx[np.argsort(values[idx], kind="stable")].tolist()
+    return heapq.nsmallest(k, range(n), key=values.__getitem__)
+
+
+# --- SIMPLIFICATION ---
+
+def _project(coords):
+    """(lat, lng) pairs -> local equirectangular x/y in meters (fine at route scale)."""
+    scale = math.pi / 180 * EARTH_RADIUS_M
+    if np is not None:
+        points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        lat0 = math.radians(float(points[:, 0].mean())) if len(points) else 0.0
+        return points[:, 1] * math.cos(lat0) * scale, points[:, 0] * scale
+    lat0 = math.radians(sum(lat for lat, _ in coords) / len(coords)) if coords else 0.0
+    return ([lng * math.cos(lat0) * scale for _, lng in coords],
+            [lat * scale for lat, _ in coords])
+
+
+# Spans shorter than this are measured in plain Python: below it NumPy's
+# per-call overhead costs more than the loop it replaces.
+VECTORIZE_MIN_SPAN = 64
+
+
+def _farthest(xs, ys, arrays, i, j):
+    """(index, distance in meters) of the vertex between i and j farthest from segment i-j."""
+    ax, ay, bx, by = xs[i], ys[i], xs[j], ys[j]
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    if arrays is not None and j - i > VECTORIZE_MIN_SPAN:
+        px, py = arrays[0][i + 1:j] - ax, arrays[1][i + 1:j] - ay
+        t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0) if length2 else 0.0
+        dists = np.hypot(px - t * dx, py - t * dy)
+        k = int(np.argmax(dists))
+        return i + 1 + k, float(dists[k])
+    best, worst = i + 1, -1.0
+    for k in range(i + 1, j):
+        px, py = xs[k] - ax, ys[k] - ay
+        t = min(1.0, max(0.0, (px * dx + py * dy) / length2)) if length2 else 0.0
+        d = math.hypot(px - t * dx, py - t * dy)
+        if d > worst:
+            best, worst = k, d
+    return best, worst
+
+
+def douglas_peucker(coords, tolerance_m):
+    """
+    Indices of the vertices Douglas-Peucker keeps at `tolerance_m`. Iterative,
+    and each long span is measured in one vectorized step.
+    """
+    n = len(coords)
+    if n <= 2:
+        return list(range(n))
+    xs, ys = _project(coords)
+    arrays = None
+    if np is not None:
+        arrays = (xs, ys)
+        xs, ys = xs.tolist(), ys.tolist()
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        k, worst = _farthest(xs, ys, arrays, i, j)
+        if worst > tolerance_m:
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def visvalingam(coords, max_points):
+    """
+    Indices of the vertices Visvalingam-Whyatt keeps when it drops the
+    smallest-area vertex until `max_points` remain. Best for thumbnails,
+    where a point budget matters more than a distance tolerance.
+    """
+    n = len(coords)
+    if n <= max(max_points, 2):
+        return list(range(n))
+    xs, ys = _project(coords)
+    if np is not None:
+        xs, ys = xs.tolist(), ys.tolist()
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+
+    def area(k):
+        a, c = prev[k], nxt[k]
+        return abs((xs[a] - xs[k]) * (ys[c] - ys[k]) - (xs[c] - xs[k]) * (ys[a] - ys[k])) / 2
+
+    current = [0.0] * n
+    heap = []
+    for k in range(1, n - 1):
+        current[k] = area(k)
+        heap.append((current[k], k))
+    heapq.heapify(heap)
+
+    removed = [False] * n
+    remaining = n
+    while remaining > max_points and heap:
+        a, k = heapq.heappop(heap)
+        if removed[k] or a != current[k]:
+            continue  # stale entry
+        removed[k] = True
+        remaining -= 1
+        p, q = prev[k], nxt[k]
+        nxt[p], prev[q] = q, p
+        for m in (p, q):
+            if 0 < m < n - 1:
+                # Never let a neighbour's area drop below the one just removed
+                current[m] = max(area(m), a)
+                heapq.heappush(heap, (current[m], m))
+    return [k for k in range(n) if not removed[k]]
+
+
+def simplify(coords, tolerance_m=None, max_points=None):
+    """
+    Simplified copy of a (lat, lng) route: Douglas-Peucker at `tolerance_m`,
+    then Visvalingam down to `max_points` if that is still too many.
+    """
+    if len(coords) == 0:
+        return coords
+    indices = list(range(len(coords)))
+    if tolerance_m:
+        indices = douglas_peucker(coords, tolerance_m)
+    if max_points and len(indices) > max_points:
+        subset = [coords[i] for i in indices]
+        indices = [indices[i] for i in visvalingam(subset, max_points)]
+    if np is not None and isinstance(coords, np.ndarray):
+        return coords[indices]
+    return [coords[i] for i in indices]
+
+
+# --- CHECKPOINT PLACEMENT ---
+
+def place_checkpoints(coords, count, min_spacing_m=0.0, pois=None, snap_radius_m=150.0):
+    """
+    Places `count` checkpoints at equal arc-length intervals along a route,
+    leaving the start and the end free (the same spacing MapPage.jsx uses).
+
+    - `min_spacing_m` drops checkpoints until neighbours are at least that far apart.
+    - `pois` ({"lat", "lon"/"lng", ...} dicts) pulls each checkpoint onto the
+      nearest unused POI within `snap_radius_m`.
+
+    Returns dicts with lat, lng and distanceFromStart (meters).
+    """
+    if count <= 0 or len(coords) == 0:
+        return []
+    if np is not None:
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+    cum = cumulative_distances(coords)
+    total = float(cum[-1])
+    if total == 0:
+        lat, lng = float(coords[0][0]), float(coords[0][1])
+        return [{"lat": lat, "lng": lng, "distanceFromStart": 0.0} for _ in range(count)]
+
+    if min_spacing_m > 0:
+        count = min(count, max(int(total // min_spacing_m) - 1, 0))
+    step = total / (count + 1)
+    targets = [step * k for k in range(1, count + 1)]
+
+    if np is not None:
+        targets = np.asarray(targets)
+        idx = np.clip(np.searchsorted(cum, targets, side="left"), 1, len(cum) - 1)
+        seg = cum[idx] - cum[idx - 1]
+        t = np.divide(targets - cum[idx - 1], seg, out=np.zeros_like(targets), where=seg > 0)
+        placed = coords[idx - 1] + (coords[idx] - coords[idx - 1]) * t[:, None]
+        checkpoints = [
+            {"lat": float(lat), "lng": float(lng), "distanceFromStart": float(d)}
+            for (lat, lng), d in zip(placed, targets)
+        ]
+    else:
+        checkpoints = []
+        for target in targets:
+            i = min(max(bisect.bisect_left(cum, target), 1), len(cum) - 1)
+            seg = cum[i] - cum[i - 1]
+            t = (target - cum[i - 1]) / seg if seg > 0 else 0.0
+            (lat1, lng1), (lat2, lng2) = coords[i - 1], coords[i]
+            checkpoints.append({
+                "lat": lat1 + (lat2 - lat1) * t,
+                "lng": lng1 + (lng2 - lng1) * t,
+                "distanceFromStart": target,
+            })
+
+    if pois:
+        _snap_to_pois(checkpoints, pois, snap_radius_m)
+    return checkpoints
+
+
+def _snap_to_pois(checkpoints, pois, snap_radius_m):
+    poi_lats = [poi["lat"] for poi in pois]
+    poi_lngs = [poi.get("lon", poi.get("lng")) for poi in pois]
+    used = set()
+    for cp in checkpoints:
+        dists = haversine_many(cp["lat"], cp["lng"], poi_lats, poi_lngs)
+        # The nearest unused POI is among the len(used) + 1 nearest overall
+        nearest = next((i for i in smallest_k(dists, len(used) + 1) if i not in used), None)
+        if nearest is None or dists[nearest] > snap_radius_m:
+            continue
+        used.add(nearest)
+        poi = pois[nearest]
+        cp["lat"] = poi["lat"]
+        cp["lng"] = poi_lngs[nearest]
+        cp["poi"] = {"name": poi.get("name"), "type": poi.get("type")}
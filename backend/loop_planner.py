@@ -0,0 +1,204 @@
+import math
+import threading
+from collections import OrderedDict
+
+from geo import haversine_m
+
+# A loop is origin -> A -> B -> origin. With A and B about a third of the
+# target away and 50-130 degrees apart (seen from the origin), the three legs
+# add up to roughly the target.
+WAYPOINT_BAND = (0.22, 0.42)
+WAYPOINT_SPREAD_DEG = (50.0, 130.0)
+BEARINGS = 12
+MAX_POI_CANDIDATES = 12
+POI_SNAP_M = 120.0
+
+# Only the pairs whose estimated loop length (tree distances plus the
+# straight-line A-B gap times a street-detour factor) is closest to the
+# target get their middle leg routed
+LEG_SEARCHES = 12
+DETOUR_FACTOR = 1.25
+
+# Score = length error + RETRACE_WEIGHT * share walked twice - POI_BONUS per POI (up to MAX_POI_BONUS)
+RETRACE_WEIGHT = 0.6
+POI_BONUS = 0.04
+MAX_POI_BONUS = 4
+
+
+class LoopPlanner:
+    """
+    Closed walks of about a target length that start and end at one point,
+    over a WalkRouter's graph, preferring ones that pass wellness POIs.
+
+    Everything expensive is memoized: the distance-bounded shortest-path tree
+    around each origin (LRU, so repeated and nearby requests skip it), and
+    every waypoint-to-waypoint leg. A request then routes and scores only
+    the few waypoint pairs whose estimated length is closest to the target.
+    """
+
+    def __init__(self, router, poi_source=None, tree_cache_size=64, leg_cache_size=4096):
+        self.router = router
+        self.poi_source = poi_source
+        self.tree_cache_size = tree_cache_size
+        self.leg_cache_size = leg_cache_size
+        self._trees = OrderedDict()
+        self._legs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def loops(self, origin, distance_m, alternatives=0, types=None):
+        """
+        Up to 1 + `alternatives` loops from {"lat", "lng"}, best first, as
+        route objects with an extra "pois" list. Raises NoRoute.
+        """
+        router = self.router
+        src = router.snap(origin, "origin")
+        dist, parent = self._tree(src, distance_m)
+        poi_nodes = self._poi_nodes(origin, distance_m, types)
+        candidates = self._candidates(src, dist, distance_m, poi_nodes)
+
+        # Waypoints on POIs get the same bonus here as in the final score
+        pairs = sorted(self._pairs(src, candidates), key=lambda pair: (
+            abs(self._estimate(dist, *pair) - distance_m) / distance_m
+            - POI_BONUS * sum(n in poi_nodes for n in pair)))
+        scored = []
+        for a, b in pairs[:max(LEG_SEARCHES, 3 * (alternatives + 1))]:
+            leg = self._leg(a, b)
+            if leg is None:
+                continue
+            path = _join(_path_from(parent, a)[::-1], leg[1], _path_from(parent, b))
+            length = dist[a] + leg[0] + dist[b]
+            retraced = _retraced_share(path, router)
+            visited = {poi_nodes[n] for n in path if n in poi_nodes}
+            score = (abs(length - distance_m) / distance_m + RETRACE_WEIGHT * retraced
+                     - POI_BONUS * min(len(visited), MAX_POI_BONUS))
+            scored.append((score, a, b, path, sorted(visited)))
+        if not scored:
+            return []
+
+        scored.sort(key=lambda item: item[0])
+        chosen, used = [], set()
+        for score, a, b, path, visited in scored:
+            if a in used or b in used:
+                continue  # Alternatives go through different waypoints
+            used.update((a, b))
+            route = router.to_route(path, f"loop-{src}-{a}-{b}")
+            route["pois"] = [{"name": name, "type": kind} for name, kind in visited]
+            chosen.append(route)
+            if len(chosen) > alternatives:
+                break
+        return chosen
+
+    # --- memoized pieces ---
+
+    def _tree(self, src, distance_m):
+        # Round the bound up so nearby targets share a tree
+        bound = math.ceil(distance_m * WAYPOINT_BAND[1] / 250.0) * 250.0
+        with self._lock:
+            for (node, cached_bound), tree in self._trees.items():
+                if node == src and cached_bound >= bound:
+                    self._trees.move_to_end((node, cached_bound))
+                    return tree
+        tree = self.router.shortest_tree(src, bound)
+        with self._lock:
+            self._trees[(src, bound)] = tree
+            if len(self._trees) > self.tree_cache_size:
+                self._trees.popitem(last=False)
+        return tree
+
+    def _leg(self, a, b):
+        key = (min(a, b), max(a, b))
+        with self._lock:
+            if key in self._legs:
+                self._legs.move_to_end(key)
+                cost, path = self._legs[key]
+                return cost, path if key[0] == a else path[::-1]
+        found = self.router.shortest_path(*key)
+        with self._lock:
+            self._legs[key] = found
+            if len(self._legs) > self.leg_cache_size:
+                self._legs.popitem(last=False)
+        if found is None:
+            return None
+        return found[0], found[1] if key[0] == a else found[1][::-1]
+
+    # --- waypoint selection ---
+
+    def _poi_nodes(self, origin, distance_m, types):
+        """{graph node: (name, type)} for POIs within reach, snapped to the graph."""
+        if self.poi_source is None:
+            return {}
+        radius = distance_m * WAYPOINT_BAND[1]
+        pois = self.poi_source(float(origin["lat"]), float(origin["lng"]), radius, types)
+        nodes = {}
+        for name, kind, lat, lng in pois:
+            node, _ = self.router.graph.nearest_node(lat, lng, POI_SNAP_M)
+            if node is not None:
+                nodes.setdefault(node, (name, kind))
+        return nodes
+
+    def _candidates(self, src, dist, distance_m, poi_nodes):
+        """
+        Waypoint nodes at a third-ish of the target: the best-placed node in
+        each of BEARINGS directions, plus POIs that fall in the band.
+        """
+        low, high = WAYPOINT_BAND[0] * distance_m, WAYPOINT_BAND[1] * distance_m
+        ideal = distance_m / 3
+        sector = 360.0 / BEARINGS
+        best = {}
+        for node, d in dist.items():
+            if low <= d <= high:
+                slot = int(self.router.bearing(src, node) // sector)
+                if slot not in best or abs(d - ideal) < abs(dist[best[slot]] - ideal):
+                    best[slot] = node
+        candidates = set(best.values())
+        in_band = [n for n in poi_nodes if n in dist and low <= dist[n] <= high]
+        in_band.sort(key=lambda n: abs(dist[n] - ideal))
+        candidates.update(in_band[:MAX_POI_CANDIDATES])
+        return candidates
+
+    def _pairs(self, src, candidates):
+        bearings = {n: self.router.bearing(src, n) for n in candidates}
+        ordered = sorted(candidates, key=bearings.get)
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:]:
+                spread = (bearings[b] - bearings[a]) % 360
+                spread = min(spread, 360 - spread)
+                if WAYPOINT_SPREAD_DEG[0] <= spread <= WAYPOINT_SPREAD_DEG[1]:
+                    yield a, b
+
+    def _estimate(self, dist, a, b):
+        graph = self.router.graph
+        gap = haversine_m(graph.lats[a], graph.lngs[a], graph.lats[b], graph.lngs[b])
+        return dist[a] + DETOUR_FACTOR * gap + dist[b]
+
+    def stats(self):
+        with self._lock:
+            return {"cached_trees": len(self._trees), "cached_legs": len(self._legs)}
+
+
+def _path_from(parent, node):
+    """node -> ... -> tree root, following parents."""
+    path = [node]
+    while parent[path[-1]] != -1:
+        path.append(parent[path[-1]])
+    return path
+
+
+def _join(*parts):
+    path = []
+    for part in parts:
+        path.extend(part[1:] if path and part and path[-1] == part[0] else part)
+    return path
+
+
+def _retraced_share(path, router):
+    """Share of the loop's length on segments it walks more than once."""
+    seen, total, twice = set(), 0.0, 0.0
+    for u, v in zip(path, path[1:]):
+        length = router.edge(u, v)[1]
+        total += length
+        key = (min(u, v), max(u, v))
+        if key in seen:
+            twice += 2 * length
+        seen.add(key)
+    return min(twice / total, 1.0) if total else 0.0
@@ -0,0 +1,242 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Overpass could not answer, even after retries."""
+
+
+class CircuitOpen(UpstreamError):
+    """Overpass has failed repeatedly; calls are refused until the cool-down ends."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is refused for `reset_after` seconds. Then a single trial call is
+    let through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class OverpassClient:
+    """
+    Blocking Overpass client shared by all requests.
+
+    - One requests.Session with a pooled HTTPAdapter, so TCP/TLS connections are reused.
+    - Separate connect and read timeouts on every call, and a total `deadline`
+      per query() that bounds attempts, backoff and retries together.
+    - Retries on transport errors (connection, broken body) and 429/502/503/504, with
+      exponential backoff and full jitter (Retry-After is honoured, capped).
+      A read timeout is not retried: the same query would most likely time out again.
+    - A CircuitBreaker that fails fast while Overpass is down.
+    """
+
+    def __init__(self, url, connect_timeout=3.05, read_timeout=5.0, deadline=10.0, retries=3,
+                 backoff=0.5, max_backoff=8.0, pool_size=4, breaker=None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retried = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def query(self, overpass_ql, deadline=None):
+        """
+        Runs an Overpass QL query and returns the decoded JSON body. `deadline`
+        is a time.monotonic() value shared by a batch; by default the query
+        gets `self.deadline` seconds from now.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        if time.monotonic() >= deadline:
+            raise UpstreamError("Overpass deadline passed before the query was sent")
+        if not self.breaker.allow():
+            self._count("_rejected")
+            raise CircuitOpen(f"Overpass circuit open, retrying after {self.breaker.reset_after}s")
+
+        # Every exit below settles the breaker, or a half-open trial would never end
+        healthy = False
+        try:
+            last_error = None
+            attempts = 0
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    delay = self._delay(attempt, last_error)
+                    # Not worth another attempt unless it can at least connect in time
+                    if time.monotonic() + delay + self.timeout[0] >= deadline:
+                        break
+                    self._count("_retried")
+                    time.sleep(delay)
+                remaining = deadline - time.monotonic()
+                attempts += 1
+                self._count("_requests")
+                try:
+                    response = self.session.post(self.url, data={"data": overpass_ql},
+                                                 timeout=tuple(min(t, remaining) for t in self.timeout))
+                except requests.ReadTimeout as e:
+                    last_error = e
+                    break
+                except requests.RequestException as e:
+                    last_error = e
+                    continue
+
+                if response.status_code in RETRY_STATUSES:
+                    last_error = response
+                    continue
+                if response.status_code >= 400:
+                    # Bad query - retrying will not help, and it is not an outage
+                    healthy = True
+                    raise UpstreamError(f"Overpass returned HTTP {response.status_code}")
+
+                try:
+                    body = response.json()
+                except ValueError as e:
+                    last_error = e
+                    continue
+                healthy = True
+                return body
+
+            self._count("_failed")
+            if isinstance(last_error, requests.Response):
+                raise UpstreamError(f"Overpass returned HTTP {last_error.status_code} after {attempts} attempt(s)")
+            raise UpstreamError(f"Overpass unreachable after {attempts} attempt(s): {last_error}")
+        finally:
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "url": self.url,
+                "circuit": self.breaker.state,
+                "requests": self._requests,
+                "retried": self._retried,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def close(self):
+        self.session.close()
+
+    def _delay(self, attempt, last_error):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = getattr(last_error, "headers", {}).get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+class AsyncOverpassClient:
+    """
+    asyncio front end for concurrent tile fetches.
+
+    This is not an async HTTP client: each query runs the blocking
+    OverpassClient on a worker thread (asyncio.to_thread), so it shares that
+    client's session, retries and circuit breaker and holds a thread while it
+    waits. At most `concurrency` queries run at a time - Overpass only grants
+    a couple of slots per client IP. A batch shares one deadline, the
+    client's `deadline` from the moment the batch starts.
+    """
+
+    def __init__(self, client, concurrency=2):
+        self.client = client
+        self.concurrency = concurrency
+
+    async def query(self, overpass_ql, semaphore=None, deadline=None):
+        if semaphore is None:
+            return await asyncio.to_thread(self.client.query, overpass_ql, deadline)
+        async with semaphore:
+            return await asyncio.to_thread(self.client.query, overpass_ql, deadline)
+
+    async def query_many(self, queries):
+        """
+        Runs {key: query} concurrently. Returns {key: body or exception}, so one
+        failed tile does not sink the others.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = time.monotonic() + self.client.deadline
+        keys = list(queries)
+        results = await asyncio.gather(
+            *(self.query(queries[key], semaphore, deadline) for key in keys), return_exceptions=True
+        )
+        return dict(zip(keys, results))
+
+    async def as_completed(self, queries):
+        """Yields (key, body or exception) for {key: query} as each one finishes."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = time.monotonic() + self.client.deadline
+
+        async def run(key):
+            try:
+                return key, await self.query(queries[key], semaphore, deadline)
+            except Exception as e:
+                return key, e
+
+        for next_done in asyncio.as_completed([run(key) for key in queries]):
+            yield await next_done
@@ -0,0 +1,337 @@
+import heapq
+import json
+import math
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from geo import haversine_many, np
+from tile_cache import DEFAULT_ZOOM, tile_for, tiles_covering
+
+PLACE_TYPES = ("Nature", "Water", "Viewpoint")
+
+# The (key, value) pairs the Overpass query asks for, used when reading an OSM extract
+WELLNESS_TAGS = {
+    ("natural", "water"), ("natural", "beach"), ("natural", "peak"), ("natural", "wood"),
+    ("waterway", "riverbank"), ("leisure", "marina"), ("leisure", "nature_reserve"),
+    ("leisure", "park"), ("tourism", "viewpoint"), ("landuse", "forest"),
+}
+
+EQUATOR_M = 40075016.686
+
+
+# --- INGEST ---
+
+def classify(tags):
+    """UI category for a set of OSM tags: Water, Viewpoint or Nature."""
+    natural = tags.get("natural", "")
+    if "water" in natural or "beach" in natural or "waterway" in tags:
+        return "Water"
+    if "viewpoint" in tags.get("tourism", "") or "peak" in natural:
+        return "Viewpoint"
+    return "Nature"
+
+
+def element_to_poi(element):
+    """
+    (name, type, lat, lon) for an Overpass element, or None when it has no
+    name or position. Already-classified [name, type, lat, lon] entries pass
+    through unchanged.
+    """
+    if isinstance(element, (list, tuple)):
+        return tuple(element)
+
+    tags = element.get("tags", {})
+    name = tags.get("name")
+    # Center of the shape or the point itself
+    lat = element.get("lat") or element.get("center", {}).get("lat")
+    lon = element.get("lon") or element.get("center", {}).get("lon")
+    if not name or not lat or not lon:
+        return None
+    return (name, classify(tags), lat, lon)
+
+
+def read_overpass_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        elements = json.load(f).get("elements", [])
+    return [poi for poi in map(element_to_poi, elements) if poi]
+
+
+def read_osm_xml(path):
+    """
+    Wellness POIs from an .osm XML extract. Ways are placed at the mean of
+    their nodes, so node positions are kept in memory while parsing.
+    """
+    nodes = {}
+    pois = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+            nodes[elem.get("id")] = (lat, lon)
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if tags.get("name") and WELLNESS_TAGS.intersection(tags.items()):
+                pois.append((tags["name"], classify(tags), lat, lon))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if tags.get("name") and WELLNESS_TAGS.intersection(tags.items()):
+                points = [nodes[nd.get("ref")] for nd in elem.iter("nd") if nd.get("ref") in nodes]
+                if points:
+                    pois.append((tags["name"], classify(tags),
+                                 sum(p[0] for p in points) / len(points),
+                                 sum(p[1] for p in points) / len(points)))
+            elem.clear()
+    return pois
+
+
+# --- INDEX ---
+
+class _Cell:
+    """Column arrays for the POIs of one grid cell."""
+
+    __slots__ = ("names", "types", "lats", "lons")
+
+    def __init__(self, pois):
+        self.names = [p[0] for p in pois]
+        types = [PLACE_TYPES.index(p[1]) for p in pois]
+        lats = [float(p[2]) for p in pois]
+        lons = [float(p[3]) for p in pois]
+        if np is not None:
+            self.types = np.asarray(types, dtype=np.uint8)
+            self.lats = np.asarray(lats, dtype=np.float64)
+            self.lons = np.asarray(lons, dtype=np.float64)
+        else:
+            self.types, self.lats, self.lons = types, lats, lons
+
+    def matches(self, dists, limit_m, type_codes, k=None):
+        """Positions with distance <= limit_m and an allowed type (only the k closest if given)."""
+        if np is not None:
+            mask = dists <= limit_m
+            if type_codes is not None:
+                mask &= np.isin(self.types, type_codes)
+            positions = np.flatnonzero(mask)
+            if k is not None and len(positions) > k:
+                positions = positions[np.argpartition(dists[positions], k - 1)[:k]]
+            return positions.tolist()
+        positions = [i for i, d in enumerate(dists)
+                     if d <= limit_m and (type_codes is None or self.types[i] in type_codes)]
+        if k is not None and len(positions) > k:
+            positions = heapq.nsmallest(k, positions, key=lambda i: dists[i])
+        return positions
+
+    def poi(self, i, dist):
+        return (float(dist), self.names[i], PLACE_TYPES[self.types[i]],
+                float(self.lats[i]), float(self.lons[i]))
+
+
+class PoiIndex:
+    """
+    Grid index of wellness POIs over slippy-map cells at `zoom`.
+
+    Each cell keeps its POIs as column arrays with the category already
+    classified, so queries only do distance math over the cells they touch.
+    Data arrives in whole tiles (`load_tile`, at the tile cache zoom or
+    coarser) or from an extract (`load_extract`). Queries return
+    (distance_m, name, type, lat, lon) tuples.
+
+    Fetched tiles are evicted like the tile cache: least recently used
+    beyond `max_tiles`, and once older than `ttl` seconds (None = no limit).
+    Extract tiles never expire and are never evicted.
+    """
+
+    def __init__(self, zoom=DEFAULT_ZOOM + 1, max_tiles=None, ttl=None):
+        self.zoom = zoom
+        self.max_tiles = max_tiles
+        self.ttl = ttl
+        self._cells = {}
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._x_range = self._y_range = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    # --- LOADING ---
+
+    def load_tile(self, tile, pois, loaded_at=None):
+        """Replaces everything inside `tile` (zoom <= index zoom) with `pois`."""
+        grouped = {cell: [] for cell in self._cells_of(tile)}
+        for poi in pois:
+            cell = tile_for(poi[2], poi[3], self.zoom)
+            if cell in grouped:
+                grouped[cell].append(poi)
+
+        with self._lock:
+            for cell, cell_pois in grouped.items():
+                old = self._cells.pop(cell, None)
+                if old is not None:
+                    self._count -= len(old.names)
+                if cell_pois:
+                    self._cells[cell] = _Cell(cell_pois)
+                    self._count += len(cell_pois)
+                    self._extend_range(cell)
+            self._tiles[tile] = time.time() if loaded_at is None else loaded_at
+            self._tiles.move_to_end(tile)
+            self._evict()
+
+    def has_tile(self, tile, max_age=None):
+        """Whether `tile` is loaded and fresh; counts as a use for the LRU."""
+        with self._lock:
+            loaded_at = self._tiles.get(tile)
+            if loaded_at is None:
+                return False
+            self._tiles.move_to_end(tile)
+        return max_age is None or time.time() - loaded_at <= max_age
+
+    def drop_tile(self, tile):
+        with self._lock:
+            self._drop(tile)
+
+    def load_extract(self, path, tile_zoom=DEFAULT_ZOOM):
+        """
+        Bulk-loads an Overpass JSON dump (`out center`) or an .osm XML extract.
+        Extract tiles never expire, so the request path will not refetch them.
+        """
+        pois = read_overpass_json(path) if path.endswith(".json") else read_osm_xml(path)
+        by_tile = {}
+        for poi in pois:
+            by_tile.setdefault(tile_for(poi[2], poi[3], tile_zoom), []).append(poi)
+        for tile, tile_pois in by_tile.items():
+            self.load_tile(tile, tile_pois, loaded_at=float("inf"))
+        print(f"🗺️  Indexed {len(pois)} POIs from {path} ({len(by_tile)} tiles)")
+        return len(pois)
+
+    # --- QUERIES ---
+
+    def within(self, lat, lon, radius_m, types=None, tile=None):
+        """Every POI within `radius_m` of a point, unordered, optionally only inside `tile`."""
+        type_codes = self._type_codes(types)
+        cells = tiles_covering(lat, lon, radius_m, self.zoom)
+        if tile is not None:
+            tz, tx, ty = tile
+            shift = self.zoom - tz
+            cells = [c for c in cells if c[1] >> shift == tx and c[2] >> shift == ty]
+
+        results = []
+        for cell in cells:
+            data = self._cells.get(cell)
+            if data is not None:
+                dists = haversine_many(lat, lon, data.lats, data.lons)
+                results.extend(data.poi(i, dists[i]) for i in data.matches(dists, radius_m, type_codes))
+        return results
+
+    def within_bbox(self, south, west, north, east, types=None):
+        """Every POI inside a lat/lon box, with distance measured from its center."""
+        type_codes = self._type_codes(types)
+        clat, clon = (south + north) / 2, (west + east) / 2
+        _, x0, y0 = tile_for(north, west, self.zoom)
+        _, x1, y1 = tile_for(south, east, self.zoom)
+
+        results = []
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                data = self._cells.get((self.zoom, x, y))
+                if data is None:
+                    continue
+                dists = haversine_many(clat, clon, data.lats, data.lons)
+                for i in data.matches(dists, float("inf"), type_codes):
+                    if south <= data.lats[i] <= north and west <= data.lons[i] <= east:
+                        results.append(data.poi(i, dists[i]))
+        return results
+
+    def nearest(self, lat, lon, k, max_radius_m=None, types=None):
+        """
+        The k nearest POIs, closest first. Searches rings of cells outward
+        from the query point and stops as soon as no unvisited ring can hold
+        anything closer than the current k-th result.
+        """
+        if k <= 0 or not self._cells:
+            return []
+        type_codes = self._type_codes(types)
+        limit_m = float("inf") if max_radius_m is None else max_radius_m
+        cell_m = EQUATOR_M * math.cos(math.radians(lat)) / 2 ** self.zoom
+        _, cx, cy = tile_for(lat, lon, self.zoom)
+        max_ring = self._max_ring(cx, cy)
+
+        best = []
+        ring = 0
+        while ring <= max_ring:
+            for cell in self._ring(cx, cy, ring):
+                data = self._cells.get(cell)
+                if data is None:
+                    continue
+                dists = haversine_many(lat, lon, data.lats, data.lons)
+                best.extend(data.poi(i, dists[i]) for i in data.matches(dists, limit_m, type_codes, k))
+            if len(best) > k:
+                best = heapq.nsmallest(k, best)
+
+            # Everything in ring + 1 is at least `ring` whole cells away
+            reach = ring * cell_m
+            if (len(best) >= k and max(best)[0] <= reach) or reach > limit_m:
+                break
+            ring += 1
+        return sorted(best)
+
+    # --- INTERNALS ---
+
+    def _cells_of(self, tile):
+        tz, tx, ty = tile
+        scale = 2 ** (self.zoom - tz)
+        return [(self.zoom, x, y)
+                for x in range(tx * scale, (tx + 1) * scale)
+                for y in range(ty * scale, (ty + 1) * scale)]
+
+    def _drop(self, tile):
+        # Lock held
+        if self._tiles.pop(tile, None) is None:
+            return
+        for cell in self._cells_of(tile):
+            old = self._cells.pop(cell, None)
+            if old is not None:
+                self._count -= len(old.names)
+
+    def _evict(self):
+        # Lock held. Extract tiles (loaded_at = inf) are pinned.
+        cutoff = None if self.ttl is None else time.time() - self.ttl
+        evictable = []
+        for tile, loaded_at in list(self._tiles.items()):
+            if loaded_at == float("inf"):
+                continue
+            if cutoff is not None and loaded_at < cutoff:
+                self._drop(tile)
+            else:
+                evictable.append(tile)
+        if self.max_tiles is not None:
+            for tile in evictable[:max(len(evictable) - self.max_tiles, 0)]:
+                self._drop(tile)
+
+    def _type_codes(self, types):
+        if not types:
+            return None
+        codes = [PLACE_TYPES.index(t) for t in types if t in PLACE_TYPES]
+        return np.asarray(codes, dtype=np.uint8) if np is not None else set(codes)
+
+    def _ring(self, cx, cy, ring):
+        if ring == 0:
+            yield (self.zoom, cx, cy)
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield (self.zoom, x, cy - ring)
+            yield (self.zoom, x, cy + ring)
+        for y in range(cy - ring + 1, cy + ring):
+            yield (self.zoom, cx - ring, y)
+            yield (self.zoom, cx + ring, y)
+
+    def _extend_range(self, cell):
+        _, x, y = cell
+        if self._x_range is None:
+            self._x_range, self._y_range = [x, x], [y, y]
+            return
+        self._x_range = [min(self._x_range[0], x), max(self._x_range[1], x)]
+        self._y_range = [min(self._y_range[0], y), max(self._y_range[1], y)]
+
+    def _max_ring(self, cx, cy):
+        return max(abs(cx - self._x_range[0]), abs(cx - self._x_range[1]),
+                   abs(cy - self._y_range[0]), abs(cy - self._y_range[1]))
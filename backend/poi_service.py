@@ -1,96 +1,225 @@
-import requests
+import asyncio
 import math
+import os
+
+from geo import haversine_many, np, smallest_k
+from overpass_client import AsyncOverpassClient, OverpassClient
+from poi_index import PoiIndex, element_to_poi
+from tile_cache import TileCache, default_cache_path, tile_bounds, tile_for, tiles_covering, union_bounds
 
 # Overpass API (The standard API for querying OpenStreetMap data)
-OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+OVERPASS_URL = os.getenv("OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+
+# One pooled client for every upstream call: timeouts, a per-query deadline, retries, circuit breaker
+OVERPASS = OverpassClient(
+    OVERPASS_URL,
+    connect_timeout=float(os.getenv("OVERPASS_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.getenv("OVERPASS_READ_TIMEOUT", 5)),
+    deadline=float(os.getenv("OVERPASS_DEADLINE", 10)),
+    retries=int(os.getenv("OVERPASS_RETRIES", 3)),
+)
+ASYNC_OVERPASS = AsyncOverpassClient(OVERPASS, concurrency=int(os.getenv("OVERPASS_CONCURRENCY", 2)))
+
+# Wellness spots are cached per map tile, on disk, across restarts
+TILE_CACHE = TileCache(
+    path=default_cache_path(),
+    ttl=int(os.getenv("POI_CACHE_TTL", 86400)),
+    max_tiles=int(os.getenv("POI_CACHE_TILES", 2048)),
+)
+
+# Classified POIs for the tiles in use (or from POI_EXTRACT_PATH), evicted like TILE_CACHE
+POI_INDEX = PoiIndex(max_tiles=TILE_CACHE.max_tiles, ttl=TILE_CACHE.ttl)
+if os.getenv("POI_EXTRACT_PATH"):
+    POI_INDEX.load_extract(os.getenv("POI_EXTRACT_PATH"))
 
-def get_wellness_locations(user_lat, user_lon, radius_meters=3000):
+def build_query(area):
     """
-    Fetches specific wellness locations (Water, Views, Nature) around the user.
-    Default radius is 3km to ensure we find good spots.
+    The 'Serenity' Overpass query over an area filter, either
+    "around:<radius>,<lat>,<lon>" or "<south>,<west>,<north>,<east>".
+    We look for nodes (points) and ways (areas) matching our tags.
     """
-    
-    # 1. Define the Query
-    # We look for nodes (points) and ways (areas) matching our 'Serenity' tags.
-    query = f"""
-    [out:json][timeout:25];
+    return f"""
+    [out:json][timeout:{math.ceil(OVERPASS.deadline)}];
     (
       // 1. BLUE SPACES (Water)
-      node["natural"="water"](around:{radius_meters},{user_lat},{user_lon});
-      way["natural"="water"](around:{radius_meters},{user_lat},{user_lon});
-      node["natural"="beach"](around:{radius_meters},{user_lat},{user_lon});
-      way["waterway"="riverbank"](around:{radius_meters},{user_lat},{user_lon});
-      node["leisure"="marina"](around:{radius_meters},{user_lat},{user_lon});
+      node["natural"="water"]({area});
+      way["natural"="water"]({area});
+      node["natural"="beach"]({area});
+      way["waterway"="riverbank"]({area});
+      node["leisure"="marina"]({area});
 
       // 2. SCENIC VIEWPOINTS
-      node["tourism"="viewpoint"](around:{radius_meters},{user_lat},{user_lon});
-      node["natural"="peak"](around:{radius_meters},{user_lat},{user_lon});
+      node["tourism"="viewpoint"]({area});
+      node["natural"="peak"]({area});
 
       // 3. NATURE & FOREST (Green)
-      way["landuse"="forest"](around:{radius_meters},{user_lat},{user_lon});
-      way["natural"="wood"](around:{radius_meters},{user_lat},{user_lon});
-      way["leisure"="nature_reserve"](around:{radius_meters},{user_lat},{user_lon});
-      way["leisure"="park"](around:{radius_meters},{user_lat},{user_lon});
+      way["landuse"="forest"]({area});
+      way["natural"="wood"]({area});
+      way["leisure"="nature_reserve"]({area});
+      way["leisure"="park"]({area});
     );
     out center;
     """
 
-    try:
-        print(f"🔎 Searching for wellness spots within {radius_meters}m...")
-        response = requests.get(OVERPASS_URL, params={'data': query})
-        data = response.json()
-        
-        places = []
-        
-        for element in data.get('elements', []):
-            tags = element.get('tags', {})
-            name = tags.get('name')
-            
-            # Skip unnamed places (we want named destinations)
-            if not name:
-                continue
+def fetch_tiles(tiles):
+    """
+    Fetches the missing tiles with one Overpass query over their combined
+    bounding box, then files every element under the tile holding its point.
+    """
+    south, west, north, east = union_bounds(tiles)
+    print(f"🔎 Fetching wellness spots for {len(tiles)} tile(s) from Overpass...")
+    data = OVERPASS.query(build_query(f"{south},{west},{north},{east}"))
+    return split_by_tile(data, tiles)
 
-            # Get Coordinates (Center of the shape or the point itself)
-            lat = element.get('lat') or element.get('center', {}).get('lat')
-            lon = element.get('lon') or element.get('center', {}).get('lon')
-            
-            if not lat or not lon:
-                continue
+def fetch_tiles_concurrently(tiles):
+    """
+    Fetches every tile with its own Overpass query, a few at a time. Tiles
+    that fail are left out (and stay uncached) instead of failing the batch.
+    """
+    queries = {}
+    for tile in tiles:
+        south, west, north, east = tile_bounds(tile)
+        queries[tile] = build_query(f"{south},{west},{north},{east}")
+
+    print(f"🔎 Fetching {len(tiles)} tile(s) from Overpass concurrently...")
+    by_tile = {}
+    for tile, result in asyncio.run(ASYNC_OVERPASS.query_many(queries)).items():
+        if isinstance(result, Exception):
+            print(f"⚠️ Tile {tile} failed: {result}")
+            continue
+        by_tile.update(split_by_tile(result, [tile]))
+    return by_tile
 
-            # Determine Type for UI Icons
-            place_type = "Nature" # Default
-            if "water" in tags.get("natural", "") or "beach" in tags.get("natural", "") or "waterway" in tags:
-                place_type = "Water"
-            elif "viewpoint" in tags.get("tourism", "") or "peak" in tags.get("natural", ""):
-                place_type = "Viewpoint"
-            
-            # Calculate distance for sorting
-            dist = haversine(user_lat, user_lon, lat, lon)
-            
-            places.append({
-                "name": name,
-                "type": place_type,
-                "lat": lat,
-                "lon": lon,
-                "distance_km": round(dist, 2)
-            })
-
-        # Sort by distance (closest first)
-        places.sort(key=lambda x: x['distance_km'])
-        
-        # Deduplicate by name (sometimes OSM returns multiple nodes for one park)
-        unique_places = []
-        seen_names = set()
-        for p in places:
-            if p['name'] not in seen_names:
-                unique_places.append(p)
-                seen_names.add(p['name'])
-                
-        return unique_places[:10]  # Return top 10 results
+def split_by_tile(data, tiles):
+    # Classify once here, so neither the cache nor the request path parses tags
+    by_tile = {tile: [] for tile in tiles}
+    zoom = tiles[0][0]
+    for element in data.get('elements', []):
+        poi = element_to_poi(element)
+        if poi is None:
+            continue
+
+        tile = tile_for(poi[2], poi[3], zoom)
+        if tile in by_tile:
+            by_tile[tile].append(list(poi))
+    return by_tile
+
+def fetch_missing_tiles(tiles):
+    """A single tile goes out as one query; several are fetched concurrently, one query each."""
+    if len(tiles) > 1:
+        return fetch_tiles_concurrently(tiles)
+    return fetch_tiles(tiles)
+
+def ensure_tiles(tiles):
+    """
+    Loads any tile that is missing or expired in POI_INDEX from the tile cache / Overpass.
+    Returns the tiles that could not be loaded (upstream failure or open circuit).
+    """
+    stale = [t for t in tiles if not POI_INDEX.has_tile(t, max_age=TILE_CACHE.ttl)]
+    if not stale:
+        return []
+    found = TILE_CACHE.lookup(stale, fetch_missing_tiles)
+    for tile, pois in found.items():
+        POI_INDEX.load_tile(tile, [poi for poi in map(element_to_poi, pois) if poi])
+    return [t for t in stale if t not in found]
+
+def get_wellness_locations(user_lat, user_lon, radius_meters=3000, limit=10, types=None):
+    """
+    Fetches specific wellness locations (Water, Views, Nature) around the user.
+    Default radius is 3km to ensure we find good spots.
+
+    Answers come from the local POI index; only map tiles that are missing
+    or expired are loaded from the tile cache or Overpass first. Returns None
+    when part of the radius could not be loaded, so callers do not mistake
+    an upstream outage for an area without wellness spots.
+    """
+    try:
+        unavailable = ensure_tiles(tiles_covering(user_lat, user_lon, radius_meters))
+        if unavailable:
+            print(f"⚠️ {len(unavailable)} tile(s) unavailable, no answer for ({user_lat}, {user_lon})")
+            return None
+        hits = POI_INDEX.within(user_lat, user_lon, radius_meters, types)
+        return nearest_places(user_lat, user_lon, [hit[1:] for hit in hits], limit)
 
     except Exception as e:
         print(f"❌ Error fetching POIs: {e}")
-        return []
+        return None
+
+def indexed_pois(lat, lon, radius_meters, types=None):
+    """(name, type, lat, lon) of the POIs already in POI_INDEX around a point - never fetches."""
+    return [hit[1:] for hit in POI_INDEX.within(lat, lon, radius_meters, types)]
+
+def stream_wellness_locations(user_lat, user_lon, radius_meters=3000, limit=10, types=None):
+    """
+    Yields wellness spots tile by tile instead of waiting for the whole radius.
+
+    Tiles are visited nearest first. Indexed and cached tiles are answered
+    straight away; the rest are fetched concurrently and emitted in the order
+    Overpass answers. Within a tile places come closest first, so the output
+    is only roughly sorted overall. Names are deduplicated across tiles and at
+    most `limit` places are yielded.
+    """
+    tiles = sorted(tiles_covering(user_lat, user_lon, radius_meters),
+                   key=lambda t: _distance_to_tile(user_lat, user_lon, t))
+    seen = set()
+
+    def places_in(tile):
+        hits = POI_INDEX.within(user_lat, user_lon, radius_meters, types, tile=tile)
+        for place in nearest_places(user_lat, user_lon, [hit[1:] for hit in hits], limit):
+            if place["name"] not in seen and len(seen) < limit:
+                seen.add(place["name"])
+                yield place
+
+    missing = []
+    for tile in tiles:
+        if not POI_INDEX.has_tile(tile, max_age=TILE_CACHE.ttl):
+            cached = TILE_CACHE.get(tile)
+            if cached is None:
+                missing.append(tile)
+                continue
+            POI_INDEX.load_tile(tile, [poi for poi in map(element_to_poi, cached) if poi])
+        yield from places_in(tile)
+        if len(seen) >= limit:
+            return
+
+    if not missing:
+        return
+
+    queries = {}
+    for tile in missing:
+        south, west, north, east = tile_bounds(tile)
+        queries[tile] = build_query(f"{south},{west},{north},{east}")
+
+    print(f"🔎 Streaming {len(missing)} tile(s) from Overpass...")
+    for tile, result in _iterate_async(ASYNC_OVERPASS.as_completed(queries)):
+        if isinstance(result, Exception):
+            print(f"⚠️ Tile {tile} failed: {result}")
+            continue
+        by_tile = split_by_tile(result, [tile])
+        TILE_CACHE.put_many(by_tile)
+        POI_INDEX.load_tile(tile, by_tile[tile])
+        yield from places_in(tile)
+        if len(seen) >= limit:
+            return
+
+def _iterate_async(async_gen):
+    """Drives an async generator from synchronous code (e.g. a Flask streaming response)."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        loop.close()
+
+def _distance_to_tile(lat, lon, tile):
+    south, west, north, east = tile_bounds(tile)
+    nearest_lat = min(max(lat, south), north)
+    nearest_lon = min(max(lon, west), east)
+    return haversine(lat, lon, nearest_lat, nearest_lon)
 
 def haversine(lat1, lon1, lat2, lon2):
     """
@@ -105,4 +234,66 @@ def haversine(lat1, lon1, lat2, lon2):
          math.sin(dLon / 2) * math.sin(dLon / 2))
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     d = R * c
-    return d
\ No newline at end of file
+    return d
+
+def haversine_batch(user_lat, user_lon, lats, lons):
+    """
+    Vectorized haversine: distances in km from the user to every point in
+    `lats` / `lons`. Backed by NumPy, with a pure-Python fallback.
+    """
+    return haversine_many(user_lat, user_lon, lats, lons, radius=6371)
+
+def nearest_places(user_lat, user_lon, candidates, limit=10, max_km=None):
+    """
+    Picks the `limit` closest of (name, type, lat, lon) candidates, keeping only
+    the closest entry per name (OSM often returns several nodes for one park).
+    Distances come from one batched call and only the top few get sorted
+    and deduplicated. Candidates further than `max_km` are dropped.
+    """
+    if not candidates:
+        return []
+
+    dists = haversine_batch(user_lat, user_lon,
+                            [c[2] for c in candidates], [c[3] for c in candidates])
+
+    places = []
+    for i in nearest_per_name([c[0] for c in candidates], dists, limit, max_km):
+        name, place_type, lat, lon = candidates[i]
+        places.append({
+            "name": name,
+            "type": place_type,
+            "lat": lat,
+            "lon": lon,
+            "distance_km": round(float(dists[i]), 2)
+        })
+    return places
+
+def nearest_per_name(names, dists, limit, max_km=None):
+    """
+    Indices of the `limit` closest candidates with distinct names, nearest
+    first. Takes a partial top-k (over-fetched, since several entries can
+    share a name) and deduplicates only those, walking them nearest first so
+    the first entry seen for a name is its closest. Fetches more if the top-k
+    held too few names.
+    """
+    if np is not None:
+        dists = np.asarray(dists, dtype=np.float64)
+        idx = np.arange(len(dists)) if max_km is None else np.flatnonzero(dists <= max_km)
+        in_range = dists[idx]
+    else:
+        idx = [i for i, d in enumerate(dists) if max_km is None or d <= max_km]
+        in_range = [dists[i] for i in idx]
+
+    fetch = limit * 4
+    while True:
+        seen, picked = set(), []
+        for k in smallest_k(in_range, fetch):
+            i = int(idx[k])
+            if names[i] not in seen:
+                seen.add(names[i])
+                picked.append(i)
+                if len(picked) == limit:
+                    return picked
+        if fetch >= len(idx):
+            return picked
+        fetch *= 4
@@ -0,0 +1,52 @@
+import random
+from array import array
+
+
+def sample_indices(n, k, rng):
+    """
+    Draws k distinct indices from range(n) in O(k) time and memory.
+
+    A Fisher-Yates shuffle that only runs k steps, with the swapped slots
+    kept in a dict instead of a full copy of the array.
+    """
+    k = min(k, n)
+    swaps = {}
+    picked = []
+    for i in range(k):
+        j = rng.randrange(i, n)
+        picked.append(swaps.get(j, j))
+        swaps[j] = swaps.get(i, i)
+    return picked
+
+
+class PoseSampler:
+    """
+    Preloaded index of the pose catalog for journey checkpoints.
+
+    Keeps one flat array of catalog positions per difficulty tag. A sample
+    is k random positions, so the cost depends on the number of checkpoints,
+    not the size of the catalog.
+    """
+
+    def __init__(self, poses):
+        self.poses = poses
+        self._by_tag = {}
+        for position, pose in enumerate(poses):
+            tag = (pose.get("difficulty_tag") or "").lower()
+            self._by_tag.setdefault(tag, array("I")).append(position)
+
+    def __len__(self):
+        return len(self.poses)
+
+    def sample(self, k, difficulty=None, seed=None):
+        """
+        Returns up to k distinct poses. The same seed over the same catalog
+        version always returns the same poses in the same order.
+        """
+        rng = random.Random(seed)
+        if difficulty:
+            positions = self._by_tag.get(difficulty.lower())
+            if not positions:
+                return []
+            return [self.poses[positions[i]] for i in sample_indices(len(positions), k, rng)]
+        return [self.poses[i] for i in sample_indices(len(self.poses), k, rng)]
@@ -0,0 +1,228 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from py_vapid import Vapid
+    from pywebpush import WebPusher
+except ImportError:  # Sending is refused until pywebpush is installed
+    Vapid = WebPusher = None
+
+# Push services answer these when the subscription is gone for good
+GONE_STATUSES = {404, 410}
+
+# VAPID JWTs may live up to 24 h; re-sign well before that
+VAPID_TOKEN_TTL = 12 * 3600
+VAPID_REFRESH_MARGIN = 600
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second on average with bursts of up to
+    `burst`; acquire() blocks until a token is free. Shared by every worker
+    thread, so it caps the dispatcher as a whole.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PushDispatcher:
+    """
+    Sends one message to many push subscriptions in the background.
+
+    - A bounded pool of worker threads sends in parallel; submit() only
+      queues the job and hands back its ID.
+    - One requests.Session per push service (FCM, Mozilla, Apple, ...) keeps
+      TLS connections open across sends.
+    - The VAPID header is signed once per push service and reused until it
+      nears expiry, instead of once per device.
+    - Subscriptions are deduplicated by endpoint; the ones the push service
+      reports gone (404/410) are passed to `on_gone` so they can be pruned.
+    - An optional TokenBucket (`rate_limit`) caps sends per second across
+      all jobs, so push services and the app see a steady trickle.
+    """
+
+    def __init__(self, vapid_private_key, vapid_claims, workers=16, timeout=10.0, ttl=86400, max_jobs=100,
+                 rate_limit=None):
+        self.vapid_private_key = vapid_private_key
+        self.vapid_claims = dict(vapid_claims or {})
+        self.workers = workers
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.rate_limit = rate_limit
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="push")
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._vapid = None
+        self._vapid_headers = {}
+        self._jobs = OrderedDict()
+        self._sent = self._failed = self._gone = 0
+
+    # --- jobs ---
+
+    def submit(self, subscriptions, message, on_gone=None):
+        """Queues a send to every subscription and returns the job ID."""
+        if WebPusher is None:
+            raise RuntimeError("pywebpush is not installed")
+        unique = list({sub["endpoint"]: sub for sub in subscriptions if sub.get("endpoint")}.values())
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "devices": len(unique),
+            "sent": 0,
+            "failed": 0,
+            "gone": 0,
+            "queued_at": time.time(),
+            "started_at": None,
+            "elapsed_s": None,
+            "per_second": None,
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, unique, message, on_gone),
+                         name=f"push-job-{job['job_id'][:8]}", daemon=True).start()
+        return job["job_id"]
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "push_services": len(self._sessions),
+                "jobs": len(self._jobs),
+                "running": sum(job["status"] == "running" for job in self._jobs.values()),
+                "sent": self._sent,
+                "failed": self._failed,
+                "gone": self._gone,
+            }
+
+    def _run(self, job, subscriptions, message, on_gone):
+        started = time.monotonic()
+        self._update(job, status="running", started_at=time.time())
+        gone = []
+        # Keep at most a couple of sends per worker queued, so a huge job
+        # does not park every subscription in the executor at once
+        slots = threading.BoundedSemaphore(self.workers * 2)
+
+        def send(sub):
+            try:
+                outcome = self._send(sub, message)
+            finally:
+                slots.release()
+            if outcome == "gone":
+                with self._lock:
+                    gone.append(sub["endpoint"])
+            self._count(job, outcome)
+
+        futures = []
+        for sub in subscriptions:
+            if self.rate_limit is not None:
+                self.rate_limit.acquire()
+            slots.acquire()
+            futures.append(self._pool.submit(send, sub))
+        for future in futures:
+            future.result()
+
+        if gone and on_gone:
+            try:
+                on_gone(gone)
+            except Exception as e:
+                print(f"⚠️  Could not prune {len(gone)} expired subscription(s): {e}")
+        elapsed = time.monotonic() - started
+        self._update(job, status="done", elapsed_s=round(elapsed, 2),
+                     per_second=round(len(subscriptions) / elapsed, 1) if elapsed else None)
+        print(f"🔔 Push job {job['job_id'][:8]}: {job['sent']} sent, {job['failed']} failed, "
+              f"{job['gone']} pruned in {job['elapsed_s']}s")
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _count(self, job, outcome):
+        with self._lock:
+            job[outcome] += 1
+            if outcome == "sent":
+                self._sent += 1
+            elif outcome == "gone":
+                self._gone += 1
+            else:
+                self._failed += 1
+
+    # --- sending ---
+
+    def _send(self, sub, message):
+        """'sent', 'gone' or 'failed' for one subscription."""
+        origin = _origin(sub["endpoint"])
+        try:
+            response = WebPusher(sub, requests_session=self._session(origin)).send(
+                message, headers=self._headers(origin), ttl=self.ttl, timeout=self.timeout
+            )
+        except Exception as e:
+            print(f"❌ Push failed: {e}")
+            return "failed"
+        if response.status_code in GONE_STATUSES:
+            return "gone"
+        if response.status_code > 202:
+            print(f"❌ Push failed: HTTP {response.status_code} from {origin}")
+            return "failed"
+        return "sent"
+
+    def _session(self, origin):
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[origin] = session
+            return session
+
+    def _headers(self, origin):
+        """VAPID Authorization header for one push service, cached until it nears expiry."""
+        now = time.time()
+        with self._lock:
+            cached = self._vapid_headers.get(origin)
+            if cached and cached[0] - VAPID_REFRESH_MARGIN > now:
+                return dict(cached[1])
+            if self._vapid is None:
+                self._vapid = Vapid.from_string(private_key=self.vapid_private_key)
+            expires = int(now) + VAPID_TOKEN_TTL
+            headers = self._vapid.sign({**self.vapid_claims, "aud": origin, "exp": expires})
+            self._vapid_headers[origin] = (expires, headers)
+            return dict(headers)
+
+
+def _origin(endpoint):
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
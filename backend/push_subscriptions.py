@@ -0,0 +1,337 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from db_helpers import MAX_PARAMS
+
+# Web Push subscriptions, one row per endpoint. Endpoints can run past SQL
+# Server's 900-byte index key limit, so rows are keyed by the SHA-256 of the
+# endpoint instead, which also makes an upsert a single primary-key seek.
+#
+# Each row carries the segment columns reminders are targeted by (UserID,
+# TimeZone, LastActiveAt), all indexed, so a segment query never scans every
+# subscriber, plus its ReminderSlot for the scheduler. The stores also keep
+# the scheduler's ReminderProgress. The SQL Server tables are created by
+# tables.py (sections J, K, M, N).
+
+SUBSCRIPTION_COLUMNS = "Endpoint, P256dh, Auth, UserID, TimeZone, LastActiveAt"
+
+# A subscriber's place in the reminder window, in SLOT_SCALE steps of the
+# window's length. SQL Server derives it from EndpointHash (tables.py, M).
+SLOT_SCALE = 1_000_000
+
+
+def endpoint_hash(endpoint):
+    return hashlib.sha256(endpoint.encode("utf-8")).digest()
+
+
+def reminder_slot(endpoint):
+    """The ReminderSlot column: the first 4 bytes of the endpoint hash, mod SLOT_SCALE."""
+    return int.from_bytes(endpoint_hash(endpoint)[:4], "big") % SLOT_SCALE
+
+
+def parse_subscription(info):
+    """
+    The browser's PushSubscription JSON -> {"endpoint", "keys": {"p256dh", "auth"}}.
+    Raises ValueError when a field is missing.
+    """
+    if not isinstance(info, dict):
+        raise ValueError("subscription must be an object")
+    endpoint = info.get("endpoint")
+    keys = info.get("keys") or {}
+    if not isinstance(endpoint, str) or not endpoint.startswith("https://"):
+        raise ValueError("endpoint must be an https URL")
+    if not keys.get("p256dh") or not keys.get("auth"):
+        raise ValueError("keys.p256dh and keys.auth are required")
+    return {"endpoint": endpoint, "keys": {"p256dh": keys["p256dh"], "auth": keys["auth"]}}
+
+
+def segment_filter(user_ids=None, timezones=None, active_since=None, inactive_since=None):
+    """(WHERE clause, params) for a segment query; every condition hits an index."""
+    clauses, params = [], []
+    if user_ids:
+        clauses.append(f"UserID IN ({', '.join('?' * len(user_ids))})")
+        params.extend(user_ids)
+    if timezones:
+        # None stands for subscribers that never sent a timezone
+        named = [tz for tz in timezones if tz is not None]
+        tz_clauses = [f"TimeZone IN ({', '.join('?' * len(named))})"] if named else []
+        if len(named) < len(timezones):
+            tz_clauses.append("TimeZone IS NULL")
+        clauses.append("(" + " OR ".join(tz_clauses) + ")")
+        params.extend(named)
+    if active_since is not None:
+        clauses.append("LastActiveAt >= ?")
+        params.append(active_since)
+    if inactive_since is not None:
+        clauses.append("(LastActiveAt < ? OR LastActiveAt IS NULL)")
+        params.append(inactive_since)
+    if len(params) > MAX_PARAMS:
+        raise ValueError(f"Segment has more than {MAX_PARAMS} parameters")
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def segment_filters(user_ids=None, timezones=None, active_since=None, inactive_since=None):
+    """
+    segment_filter() once per chunk of user_ids, so every query stays under
+    the parameter limit however many users a segment names.
+    """
+    if not user_ids:
+        return [segment_filter(None, timezones, active_since, inactive_since)]
+    user_ids = list(user_ids)
+    chunk_size = MAX_PARAMS - 100 - len(timezones or ())
+    if chunk_size <= 0:
+        raise ValueError(f"Segment has more than {MAX_PARAMS} parameters")
+    return [segment_filter(user_ids[start:start + chunk_size], timezones, active_since, inactive_since)
+            for start in range(0, len(user_ids), chunk_size)]
+
+
+def _row_to_subscription(row):
+    """Stored row -> subscription in the shape pywebpush expects, plus its segment fields."""
+    endpoint, p256dh, auth, user_id, timezone, last_active = row
+    return {
+        "endpoint": endpoint,
+        "keys": {"p256dh": p256dh, "auth": auth},
+        "user_id": user_id,
+        "timezone": timezone,
+        "last_active_at": last_active,
+    }
+
+
+class SqlSubscriptionStore:
+    """
+    PushSubscriptions in SQL Server, so every Gunicorn worker sees the same
+    subscribers. Connections come from the app's ConnectionPool.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def upsert(self, subscription, user_id=None, timezone=None):
+        """Inserts the subscription or refreshes it by endpoint hash. Returns True if new."""
+        values = self._values(subscription, user_id, timezone)
+        with self._cursor() as cursor:
+            cursor.execute("""
+                MERGE PushSubscriptions WITH (HOLDLOCK) AS target
+                USING (SELECT ? AS EndpointHash) AS source
+                ON target.EndpointHash = source.EndpointHash
+                WHEN MATCHED THEN
+                    UPDATE SET P256dh = ?, Auth = ?,
+                        UserID = COALESCE(?, target.UserID), TimeZone = COALESCE(?, target.TimeZone),
+                        LastActiveAt = ?, UpdatedAt = GETDATE()
+                WHEN NOT MATCHED THEN
+                    INSERT (EndpointHash, Endpoint, P256dh, Auth, UserID, TimeZone, LastActiveAt)
+                    VALUES (source.EndpointHash, ?, ?, ?, ?, ?, ?)
+                OUTPUT $action;
+            """, endpoint_hash(subscription["endpoint"]), *values[1:], *values)
+            return cursor.fetchone()[0] == "INSERT"
+
+    def segment(self, user_ids=None, timezones=None, active_since=None, inactive_since=None):
+        subscriptions = []
+        with self._cursor() as cursor:
+            for where, params in segment_filters(user_ids, timezones, active_since, inactive_since):
+                cursor.execute(f"SELECT {SUBSCRIPTION_COLUMNS} FROM PushSubscriptions {where}", *params)
+                subscriptions.extend(_row_to_subscription(row) for row in cursor.fetchall())
+        return subscriptions
+
+    def due(self, timezone, first_slot, end_slot):
+        """Subscribers in `timezone` (None = none sent) with first_slot <= ReminderSlot < end_slot."""
+        tz_clause, params = ("TimeZone = ?", [timezone]) if timezone is not None else ("TimeZone IS NULL", [])
+        with self._cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {SUBSCRIPTION_COLUMNS} FROM PushSubscriptions
+                WHERE {tz_clause} AND ReminderSlot >= ? AND ReminderSlot < ?
+            """, *params, first_slot, end_slot)
+            return [_row_to_subscription(row) for row in cursor.fetchall()]
+
+    def reminder_progress(self, timezone, day):
+        """Seconds of `day`'s reminder window already sent in `timezone`, or None."""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT SentUpto FROM ReminderProgress WHERE TimeZone = ? AND LocalDate = ?",
+                           timezone or "", day)
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def save_reminder_progress(self, timezone, day, upto):
+        """Records how far the window has been sent, and drops entries more than two days old."""
+        with self._cursor() as cursor:
+            cursor.execute("""
+                MERGE ReminderProgress WITH (HOLDLOCK) AS target
+                USING (SELECT ? AS TimeZone, ? AS LocalDate) AS source
+                ON target.TimeZone = source.TimeZone AND target.LocalDate = source.LocalDate
+                WHEN MATCHED THEN UPDATE SET SentUpto = ?, UpdatedAt = GETDATE()
+                WHEN NOT MATCHED THEN INSERT (TimeZone, LocalDate, SentUpto)
+                    VALUES (source.TimeZone, source.LocalDate, ?);
+                DELETE FROM ReminderProgress WHERE TimeZone = ? AND LocalDate < ?;
+            """, timezone or "", day, upto, upto, timezone or "", day - timedelta(days=2))
+
+    def timezones(self):
+        """{timezone: subscriber count}, read from the TimeZone index."""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT TimeZone, COUNT(*) FROM PushSubscriptions GROUP BY TimeZone")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def delete(self, endpoints):
+        """Removes subscriptions by endpoint, in chunks that stay under the parameter limit."""
+        hashes = [endpoint_hash(endpoint) for endpoint in endpoints]
+        chunk_size = MAX_PARAMS - 100
+        with self._cursor() as cursor:
+            for start in range(0, len(hashes), chunk_size):
+                chunk = hashes[start:start + chunk_size]
+                cursor.execute(
+                    f"DELETE FROM PushSubscriptions WHERE EndpointHash IN ({', '.join('?' * len(chunk))})", *chunk
+                )
+        return len(hashes)
+
+    @staticmethod
+    def _values(subscription, user_id, timezone):
+        return (subscription["endpoint"], subscription["keys"]["p256dh"], subscription["keys"]["auth"],
+                user_id, timezone, datetime.now())
+
+    def _cursor(self):
+        return _PooledCursor(self.pool)
+
+
+class _PooledCursor:
+    """Checks a connection out for one unit of work and commits it on success."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.pool.release(self.conn, discard=exc_type is not None)
+
+
+class SqliteSubscriptionStore:
+    """
+    The same registry in a local SQLite file, for deployments without SQL
+    Server. WAL mode lets every worker process on the host share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS PushSubscriptions (
+                EndpointHash BLOB PRIMARY KEY,
+                Endpoint TEXT NOT NULL,
+                P256dh TEXT NOT NULL,
+                Auth TEXT NOT NULL,
+                UserID INTEGER,
+                TimeZone TEXT,
+                LastActiveAt TEXT,
+                CreatedAt TEXT DEFAULT CURRENT_TIMESTAMP,
+                ReminderSlot INTEGER
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS IX_PushSubscriptions_User ON PushSubscriptions (UserID);
+            CREATE INDEX IF NOT EXISTS IX_PushSubscriptions_TimeZone ON PushSubscriptions (TimeZone, LastActiveAt);
+            CREATE INDEX IF NOT EXISTS IX_PushSubscriptions_LastActive ON PushSubscriptions (LastActiveAt);
+            CREATE TABLE IF NOT EXISTS ReminderProgress (
+                TimeZone TEXT NOT NULL,
+                LocalDate TEXT NOT NULL,
+                SentUpto REAL NOT NULL,
+                PRIMARY KEY (TimeZone, LocalDate)
+            ) WITHOUT ROWID;
+        """)
+        # Files from before ReminderSlot: add the column and fill it in
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(PushSubscriptions)")]
+        if "ReminderSlot" not in columns:
+            self._db.execute("ALTER TABLE PushSubscriptions ADD COLUMN ReminderSlot INTEGER")
+            self._db.executemany(
+                "UPDATE PushSubscriptions SET ReminderSlot = ? WHERE EndpointHash = ?",
+                [(reminder_slot(endpoint), key)
+                 for key, endpoint in self._db.execute("SELECT EndpointHash, Endpoint FROM PushSubscriptions")]
+            )
+        self._db.execute("CREATE INDEX IF NOT EXISTS IX_PushSubscriptions_Slot ON PushSubscriptions (TimeZone, ReminderSlot)")
+        self._db.commit()
+
+    def upsert(self, subscription, user_id=None, timezone=None):
+        endpoint, p256dh, auth = subscription["endpoint"], subscription["keys"]["p256dh"], subscription["keys"]["auth"]
+        key = endpoint_hash(endpoint)
+        now = _iso(datetime.now())
+        with self._lock:
+            new = self._db.execute("SELECT 1 FROM PushSubscriptions WHERE EndpointHash = ?", (key,)).fetchone() is None
+            self._db.execute("""
+                INSERT INTO PushSubscriptions (EndpointHash, Endpoint, P256dh, Auth, UserID, TimeZone, LastActiveAt,
+                                               ReminderSlot)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (EndpointHash) DO UPDATE SET
+                    P256dh = excluded.P256dh, Auth = excluded.Auth,
+                    UserID = COALESCE(excluded.UserID, UserID), TimeZone = COALESCE(excluded.TimeZone, TimeZone),
+                    LastActiveAt = excluded.LastActiveAt
+            """, (key, endpoint, p256dh, auth, user_id, timezone, now, reminder_slot(endpoint)))
+            self._db.commit()
+        return new
+
+    def segment(self, user_ids=None, timezones=None, active_since=None, inactive_since=None):
+        rows = []
+        with self._lock:
+            for where, params in segment_filters(user_ids, timezones, _iso(active_since), _iso(inactive_since)):
+                rows.extend(self._db.execute(
+                    f"SELECT {SUBSCRIPTION_COLUMNS} FROM PushSubscriptions {where}", params
+                ).fetchall())
+        return [_row_to_subscription(row) for row in rows]
+
+    def due(self, timezone, first_slot, end_slot):
+        tz_clause, params = ("TimeZone = ?", [timezone]) if timezone is not None else ("TimeZone IS NULL", [])
+        with self._lock:
+            rows = self._db.execute(f"""
+                SELECT {SUBSCRIPTION_COLUMNS} FROM PushSubscriptions
+                WHERE {tz_clause} AND ReminderSlot >= ? AND ReminderSlot < ?
+            """, [*params, first_slot, end_slot]).fetchall()
+        return [_row_to_subscription(row) for row in rows]
+
+    def reminder_progress(self, timezone, day):
+        with self._lock:
+            row = self._db.execute("SELECT SentUpto FROM ReminderProgress WHERE TimeZone = ? AND LocalDate = ?",
+                                   (timezone or "", day.isoformat())).fetchone()
+        return row[0] if row else None
+
+    def save_reminder_progress(self, timezone, day, upto):
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO ReminderProgress (TimeZone, LocalDate, SentUpto) VALUES (?, ?, ?)
+                ON CONFLICT (TimeZone, LocalDate) DO UPDATE SET SentUpto = excluded.SentUpto
+            """, (timezone or "", day.isoformat(), upto))
+            self._db.execute("DELETE FROM ReminderProgress WHERE TimeZone = ? AND LocalDate < ?",
+                             (timezone or "", (day - timedelta(days=2)).isoformat()))
+            self._db.commit()
+
+    def timezones(self):
+        with self._lock:
+            rows = self._db.execute("SELECT TimeZone, COUNT(*) FROM PushSubscriptions GROUP BY TimeZone").fetchall()
+        return dict(rows)
+
+    def delete(self, endpoints):
+        with self._lock:
+            self._db.executemany("DELETE FROM PushSubscriptions WHERE EndpointHash = ?",
+                                 [(endpoint_hash(endpoint),) for endpoint in endpoints])
+            self._db.commit()
+        return len(endpoints)
+
+
+def _iso(value):
+    return value.isoformat(sep=" ", timespec="seconds") if isinstance(value, datetime) else value
+
+
+def store_from_env(pool):
+    """SQLite at PUSH_STORE_PATH when set, otherwise the shared SQL Server table."""
+    path = os.getenv("PUSH_STORE_PATH")
+    if path:
+        return SqliteSubscriptionStore(path)
+    return SqlSubscriptionStore(pool)
@@ -33,6 +33,12 @@ def add_table():
             END
             ELSE
                 PRINT '⚠️ WalkReflections already exists.';
+
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WalkReflections_WalkID')
+            BEGIN
+                CREATE INDEX IX_WalkReflections_WalkID ON WalkReflections (WalkID);
+                PRINT '✅ Created IX_WalkReflections_WalkID.';
+            END
         """)
         conn.commit()
     except Exception as e:
@@ -0,0 +1,192 @@
+import math
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from push_subscriptions import SLOT_SCALE
+
+# Subscribers without a timezone get their reminder on this clock
+DEFAULT_TIMEZONE = "UTC"
+
+# Slots missed by more than this (scheduler down, long stall) are dropped
+# rather than sent at the wrong time of day
+MAX_LATE = timedelta(minutes=15)
+
+
+class ReminderScheduler:
+    """
+    Sends the daily reminder at each subscriber's local time instead of to
+    everyone at once.
+
+    Every `tick` seconds, each timezone whose local clock is inside the
+    delivery window (`local_time` plus `window_minutes`) gets one batch. A
+    subscriber's place in the window is fixed by its endpoint hash (the
+    stored ReminderSlot), so a batch is one index range read of the
+    subscribers whose slot came up since the last tick, and the load spreads
+    evenly over the window. Subscribers whose user has already logged a
+    walk that local day are skipped. How far each window has been sent is
+    saved through the store once a batch is submitted, so a restart resumes
+    where the last process stopped instead of sending slots twice.
+
+    Batches go to the PushDispatcher (whose token bucket caps the overall
+    send rate). The last `history` batches are kept for stats(), which adds
+    each job's progress, lag behind its slot and throughput.
+    """
+
+    def __init__(self, store, dispatcher, message, walked_since, local_time="18:00",
+                 window_minutes=60, tick=30, history=200, on_gone=None):
+        hour, minute = (int(part) for part in local_time.split(":"))
+        if not 0 < window_minutes <= 24 * 60:
+            raise ValueError("window_minutes must be between 1 and 1440")
+        self.store = store
+        self.dispatcher = dispatcher
+        self.message = message
+        self.walked_since = walked_since
+        self.start_offset = timedelta(hours=hour, minutes=minute)
+        self.window = timedelta(minutes=window_minutes)
+        self.tick = tick
+        self.on_gone = on_gone
+        self._batches = deque(maxlen=history)
+        self._progress = {}  # timezone -> (window date, seconds already sent), mirrors ReminderProgress
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="reminder-scheduler", daemon=True)
+            self._thread.start()
+            print(f"⏰ Reminder scheduler running: {self.start_offset} local, {self.window} window")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Reminder tick failed: {e}")
+
+    # --- scheduling ---
+
+    def run_once(self, now=None):
+        """Sends every batch that is due at `now` (an aware datetime). Returns the batches."""
+        now = now or datetime.now().astimezone()
+        sent = []
+        for timezone in self.store.timezones():
+            batch = self._due(timezone, now)
+            if batch is not None:
+                sent.append(batch)
+        return sent
+
+    def _due(self, timezone, now):
+        tz = _zone(timezone)
+        local_now = now.astimezone(tz)
+        window_start = datetime.combine(local_now.date(), datetime.min.time(), tz) + self.start_offset
+        elapsed = (local_now - window_start).total_seconds()
+        if elapsed < 0:
+            # Before today's window - possibly still inside yesterday's, if it runs past midnight
+            window_start = datetime.combine(local_now.date() - timedelta(days=1), datetime.min.time(), tz) \
+                + self.start_offset
+            elapsed = (local_now - window_start).total_seconds()
+        window_s = self.window.total_seconds()
+        day = window_start.date()
+        if elapsed - MAX_LATE.total_seconds() >= window_s:
+            return None
+
+        # Resume where the last tick (of this process or the one before a
+        # restart) stopped. Slots that came up more than MAX_LATE ago
+        # (scheduler down, long stall) are skipped
+        date, done = self._progress.get(timezone, (None, 0.0))
+        if date != day:
+            done = self.store.reminder_progress(timezone, day) or 0.0
+            self._progress[timezone] = (day, done)
+        done = max(done, elapsed - MAX_LATE.total_seconds())
+        if done >= window_s:
+            return None
+        upto = min(elapsed, window_s)
+        if upto <= done:
+            return None
+
+        due = self.store.due(timezone, _slot_bound(done, window_s), _slot_bound(upto, window_s))
+        if not due:
+            self._advance(timezone, day, upto)
+            return None
+
+        user_ids = {sub["user_id"] for sub in due if sub["user_id"] is not None}
+        midnight = datetime.combine(day, datetime.min.time(), tz)
+        walked = self.walked_since(user_ids, midnight) if user_ids else set()
+        recipients = [sub for sub in due if sub["user_id"] not in walked]
+
+        batch = {
+            "timezone": timezone or "unknown",
+            "local_date": day.isoformat(),
+            "slot_end": (window_start + timedelta(seconds=upto)).isoformat(),
+            "due": len(due),
+            "skipped_walked": len(due) - len(recipients),
+            "job_id": None,
+        }
+        if recipients:
+            batch["job_id"] = self.dispatcher.submit(recipients, self.message, on_gone=self.on_gone)
+        # Only now: if anything above raised, the next tick retries the same slots
+        self._advance(timezone, day, upto)
+        with self._lock:
+            self._batches.append(batch)
+        print(f"⏰ Reminders for {batch['timezone']}: {len(recipients)} queued, "
+              f"{batch['skipped_walked']} already walked today")
+        return batch
+
+    def _advance(self, timezone, day, upto):
+        self.store.save_reminder_progress(timezone, day, upto)
+        self._progress[timezone] = (day, upto)
+
+    # --- metrics ---
+
+    def stats(self):
+        """Recent batches, newest first, with the send job's throughput merged in."""
+        with self._lock:
+            batches = list(self._batches)[::-1]
+        report = []
+        for batch in batches:
+            job = self.dispatcher.job(batch["job_id"]) if batch["job_id"] else None
+            if job is None:
+                report.append({**batch, "status": "expired" if batch["job_id"] else "skipped"})
+                continue
+            # Lag: how long after its slot closed the batch started sending
+            started = job["started_at"]
+            slot_end = datetime.fromisoformat(batch["slot_end"]).timestamp()
+            report.append({
+                **batch,
+                "status": job["status"],
+                "sent": job["sent"],
+                "failed": job["failed"],
+                "gone": job["gone"],
+                "lag_s": round(started - slot_end, 1) if started else None,
+                "elapsed_s": job["elapsed_s"],
+                "per_second": job["per_second"],
+            })
+        return {
+            "running": self._thread is not None and not self._stop.is_set(),
+            "local_time": str(self.start_offset),
+            "window_minutes": self.window.total_seconds() / 60,
+            "batches": report,
+        }
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ValueError, KeyError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _slot_bound(seconds, window_s):
+    """
+    The ReminderSlot at `seconds` into the window. Ticks share their bounds,
+    so every slot falls in exactly one tick's [done, upto) range.
+    """
+    return math.ceil(seconds / window_s * SLOT_SCALE)
@@ -0,0 +1,134 @@
+import os
+from datetime import datetime, timedelta
+
+import pyodbc
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class RetentionPolicy:
+    """
+    How much walk history to keep.
+
+    - max_walks: keep only the newest N walks (0 = no count limit)
+    - max_age_days: drop walks older than this (0 = no age limit)
+    - per_user: apply the count limit to each user separately instead of the whole table
+    """
+
+    def __init__(self, max_walks=50, max_age_days=0, per_user=False):
+        self.max_walks = max_walks
+        self.max_age_days = max_age_days
+        self.per_user = per_user
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_walks=int(os.getenv("HISTORY_RETENTION_COUNT", 50)),
+            max_age_days=int(os.getenv("HISTORY_RETENTION_DAYS", 0)),
+            per_user=os.getenv("HISTORY_RETENTION_SCOPE", "global") == "user",
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.max_walks or self.max_age_days)
+
+
+def retention_batch(policy, scoped_to_user, user_id=None):
+    """
+    One T-SQL batch that collects the walks outside the policy into a table
+    variable, deletes their reflections and then the walks, and returns the
+    number removed. NOCOUNT is switched back off before the result. Both lookups seek on the WalkDate indexes, and the
+    OFFSET only walks past the `max_walks` rows that are kept.
+    Returns (sql, params).
+    """
+    scope, params_scope = "", []
+    if scoped_to_user:
+        if user_id is None:
+            scope = "WHERE UserID IS NULL"
+        else:
+            scope, params_scope = "WHERE UserID = ?", [user_id]
+
+    sql = ["SET NOCOUNT ON;", "DECLARE @doomed TABLE (WalkID INT PRIMARY KEY);"]
+    params = []
+    if policy.max_walks:
+        sql.append(f"""
+            INSERT INTO @doomed (WalkID)
+            SELECT WalkID FROM WalkHistory {scope}
+            ORDER BY WalkDate DESC, WalkID DESC
+            OFFSET ? ROWS;
+        """)
+        params += params_scope + [policy.max_walks]
+    if policy.max_age_days:
+        age_scope = scope.replace("WHERE", "AND")
+        sql.append(f"""
+            INSERT INTO @doomed (WalkID)
+            SELECT WalkID FROM WalkHistory h
+            WHERE WalkDate < CAST(? AS DATETIME) {age_scope}
+              AND NOT EXISTS (SELECT 1 FROM @doomed d WHERE d.WalkID = h.WalkID);
+        """)
+        params += [datetime.now() - timedelta(days=policy.max_age_days)] + params_scope
+    sql.append("""
+        DELETE r FROM WalkReflections r JOIN @doomed d ON d.WalkID = r.WalkID;
+        DELETE h FROM WalkHistory h JOIN @doomed d ON d.WalkID = h.WalkID;
+        DECLARE @removed INT = (SELECT COUNT(*) FROM @doomed);
+        -- The connection goes back to the pool, so leave the session as found
+        SET NOCOUNT OFF;
+        SELECT @removed;
+    """)
+    return "\n".join(sql), params
+
+
+def apply_retention(cursor, policy, user_id=None):
+    """
+    Enforces the policy for the walk just written (its user only, when the
+    policy is per user) in a single round-trip on the caller's transaction.
+    Returns how many walks were removed.
+    """
+    if not policy.enabled:
+        return 0
+    sql, params = retention_batch(policy, policy.per_user, user_id)
+    cursor.execute(sql, *params)
+    return cursor.fetchone()[0]
+
+
+def compact_history(conn, policy):
+    """
+    Background compaction: enforces the policy over the whole table (every
+    user when per user), for deployments that keep retention off the write path.
+    """
+    cursor = conn.cursor()
+    removed = 0
+    if policy.per_user:
+        cursor.execute("SELECT DISTINCT UserID FROM WalkHistory")
+        for (user_id,) in cursor.fetchall():
+            sql, params = retention_batch(policy, True, user_id)
+            cursor.execute(sql, *params)
+            removed += cursor.fetchone()[0]
+    else:
+        sql, params = retention_batch(policy, False)
+        cursor.execute(sql, *params)
+        removed = cursor.fetchone()[0]
+    conn.commit()
+    return removed
+
+
+if __name__ == "__main__":
+    CONN_STR = (
+        r'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={os.getenv("DB_SERVER")};'
+        f'DATABASE={os.getenv("DB_DATABASE")};'
+        f'UID={os.getenv("DB_USER")};'
+        f'PWD={os.getenv("DB_PASSWORD")};'
+    )
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+        policy = RetentionPolicy.from_env()
+        removed = compact_history(conn, policy)
+        print(f"🗑️  Removed {removed} walk(s) outside the retention policy "
+              f"(count={policy.max_walks}, days={policy.max_age_days}, per_user={policy.per_user})")
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
@@ -0,0 +1,177 @@
+import json
+import os
+
+import pyodbc
+from dotenv import load_dotenv
+
+from geo import decode_polyline, encode_polyline, route_coordinates, simplify
+
+# Load environment variables
+load_dotenv()
+
+# Saved routes are stored as compact JSON documents instead of the raw
+# OSRM-shaped `routes` array:
+#
+# - routes_packed: one object per route option (id, distance, duration, ...)
+#   with its vertices as a precision-6 polyline under "polyline" instead of a
+#   list of {"lat", "lng"} objects.
+# - steps_packed: the turn-by-turn steps of each option, kept apart so the
+#   geometry can be read without them. Step geometries are polylines too.
+# - lods_packed: {tier: [polyline per route]} for the level-of-detail tiers
+#   below, simplified once at write time; thumb_polyline repeats the active
+#   option's "thumb" tier so the library list can draw it cheaply.
+#
+# All are ASCII (non-ASCII text is \u-escaped), so they fit VARCHAR columns.
+POLYLINE_PRECISION = 6
+
+# tier -> (Douglas-Peucker tolerance in meters, Visvalingam point budget),
+# finest first
+ROUTE_LODS = {
+    "high": (2.0, None),
+    "medium": (8.0, None),
+    "low": (20.0, 250),
+    "thumb": (None, 32),
+}
+
+
+def _encode(coords):
+    return encode_polyline(route_coordinates(coords), POLYLINE_PRECISION) if coords else ""
+
+
+def _encode_pairs(coords):
+    return encode_polyline(coords, POLYLINE_PRECISION) if len(coords) else ""
+
+
+def _decode(encoded):
+    return [{"lat": lat, "lng": lng} for lat, lng in decode_polyline(encoded, POLYLINE_PRECISION)]
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def pack_routes(routes):
+    """Frontend `routes` array -> (routes_packed, steps_packed) column values."""
+    packed, steps = [], []
+    for route in routes:
+        route = dict(route)
+        if isinstance(route.get("coords"), list):
+            route["polyline"] = _encode(route.pop("coords"))
+        route_steps = []
+        for step in route.pop("steps", None) or []:
+            step = dict(step)
+            if isinstance(step.get("geometry"), list):
+                step["polyline"] = _encode(step.pop("geometry"))
+            route_steps.append(step)
+        packed.append(route)
+        steps.append(route_steps)
+    return _dumps(packed), _dumps(steps)
+
+
+def pack_lods(routes, active_route_index):
+    """Frontend `routes` array -> (lods_packed, thumb_polyline) column values."""
+    lods = {tier: [] for tier in ROUTE_LODS}
+    for route in routes:
+        coords = route_coordinates(route["coords"]) if route.get("coords") else []
+        # Each tier simplifies the one before it, so only "high" pays for the
+        # full vertex count (the error bound becomes the sum of tolerances)
+        for tier, (tolerance_m, max_points) in ROUTE_LODS.items():
+            coords = simplify(coords, tolerance_m, max_points)
+            lods[tier].append(_encode_pairs(coords))
+    thumbs = lods["thumb"]
+    thumb = thumbs[active_route_index] if 0 <= active_route_index < len(thumbs) else None
+    return _dumps(lods), thumb
+
+
+def decode_thumb(thumb_polyline):
+    return _decode(thumb_polyline) if thumb_polyline else []
+
+
+def lod_polylines(lods_packed, tier):
+    """The per-route polylines of one tier, or None if it was not stored."""
+    return json.loads(lods_packed).get(tier) if lods_packed else None
+
+
+def unpack_routes(routes_packed, steps_packed=None, polylines=None):
+    """
+    Column values -> the `routes` array in the shape the frontend saved it.
+    Steps are only decoded when `steps_packed` is given; `polylines` (one per
+    route, e.g. from lod_polylines) replaces the full-resolution geometry.
+    """
+    routes = json.loads(routes_packed)
+    all_steps = json.loads(steps_packed) if steps_packed else [None] * len(routes)
+    for i, (route, route_steps) in enumerate(zip(routes, all_steps)):
+        full = route.pop("polyline", None)
+        if polylines is not None and i < len(polylines):
+            route["coords"] = _decode(polylines[i])
+        elif full is not None:
+            route["coords"] = _decode(full)
+        if route_steps is not None:
+            for step in route_steps:
+                if "polyline" in step:
+                    step["geometry"] = _decode(step.pop("polyline"))
+            route["steps"] = route_steps
+    return routes
+
+
+def route_summary(routes, active_route_index):
+    """(route_count, distance of the active option) for the list columns."""
+    active = routes[active_route_index] if 0 <= active_route_index < len(routes) else {}
+    distance = active.get("distance") if isinstance(active, dict) else None
+    return len(routes), float(distance) if isinstance(distance, (int, float)) else None
+
+
+def migrate_legacy_routes(conn, batch_size=200):
+    """
+    Packs rows that still only have routes_json (clearing it) and adds the
+    level-of-detail tiers to rows that lack them, in batches. Safe to re-run.
+    Returns the number of rows migrated.
+    """
+    cursor = conn.cursor()
+    migrated = 0
+    while True:
+        cursor.execute("""
+            SELECT TOP (?) id, routes_json, routes_packed, steps_packed, active_route_index
+            FROM saved_routes
+            WHERE lods_packed IS NULL AND (routes_packed IS NOT NULL OR routes_json IS NOT NULL)
+        """, batch_size)
+        rows = cursor.fetchall()
+        if not rows:
+            return migrated
+        updates = []
+        for row in rows:
+            if row.routes_packed is not None:
+                routes_packed, steps_packed = row.routes_packed, row.steps_packed
+                routes = unpack_routes(routes_packed)
+            else:
+                routes = json.loads(row.routes_json)
+                routes_packed, steps_packed = pack_routes(routes)
+            route_count, distance_m = route_summary(routes, row.active_route_index)
+            lods_packed, thumb = pack_lods(routes, row.active_route_index)
+            updates.append((routes_packed, steps_packed, lods_packed, thumb, route_count, distance_m, row.id))
+        cursor.executemany("""
+            UPDATE saved_routes
+            SET routes_packed = ?, steps_packed = ?, lods_packed = ?, thumb_polyline = ?,
+                route_count = ?, distance_m = ?, routes_json = NULL
+            WHERE id = ?
+        """, updates)
+        conn.commit()
+        migrated += len(rows)
+
+
+if __name__ == "__main__":
+    CONN_STR = (
+        r'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={os.getenv("DB_SERVER")};'
+        f'DATABASE={os.getenv("DB_DATABASE")};'
+        f'UID={os.getenv("DB_USER")};'
+        f'PWD={os.getenv("DB_PASSWORD")};'
+    )
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+        migrated = migrate_legacy_routes(conn)
+        print(f"✅ Packed {migrated} saved route(s) missing the compact format or LOD tiers")
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
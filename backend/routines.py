@@ -0,0 +1,57 @@
+# Routine reads shared by app.py and the benchmarks. Kept out of app.py so
+# scripts can use them without building the Flask app, its connection pool
+# and its background workers.
+
+
+def fetch_routines(cursor):
+    """
+    Loads every routine with its poses in two fixed queries (routines, then all
+    routine poses) and groups the poses in Python, so the query count does not
+    grow with the size of the library.
+    """
+    # 1. Fetch all Routines
+    cursor.execute("SELECT RoutineID, Name, Description, Duration, CoverImage FROM Routines ORDER BY CreatedAt DESC")
+    routines_db = cursor.fetchall()
+
+    # 2. Fetch the poses of every routine at once, in playback order
+    cursor.execute("""
+        SELECT 
+            rp.RoutineID,
+            rp.PoseID, 
+            rp.PoseName, 
+            rp.Duration, 
+            p.benefits, 
+            p.instructions, 
+            p.animation_url,
+            p.difficulty_tag
+        FROM RoutinePoses rp
+        LEFT JOIN poses p ON rp.PoseID = p.id
+        ORDER BY rp.RoutineID, rp.OrderIndex ASC
+    """)
+
+    poses_by_routine = {}
+    for p in cursor.fetchall():
+        poses_by_routine.setdefault(p.RoutineID, []).append({
+            "id": p.PoseID,
+            "name": p.PoseName,
+            "duration": p.Duration,
+            "benefits": p.benefits if p.benefits else "Benefits unavailable for this custom pose.",
+            "instructions": p.instructions if p.instructions else "Follow the audio cues.",
+            "gif": p.animation_url if p.animation_url else "",
+            "difficultyTag": p.difficulty_tag if p.difficulty_tag else None
+        })
+
+    routines_list = []
+    for r in routines_db:
+        poses_data = poses_by_routine.get(r.RoutineID, [])
+        routines_list.append({
+            "id": r.RoutineID,
+            "title": r.Name,
+            "description": r.Description or "Custom Routine",
+            "duration": r.Duration or "5 min",
+            "coverImage": r.CoverImage,
+            "poses": poses_data,
+            "poseCount": len(poses_data),
+            "isCustom": True
+        })
+    return routines_list
@@ -1,8 +1,14 @@
 import pyodbc
+import argparse
 import csv
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from db_helpers import MAX_PARAMS, bulk_insert, fast_executemany
+
 # Load environment variables
 load_dotenv()
 
@@ -95,79 +101,244 @@ def seed_poses(conn):
                     row.get('Difficulty Tag', '')
                 ))
             
-            cursor.executemany('''
-                INSERT INTO poses (name, instructions, benefits, animation_url, difficulty_tag)
-                VALUES (?, ?, ?, ?, ?)
-            ''', rows)
+            bulk_insert(cursor, "poses", ["name", "instructions", "benefits", "animation_url", "difficulty_tag"], rows)
             conn.commit()
             print(f"   ✅ Seeded {len(rows)} poses.")
     except Exception as e:
         print(f"❌ Error seeding poses: {e}")
 
-def seed_reflections(conn):
-    """Reads 3Qwalks.csv and inserts Themes + 3-Part Questions."""
+# --- REFLECTIONS BULK LOADER ---
+# The reflections CSV is streamed in chunks of SEED_BATCH_SIZE rows, so memory
+# stays flat however big the corpus is. Themes are resolved with one set-based
+# upsert per chunk (only for titles not seen yet), and each chunk of questions
+# is one guarded fast_executemany INSERT. Re-running the load inserts nothing twice.
+
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", 5000))
+SEED_WORKERS = int(os.getenv("SEED_WORKERS", 1))
+
+QUESTION_COLUMNS = ["ThemeID", "QuestionNumber", "OriginalQuestion", "FollowupQuestion1", "FollowupQuestion2"]
+
+
+def ensure_reflection_indexes(cursor):
+    """Keeps the theme lookup and the NOT EXISTS check on seeks."""
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WalkThemes_Title')
+            CREATE INDEX IX_WalkThemes_Title ON WalkThemes (Title);
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_ReflectionQuestions_Theme_Number')
+            CREATE INDEX IX_ReflectionQuestions_Theme_Number ON ReflectionQuestions (ThemeID, QuestionNumber);
+    """)
+
+
+def read_chunks(csv_path, size):
+    """Yields lists of at most `size` CSV rows that have a Theme."""
+    with open(csv_path, 'r', encoding='cp1252') as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            if not row.get('Theme', '').strip():
+                continue
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def upsert_themes(cursor, titles):
+    """
+    Creates any of `titles` that do not exist yet and returns {Title: ThemeID}
+    for all of them, in one batch per parameter-limit slice.
+    """
+    theme_map = {}
+    titles = list(titles)
+    step = (MAX_PARAMS - 1) // 2
+    for start in range(0, len(titles), step):
+        batch = titles[start:start + step]
+        values = ", ".join(["(?)"] * len(batch))
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            INSERT INTO WalkThemes (Title)
+            SELECT s.Title FROM (VALUES {values}) s(Title)
+            WHERE NOT EXISTS (SELECT 1 FROM WalkThemes t WHERE t.Title = s.Title);
+            SELECT MIN(t.ThemeID), t.Title
+            FROM WalkThemes t JOIN (VALUES {values}) s(Title) ON t.Title = s.Title
+            GROUP BY t.Title;
+        """, *batch, *batch)
+        theme_map.update((title, theme_id) for theme_id, title in cursor.fetchall())
+    return theme_map
+
+
+def question_rows(chunk, theme_map):
+    """Chunk rows -> ReflectionQuestions tuples, dropping rows without a question."""
+    rows = []
+    for row in chunk:
+        # Adjust these keys if your CSV headers are slightly different
+        q_num = row.get('Question_Number', '').strip()
+        q1 = row.get('Original_Question', '').strip()
+        q2 = row.get('Followup_1_Anchor', '').strip()
+        q3 = row.get('Followup_2_Action+Accountability', '').strip()
+        if q1:
+            theme_id = theme_map[row['Theme'].strip().title()]
+            rows.append((theme_id, int(q_num) if q_num.isdigit() else None, q1, q2, q3))
+    return rows
+
+
+# Each row is only inserted when its (ThemeID, QuestionNumber) is not there
+# yet - or, for rows without a number, the same question text. The CASTs let
+# the driver describe the parameters for fast_executemany; NVARCHAR(4000)
+# keeps its bound buffers fixed-size (longer text fails loudly, not truncated).
+INSERT_QUESTION_SQL = f"""
+    INSERT INTO ReflectionQuestions ({', '.join(QUESTION_COLUMNS)})
+    SELECT {', '.join('s.' + c for c in QUESTION_COLUMNS)}
+    FROM (VALUES (CAST(? AS INT), CAST(? AS INT), CAST(? AS NVARCHAR(4000)),
+                  CAST(? AS NVARCHAR(4000)), CAST(? AS NVARCHAR(4000))))
+         s ({', '.join(QUESTION_COLUMNS)})
+    WHERE NOT EXISTS (
+        SELECT 1 FROM ReflectionQuestions q
+        WHERE q.ThemeID = s.ThemeID
+          AND (q.QuestionNumber = s.QuestionNumber
+               OR (q.QuestionNumber IS NULL AND s.QuestionNumber IS NULL
+                   AND q.OriginalQuestion = s.OriginalQuestion))
+    )
+"""
+
+
+def insert_questions(conn, rows):
+    """
+    Loads one chunk in a single fast_executemany round-trip, skipping the
+    questions that are already there, and commits.
+    """
     cursor = conn.cursor()
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Reading from your new local file '3Qwalks.csv'
-    csv_path = os.path.join(current_dir, '3Qwalks.csv')
+    fast_executemany(cursor, INSERT_QUESTION_SQL, rows, chunk_size=len(rows))
+    conn.commit()
+
+
+def load_reflections(conn, csv_path, batch_size=SEED_BATCH_SIZE, workers=SEED_WORKERS):
+    """
+    Streams `csv_path` into WalkThemes / ReflectionQuestions. With workers > 1
+    the question chunks are loaded on that many extra connections in parallel
+    (themes are always resolved on `conn`, so two workers never race to create
+    the same one). Returns (rows read, questions inserted).
+    """
+    cursor = conn.cursor()
+    ensure_reflection_indexes(cursor)
+    cursor.execute("SELECT COUNT_BIG(*) FROM ReflectionQuestions")
+    existing = cursor.fetchone()[0]
+    conn.commit()
+
+    theme_map = {}
+    read = 0
+    started = time.perf_counter()
+
+    def progress(read):
+        elapsed = time.perf_counter() - started
+        print(f"   ⏱️  {read:,} rows loaded ({read / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    def prepare(chunk):
+        new_titles = {row['Theme'].strip().title() for row in chunk} - theme_map.keys()
+        if new_titles:
+            theme_map.update(upsert_themes(cursor, new_titles))
+            conn.commit()
+        return question_rows(chunk, theme_map)
+
+    if workers <= 1:
+        for chunk in read_chunks(csv_path, batch_size):
+            rows = prepare(chunk)
+            if rows:
+                insert_questions(conn, rows)
+            read += len(chunk)
+            progress(read)
+    else:
+        read = _load_parallel(csv_path, batch_size, workers, prepare, progress)
+
+    cursor.execute("SELECT COUNT_BIG(*) FROM ReflectionQuestions")
+    return read, cursor.fetchone()[0] - existing
+
+
+def _load_parallel(csv_path, batch_size, workers, prepare, progress):
+    """Hands prepared chunks to `workers` threads, each on its own connection."""
+    local = threading.local()
+    connections = []
+    read = 0
+
+    def worker_insert(rows):
+        if not hasattr(local, "conn"):
+            local.conn = pyodbc.connect(CONN_STR)
+            connections.append(local.conn)
+        insert_questions(local.conn, rows)
+        return len(rows)
+
+    # At most two chunks queued per worker, so memory stays bounded
+    slots = threading.BoundedSemaphore(workers * 2)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in read_chunks(csv_path, batch_size):
+                rows = prepare(chunk)
+                if not rows:
+                    continue
+                slots.acquire()
+                future = pool.submit(worker_insert, rows)
+                future.add_done_callback(lambda _: slots.release())
+                pending.append((future, len(chunk)))
+
+                finished = [item for item in pending if item[0].done()]
+                for item in finished:
+                    item[0].result()
+                    read += item[1]
+                    pending.remove(item)
+                if finished:
+                    progress(read)
+            for future, size in pending:
+                future.result()
+                read += size
+            progress(read)
+    finally:
+        for worker_conn in connections:
+            worker_conn.close()
+    return read
+
+
+def seed_reflections(conn, csv_path=None, batch_size=SEED_BATCH_SIZE, workers=SEED_WORKERS):
+    """Reads 3Qwalks.csv (or `csv_path`) and inserts Themes + 3-Part Questions."""
+    if csv_path is None:
+        # Reading from your new local file '3Qwalks.csv'
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        csv_path = os.path.join(current_dir, '3Qwalks.csv')
 
     if not os.path.exists(csv_path):
         print(f"⚠️  Skipping Reflections: {csv_path} not found. Please ensure '3Qwalks.csv' is in the backend folder.")
         return
 
-    print(f"📂 Reading Reflections from: {csv_path}")
+    print(f"📂 Reading Reflections from: {csv_path} (batch {batch_size}, {workers} worker(s))")
     try:
-        with open(csv_path, 'r', encoding='cp1252') as f:
-            reader = csv.DictReader(f)
-            
-            # Helper to map Theme Names -> IDs to avoid duplicates
-            theme_map = {} 
-            questions_to_insert = []
-
-            for row in reader:
-                raw_theme = row.get('Theme', '').strip()
-                if not raw_theme: continue
-
-                # 1. Handle Theme Creation
-                if raw_theme not in theme_map:
-                    clean_title = raw_theme.title()
-                    cursor.execute("INSERT INTO WalkThemes (Title) VALUES (?)", clean_title)
-                    cursor.execute("SELECT @@IDENTITY")
-                    theme_id = cursor.fetchone()[0]
-                    theme_map[raw_theme] = theme_id
-                
-                theme_id = theme_map[raw_theme]
-
-                # 2. Prepare Question Data
-                # Adjust these keys if your CSV headers are slightly different
-                q_num = row.get('Question_Number')
-                q1 = row.get('Original_Question', '').strip()
-                q2 = row.get('Followup_1_Anchor', '').strip()
-                q3 = row.get('Followup_2_Action+Accountability', '').strip()
-
-                if q1:
-                    questions_to_insert.append((theme_id, q_num, q1, q2, q3))
-
-            print(f"   ✅ Created {len(theme_map)} themes.")
-
-            # 3. Bulk Insert Questions
-            cursor.executemany('''
-                INSERT INTO ReflectionQuestions (ThemeID, QuestionNumber, OriginalQuestion, FollowupQuestion1, FollowupQuestion2)
-                VALUES (?, ?, ?, ?, ?)
-            ''', questions_to_insert)
-            
-            conn.commit()
-            print(f"   ✅ Seeded {len(questions_to_insert)} reflection sets.")
-
+        started = time.perf_counter()
+        read, inserted = load_reflections(conn, csv_path, batch_size, workers)
+        elapsed = time.perf_counter() - started
+        print(f"   ✅ Seeded {inserted:,} reflection sets from {read:,} rows "
+              f"in {elapsed:.1f}s ({read / max(elapsed, 1e-9):,.0f} rows/s).")
     except Exception as e:
+        conn.rollback()
         print(f"❌ Error seeding reflections: {e}")
 
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed poses and reflections.")
+    parser.add_argument("--bulk", metavar="CSV",
+                        help="only (re)load this reflections CSV, without resetting any table")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=SEED_WORKERS)
+    args = parser.parse_args()
+
     connection = get_connection()
     if connection:
-        reset_tables(connection)      # 1. Drop & Recreate
-        seed_poses(connection)        # 2. Add Poses
-        seed_reflections(connection)  # 3. Add 3-Part Reflections
-        connection.close()
-        print("\n🎉 Database setup complete!")
\ No newline at end of file
+        if args.bulk:
+            seed_reflections(connection, args.bulk, args.batch_size, args.workers)
+            connection.close()
+        else:
+            reset_tables(connection)      # 1. Drop & Recreate
+            seed_poses(connection)        # 2. Add Poses
+            seed_reflections(connection, None, args.batch_size, args.workers)  # 3. Add 3-Part Reflections
+            connection.close()
+            print("\n🎉 Database setup complete!")
+        print("ℹ️  A running API keeps serving its cached catalog - POST /api/catalog/refresh to reload it.")
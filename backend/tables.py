@@ -95,6 +95,159 @@ ELSE
 BEGIN
     PRINT 'ℹ️ saved_routes Table already exists';
 END
+
+-- D. Index RoutinePoses for the grouped routine listing
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_RoutinePoses_Routine_Order')
+BEGIN
+    CREATE INDEX IX_RoutinePoses_Routine_Order ON RoutinePoses (RoutineID, OrderIndex);
+    PRINT '✅ Created IX_RoutinePoses_Routine_Order';
+END
+
+-- E. Index WalkHistory for keyset paging on (WalkDate, WalkID)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WalkHistory_WalkDate_WalkID')
+BEGIN
+    CREATE INDEX IX_WalkHistory_WalkDate_WalkID ON WalkHistory (WalkDate DESC, WalkID DESC);
+    PRINT '✅ Created IX_WalkHistory_WalkDate_WalkID';
+END
+
+-- F. Index WalkHistory per user for per-user retention
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WalkHistory_User_WalkDate')
+BEGIN
+    CREATE INDEX IX_WalkHistory_User_WalkDate ON WalkHistory (UserID, WalkDate DESC, WalkID DESC);
+    PRINT '✅ Created IX_WalkHistory_User_WalkDate';
+END
+
+-- G. Compact saved-route storage (geometry as polylines, steps kept apart)
+IF COL_LENGTH('saved_routes', 'routes_packed') IS NULL
+BEGIN
+    ALTER TABLE saved_routes ADD
+        routes_packed VARCHAR(MAX) NULL,
+        steps_packed VARCHAR(MAX) NULL,
+        route_count INT NULL,
+        distance_m FLOAT NULL;
+    ALTER TABLE saved_routes ALTER COLUMN routes_json NVARCHAR(MAX) NULL;
+    PRINT '✅ Added compact route columns to saved_routes (run route_store.py to pack old rows)';
+END
+
+-- H. Precomputed level-of-detail tiers for saved routes
+IF COL_LENGTH('saved_routes', 'lods_packed') IS NULL
+BEGIN
+    ALTER TABLE saved_routes ADD
+        lods_packed VARCHAR(MAX) NULL,
+        thumb_polyline VARCHAR(2000) NULL;
+    PRINT '✅ Added LOD columns to saved_routes (run route_store.py to fill old rows)';
+END
+
+-- I. Index saved_routes for keyset paging on (created_at, id)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_saved_routes_created_id')
+BEGIN
+    CREATE INDEX IX_saved_routes_created_id ON saved_routes (created_at DESC, id DESC);
+    PRINT '✅ Created IX_saved_routes_created_id';
+END
+
+-- J. Web Push subscriptions, one row per endpoint (keyed by its SHA-256)
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='PushSubscriptions' and xtype='U')
+BEGIN
+    CREATE TABLE PushSubscriptions (
+        EndpointHash BINARY(32) PRIMARY KEY,
+        Endpoint NVARCHAR(2048) NOT NULL,
+        P256dh VARCHAR(256) NOT NULL,
+        Auth VARCHAR(64) NOT NULL,
+        CreatedAt DATETIME DEFAULT GETDATE(),
+        UpdatedAt DATETIME DEFAULT GETDATE()
+    );
+    PRINT '✅ Created PushSubscriptions';
+END
+
+-- K. Segment columns for targeted reminders, each behind an index
+IF COL_LENGTH('PushSubscriptions', 'TimeZone') IS NULL
+BEGIN
+    ALTER TABLE PushSubscriptions ADD
+        UserID INT NULL,
+        TimeZone VARCHAR(64) NULL,
+        LastActiveAt DATETIME NULL;
+    PRINT '✅ Added segment columns to PushSubscriptions';
+END
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_PushSubscriptions_User')
+BEGIN
+    CREATE INDEX IX_PushSubscriptions_User ON PushSubscriptions (UserID);
+    CREATE INDEX IX_PushSubscriptions_TimeZone ON PushSubscriptions (TimeZone, LastActiveAt)
+        INCLUDE (Endpoint, P256dh, Auth, UserID);
+    CREATE INDEX IX_PushSubscriptions_LastActive ON PushSubscriptions (LastActiveAt);
+    PRINT '✅ Created PushSubscriptions segment indexes';
+END
+
+-- M. Reminder slot (place in the delivery window) per subscriber, derived from the
+--    endpoint hash, so each scheduler tick is one index range seek per timezone
+IF COL_LENGTH('PushSubscriptions', 'ReminderSlot') IS NULL
+BEGIN
+    ALTER TABLE PushSubscriptions ADD
+        ReminderSlot AS CAST(CAST(SUBSTRING(EndpointHash, 1, 4) AS BIGINT) % 1000000 AS INT) PERSISTED;
+    PRINT '✅ Added ReminderSlot to PushSubscriptions';
+END
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_PushSubscriptions_Slot')
+BEGIN
+    -- EXEC: the column may have been added by this same batch
+    EXEC('CREATE INDEX IX_PushSubscriptions_Slot ON PushSubscriptions (TimeZone, ReminderSlot)
+          INCLUDE (Endpoint, P256dh, Auth, UserID, LastActiveAt)');
+    PRINT '✅ Created PushSubscriptions slot index';
+END
+
+-- N. How far each timezone's reminder window has been sent, so a restart resumes it
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='ReminderProgress' and xtype='U')
+BEGIN
+    CREATE TABLE ReminderProgress (
+        TimeZone VARCHAR(64) NOT NULL,  -- '' for subscribers without a timezone
+        LocalDate DATE NOT NULL,
+        SentUpto FLOAT NOT NULL,        -- seconds into the window
+        UpdatedAt DATETIME DEFAULT GETDATE(),
+        PRIMARY KEY (TimeZone, LocalDate)
+    );
+    PRINT '✅ Created ReminderProgress';
+END
+
+-- L. Walk stats rollups, kept up to date by walk_complete (walk_stats.py --rebuild refills them)
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='WalkStatsDaily' and xtype='U')
+BEGIN
+    CREATE TABLE WalkStatsDaily (
+        UserKey INT NOT NULL,
+        StatDate DATE NOT NULL,
+        Walks INT NOT NULL,
+        DistanceKm FLOAT NOT NULL,
+        DurationMinutes INT NOT NULL,
+        CaloriesBurned INT NOT NULL,
+        PosesCompleted INT NOT NULL,
+        StepsEstimated INT NOT NULL,
+        PRIMARY KEY (UserKey, StatDate)
+    );
+    CREATE TABLE WalkStatsWeekly (
+        UserKey INT NOT NULL,
+        WeekStart DATE NOT NULL,
+        Walks INT NOT NULL,
+        DistanceKm FLOAT NOT NULL,
+        DurationMinutes INT NOT NULL,
+        CaloriesBurned INT NOT NULL,
+        PosesCompleted INT NOT NULL,
+        StepsEstimated INT NOT NULL,
+        PRIMARY KEY (UserKey, WeekStart)
+    );
+    CREATE TABLE WalkStatsTotals (
+        UserKey INT PRIMARY KEY,
+        Walks INT NOT NULL,
+        DistanceKm FLOAT NOT NULL,
+        DurationMinutes INT NOT NULL,
+        CaloriesBurned INT NOT NULL,
+        PosesCompleted INT NOT NULL,
+        StepsEstimated BIGINT NOT NULL,
+        FirstWalk DATE NOT NULL,
+        StreakEnd DATE NOT NULL,
+        CurrentStreak INT NOT NULL,
+        BestStreak INT NOT NULL
+    );
+    PRINT '✅ Created walk stats rollups (run walk_stats.py --rebuild to fill them from history)';
+END
 """
 
 # 3. Execute
@@ -0,0 +1,186 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Zoom 13 slippy tiles are ~4.9 km wide at the equator (~3 km around 50°N),
+# so the default 3 km search radius is covered by about 9 tiles.
+DEFAULT_ZOOM = 13
+METERS_PER_DEGREE = 111320.0
+
+
+# --- TILE MATH ---
+
+def tile_for(lat, lon, zoom=DEFAULT_ZOOM):
+    """The (zoom, x, y) slippy-map tile containing a point."""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return (zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def tile_bounds(tile):
+    """(south, west, north, east) of a tile in degrees."""
+    zoom, x, y = tile
+    n = 2 ** zoom
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (lat_at(y + 1), x / n * 360.0 - 180.0, lat_at(y), (x + 1) / n * 360.0 - 180.0)
+
+
+def tiles_covering(lat, lon, radius_m, zoom=DEFAULT_ZOOM):
+    """Every tile that intersects the bounding box of a circle."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    _, x0, y0 = tile_for(lat + dlat, lon - dlon, zoom)
+    _, x1, y1 = tile_for(lat - dlat, lon + dlon, zoom)
+    return [(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def union_bounds(tiles):
+    bounds = [tile_bounds(t) for t in tiles]
+    return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+            max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+
+# --- CACHE ---
+
+class TileCache:
+    """
+    Caches upstream POI results per map tile.
+
+    Tiles live in an in-memory LRU of `max_tiles` entries, backed by a SQLite
+    file at `path` so the cache survives restarts (pass path=None to keep it
+    in memory only). Entries older than `ttl` seconds count as missing.
+    """
+
+    def __init__(self, path=None, ttl=86400, max_tiles=2048, max_disk_tiles=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.max_disk_tiles = max_disk_tiles
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+        self._db = None
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS tiles (
+                        z INTEGER NOT NULL,
+                        x INTEGER NOT NULL,
+                        y INTEGER NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        elements TEXT NOT NULL,
+                        PRIMARY KEY (z, x, y)
+                    )
+                """)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Tile cache running in memory only ({path}): {e}")
+                self._db = None
+
+    def get(self, tile):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(tile)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT fetched_at, elements FROM tiles WHERE z = ? AND x = ? AND y = ?", tile
+                ).fetchone()
+                if row:
+                    entry = (row[0], json.loads(row[1]))
+                    self._remember(tile, entry)
+
+            if entry is None or now - entry[0] > self.ttl:
+                self._memory.pop(tile, None)
+                self._misses += 1
+                return None
+
+            self._memory.move_to_end(tile)
+            self._hits += 1
+            return entry[1]
+
+    def put_many(self, elements_by_tile):
+        now = time.time()
+        with self._lock:
+            for tile, elements in elements_by_tile.items():
+                self._remember(tile, (now, elements))
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO tiles (z, x, y, fetched_at, elements) VALUES (?, ?, ?, ?, ?)",
+                    [(*tile, now, json.dumps(elements)) for tile, elements in elements_by_tile.items()]
+                )
+                self._db.commit()
+                self._writes += len(elements_by_tile)
+                if self._writes >= 256:
+                    self._prune_disk(now)
+
+    def lookup(self, tiles, fetch_missing):
+        """
+        Returns {tile: elements} for every tile. Cached tiles are served
+        locally. The rest go to `fetch_missing(tiles)`, which must return
+        {tile: elements}, and are stored. If the upstream fetch fails, only
+        the cached tiles are returned.
+        """
+        found, missing = {}, []
+        for tile in tiles:
+            elements = self.get(tile)
+            if elements is None:
+                missing.append(tile)
+            else:
+                found[tile] = elements
+
+        if missing:
+            try:
+                fetched = fetch_missing(missing)
+            except Exception as e:
+                print(f"❌ Tile fetch failed for {len(missing)} tile(s): {e}")
+                return found
+            self.put_many(fetched)
+            found.update(fetched)
+        return found
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_tiles": len(self._memory),
+                "hits": self._hits,
+                "misses": self._misses,
+                "persistent": self._db is not None,
+            }
+
+    # --- INTERNALS (lock held) ---
+
+    def _remember(self, tile, entry):
+        self._memory[tile] = entry
+        self._memory.move_to_end(tile)
+        while len(self._memory) > self.max_tiles:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self, now):
+        self._writes = 0
+        self._db.execute("DELETE FROM tiles WHERE fetched_at < ?", (now - self.ttl,))
+        self._db.execute("""
+            DELETE FROM tiles WHERE rowid IN (
+                SELECT rowid FROM tiles ORDER BY fetched_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_disk_tiles,))
+        self._db.commit()
+
+
+def default_cache_path():
+    return os.getenv("POI_CACHE_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "poi_tiles.sqlite3"
+    )
@@ -21,7 +21,7 @@ try:
 
     cursor.execute("""
         SELECT id, name, note, destination_lat, destination_lng,
-               destination_label, routes_json, active_route_index, created_at
+               destination_label, route_count, routes_json, active_route_index, created_at
         FROM saved_routes
         ORDER BY created_at DESC
     """)
@@ -32,10 +32,13 @@ try:
         print("⚠️ No saved routes found.")
     else:
         for row in rows:
-            try:
-                routes = json.loads(row.routes_json) if row.routes_json else []
-            except Exception:
-                routes = []
+            route_count = row.route_count
+            if route_count is None:
+                # Not packed yet - see route_store.py
+                try:
+                    route_count = len(json.loads(row.routes_json)) if row.routes_json else 0
+                except Exception:
+                    route_count = 0
 
             created_at = row.created_at.isoformat() if row.created_at else "-"
             print(f"ID: {row.id}  |  {row.name}")
@@ -43,7 +46,7 @@ try:
                 print(f"Note: {row.note}")
             print(f"Destination: {row.destination_label}")
             print(f"Coords: {row.destination_lat:.6f}, {row.destination_lng:.6f}")
-            print(f"Routes: {len(routes)}  |  Active Index: {row.active_route_index}")
+            print(f"Routes: {route_count}  |  Active Index: {row.active_route_index}")
             print(f"Created: {created_at}")
             print("-" * 48)
 
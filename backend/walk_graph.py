@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from array import array
+from collections import deque
+
+from geo import haversine_m
+
+# Highways a pedestrian may use. Motorways and trunk roads are left out, and
+# so is anything tagged foot=no / access=private (see is_walkable).
+WALKABLE_HIGHWAYS = {
+    "footway", "path", "pedestrian", "living_street", "residential", "steps",
+    "track", "service", "unclassified", "road", "cycleway", "bridleway", "corridor",
+    "tertiary", "tertiary_link", "secondary", "secondary_link", "primary", "primary_link",
+}
+FOOT_ALLOWED = {"yes", "designated", "permissive"}
+
+# Grid cell (degrees) for snapping points to the nearest graph node, ~200 m
+SNAP_CELL_DEG = 0.002
+GRAPH_CACHE_VERSION = 1
+
+
+def is_walkable(tags):
+    if tags.get("highway") not in WALKABLE_HIGHWAYS or tags.get("area") == "yes":
+        return False
+    foot = tags.get("foot")
+    if foot in FOOT_ALLOWED:
+        return True
+    return foot not in ("no", "private") and tags.get("access") not in ("no", "private")
+
+
+# --- EXTRACT READERS ---
+# Both return ({osm node id: (lat, lon)}, [(node ids, name, highway)]) with
+# only the nodes that walkable ways use.
+
+def read_osm_xml(path):
+    nodes, ways = {}, []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            nodes[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if is_walkable(tags):
+                ways.append(([nd.get("ref") for nd in elem.iter("nd")], tags.get("name", ""), tags["highway"]))
+            elem.clear()
+    return _used_nodes(nodes, ways), ways
+
+
+def read_overpass_json(path):
+    with open(path, encoding="utf-8") as f:
+        elements = json.load(f).get("elements", [])
+    nodes, ways = {}, []
+    for el in elements:
+        if el.get("type") == "node":
+            nodes[str(el["id"])] = (float(el["lat"]), float(el["lon"]))
+        elif el.get("type") == "way" and is_walkable(el.get("tags", {})):
+            tags = el["tags"]
+            ways.append(([str(n) for n in el.get("nodes", [])], tags.get("name", ""), tags["highway"]))
+    return _used_nodes(nodes, ways), ways
+
+
+def _used_nodes(nodes, ways):
+    used = {ref for refs, _, _ in ways for ref in refs}
+    return {ref: nodes[ref] for ref in used if ref in nodes}
+
+
+# --- GRAPH ---
+
+class WalkGraph:
+    """
+    Pedestrian street graph in CSR form: the edges leaving node u are
+    indices[indptr[u]:indptr[u + 1]], with their lengths (meters) in
+    `weights` and the street they belong to in `edge_way` (an index into
+    `way_names`). Every street is walkable both ways, so each segment is
+    stored once per direction. Only the largest connected component is kept,
+    so any two snapped points have a path between them.
+    """
+
+    def __init__(self, lats, lngs, indptr, indices, weights, edge_way, way_names):
+        self.lats = lats
+        self.lngs = lngs
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.edge_way = edge_way
+        self.way_names = way_names
+        self._build_snap_grid()
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_ways(cls, nodes, ways):
+        """Builds the graph from ({node id: (lat, lng)}, [(node ids, name, highway)])."""
+        index, lats, lngs = {}, [], []
+        way_names, segments = [], []
+        for refs, name, _ in ways:
+            way = len(way_names)
+            way_names.append(name or "")
+            refs = [ref for ref in refs if ref in nodes]
+            for a, b in zip(refs, refs[1:]):
+                if a == b:
+                    continue
+                for ref in (a, b):
+                    if ref not in index:
+                        index[ref] = len(lats)
+                        lats.append(nodes[ref][0])
+                        lngs.append(nodes[ref][1])
+                segments.append((index[a], index[b], way))
+
+        keep = _largest_component(len(lats), segments)
+        remap = {old: new for new, old in enumerate(keep)}
+        lats = [lats[i] for i in keep]
+        lngs = [lngs[i] for i in keep]
+
+        adjacency = [[] for _ in lats]
+        for a, b, way in segments:
+            if a in remap and b in remap:
+                u, v = remap[a], remap[b]
+                length = haversine_m(lats[u], lngs[u], lats[v], lngs[v])
+                adjacency[u].append((v, length, way))
+                adjacency[v].append((u, length, way))
+
+        indptr, indices, weights, edge_way = array("i", [0]), array("i"), array("f"), array("i")
+        for edges in adjacency:
+            for v, length, way in edges:
+                indices.append(v)
+                weights.append(length)
+                edge_way.append(way)
+            indptr.append(len(indices))
+        return cls(array("d", lats), array("d", lngs), indptr, indices, weights, edge_way, way_names)
+
+    # --- snapping ---
+
+    def _build_snap_grid(self):
+        self._grid = {}
+        for node, (lat, lng) in enumerate(zip(self.lats, self.lngs)):
+            key = (math.floor(lat / SNAP_CELL_DEG), math.floor(lng / SNAP_CELL_DEG))
+            self._grid.setdefault(key, []).append(node)
+
+    def nearest_node(self, lat, lng, max_distance_m=500.0):
+        """(node, distance in meters) of the closest node, or (None, None) if none is in range."""
+        cx, cy = math.floor(lat / SNAP_CELL_DEG), math.floor(lng / SNAP_CELL_DEG)
+        cell_m = SNAP_CELL_DEG * 111320.0 * max(math.cos(math.radians(lat)), 0.1)
+        max_ring = int(max_distance_m / cell_m) + 1
+        best, best_d = None, float("inf")
+        for ring in range(max_ring + 1):
+            # Once a node is found, one more ring covers anything closer
+            if best is not None and (ring - 1) * cell_m > best_d:
+                break
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1):
+                    if max(abs(dx), abs(dy)) != ring:
+                        continue
+                    for node in self._grid.get((cx + dx, cy + dy), ()):
+                        d = haversine_m(lat, lng, self.lats[node], self.lngs[node])
+                        if d < best_d:
+                            best, best_d = node, d
+        if best is None or best_d > max_distance_m:
+            return None, None
+        return best, best_d
+
+    # --- persistence ---
+
+    def save(self, path):
+        state = {
+            "version": GRAPH_CACHE_VERSION,
+            "arrays": {name: getattr(self, name) for name in
+                       ("lats", "lngs", "indptr", "indices", "weights", "edge_way")},
+            "way_names": self.way_names,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != GRAPH_CACHE_VERSION:
+            raise ValueError("Walk graph cache is from another version")
+        return cls(way_names=state["way_names"], **state["arrays"])
+
+    def stats(self):
+        return {"nodes": len(self), "edges": self.edge_count, "streets": len(self.way_names)}
+
+
+def _largest_component(n, segments):
+    """Node ids of the largest connected component, in ascending order."""
+    neighbours = [[] for _ in range(n)]
+    for a, b, _ in segments:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    label = [-1] * n
+    best, best_size = 0, 0
+    for start in range(n):
+        if label[start] != -1:
+            continue
+        label[start] = start
+        queue, size = deque([start]), 0
+        while queue:
+            u = queue.popleft()
+            size += 1
+            for v in neighbours[u]:
+                if label[v] == -1:
+                    label[v] = start
+                    queue.append(v)
+        if size > best_size:
+            best, best_size = start, size
+    return [i for i in range(n) if label[i] == best]
+
+
+def load_walk_graph(extract_path):
+    """
+    The walk graph for an .osm / Overpass .json extract. The compiled graph
+    is cached next to the extract (<extract>.walkgraph) and rebuilt only when
+    the extract is newer than the cache.
+    """
+    cache_path = extract_path + ".walkgraph"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(extract_path):
+        try:
+            return WalkGraph.load(cache_path)
+        except Exception as e:
+            print(f"⚠️  Ignoring walk graph cache {cache_path}: {e}")
+
+    reader = read_overpass_json if extract_path.endswith(".json") else read_osm_xml
+    graph = WalkGraph.from_ways(*reader(extract_path))
+    try:
+        graph.save(cache_path)
+    except OSError as e:
+        print(f"⚠️  Could not cache walk graph: {e}")
+    return graph
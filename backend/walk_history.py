@@ -0,0 +1,90 @@
+import base64
+import json
+from datetime import datetime
+
+# Columns a client may ask for with ?fields=. WalkID and WalkDate are always
+# returned because the paging cursor is built from them.
+HISTORY_FIELDS = (
+    "WalkID", "WalkDate", "DistanceKm", "DurationMinutes",
+    "CaloriesBurned", "PosesCompleted", "StepsEstimated", "Notes",
+)
+DEFAULT_FIELDS = HISTORY_FIELDS[:-1]
+KEY_FIELDS = ("WalkID", "WalkDate")
+
+
+def parse_fields(raw):
+    """Column list for a `fields=` value. Raises ValueError on unknown names."""
+    if not raw:
+        return list(DEFAULT_FIELDS)
+    requested = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(KEY_FIELDS) + [f for f in requested if f not in KEY_FIELDS]
+
+
+# --- CURSORS ---
+
+def encode_cursor(walk_date, walk_id):
+    raw = f"{walk_date.isoformat()}|{walk_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(WalkDate, WalkID) from an opaque cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        walk_date, walk_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(walk_date), int(walk_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# --- QUERY ---
+
+def build_history_query(fields, limit, cursor=None, since=None):
+    """
+    Keyset query over (WalkDate DESC, WalkID DESC). Fetches one extra row so
+    the caller can tell whether another page exists. Returns (sql, params).
+    """
+    # WalkDate is DATETIME; casting keeps SQL Server from comparing it as
+    # DATETIME2 against the parameter, which breaks equality on the cursor row.
+    where, params = [], []
+    if cursor:
+        walk_date, walk_id = cursor
+        where.append("(WalkDate < CAST(? AS DATETIME) OR (WalkDate = CAST(? AS DATETIME) AND WalkID < ?))")
+        params += [walk_date, walk_date, walk_id]
+    if since:
+        where.append("WalkDate > CAST(? AS DATETIME)")
+        params.append(since)
+
+    sql = f"SELECT TOP (?) {', '.join(fields)} FROM WalkHistory"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY WalkDate DESC, WalkID DESC"
+    return sql, [limit + 1] + params
+
+
+# --- SERIALIZATION ---
+
+def _encode_value(value):
+    if value is None:
+        return "null"
+    if isinstance(value, datetime):
+        return f'"{value.isoformat()}"'
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    return json.dumps(value)
+
+
+def rows_to_json(rows, fields):
+    """
+    Renders result rows as a JSON array of objects straight from the row
+    tuples: one format template per page, no intermediate dict per row.
+    """
+    template = "{" + ",".join(f'"{name}":%s' for name in fields) + "}"
+    return "[" + ",".join(template % tuple(map(_encode_value, row)) for row in rows) + "]"
@@ -0,0 +1,298 @@
+import heapq
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from walk_graph import load_walk_graph
+
+# Load environment variables
+load_dotenv()
+
+WALKING_SPEED_MPS = 1.4
+METERS_PER_DEGREE = 111320.0
+
+# An alternative is only offered if it is at most this much longer than the
+# shortest route and shares at most this fraction of its length with every
+# route already chosen.
+MAX_DETOUR = 1.4
+MAX_SHARED = 0.7
+
+
+class NoRoute(Exception):
+    """No walkable path between the two points (or one of them is off the graph)."""
+
+
+class WalkRouter:
+    """
+    Foot routing over a WalkGraph with A* (straight-line heuristic) and
+    alternatives by the penalty method: nodes of the routes found so far are
+    made more expensive and the search is repeated. Answers are returned in
+    the shape MapPage builds from OSRM and saved routes store
+    ({id, coords, distance, duration, steps}), and cached per snapped
+    origin/destination pair.
+    """
+
+    def __init__(self, graph, cache_size=512, max_snap_m=500.0):
+        self.graph = graph
+        self.max_snap_m = max_snap_m
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = 0
+        self._search_ms = 0.0
+        # Plain lists index faster than array.array in the search loop
+        self._lats = list(graph.lats)
+        self._lngs = list(graph.lngs)
+        self._indptr = list(graph.indptr)
+        self._indices = list(graph.indices)
+        self._weights = list(graph.weights)
+
+    # --- public API ---
+
+    def route(self, origin, destination, alternatives=0):
+        """
+        Up to 1 + `alternatives` routes between two {"lat", "lng"} points,
+        shortest first. Raises NoRoute.
+        """
+        src = self.snap(origin, "origin")
+        dst = self.snap(destination, "destination")
+        key = (src, dst, alternatives)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return self._cache[key]
+            self._misses += 1
+
+        started = time.perf_counter()
+        paths = self.paths(src, dst, alternatives)
+        routes = [self.to_route(path, f"local-{src}-{dst}-{i}") for i, path in enumerate(paths)]
+        with self._lock:
+            self._search_ms += (time.perf_counter() - started) * 1000
+            self._cache[key] = routes
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return routes
+
+    def snap(self, point, label="point"):
+        node, _ = self.graph.nearest_node(float(point["lat"]), float(point["lng"]), self.max_snap_m)
+        if node is None:
+            raise NoRoute(f"No walkable path within {self.max_snap_m:.0f} m of the {label}")
+        return node
+
+    def paths(self, src, dst, alternatives=0):
+        """Node paths: the shortest, then up to `alternatives` distinct ones."""
+        best = self.shortest_path(src, dst)
+        if best is None:
+            raise NoRoute("No walkable path between these points")
+        chosen = [best]
+        penalties = {}
+        for _ in range(alternatives * 3):
+            if len(chosen) > alternatives:
+                break
+            for node in chosen[-1][1][1:-1]:
+                penalties[node] = penalties.get(node, 1.0) * 1.5
+            candidate = self.shortest_path(src, dst, penalties)
+            if candidate is None:
+                break
+            length = self.path_length(candidate[1])
+            if length > best[0] * MAX_DETOUR:
+                break
+            if all(self._shared(candidate[1], other[1]) <= MAX_SHARED * length for other in chosen):
+                chosen.append((length, candidate[1]))
+        return [path for _, path in chosen]
+
+    def shortest_path(self, src, dst, penalties=None):
+        """(cost, [nodes]) by A*, or None. `penalties` multiplies the cost of entering a node."""
+        if src == dst:
+            return 0.0, [src]
+        lats, lngs = self._lats, self._lngs
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        ky = METERS_PER_DEGREE
+        kx = ky * math.cos(math.radians(lats[dst]))
+        tlat, tlng = lats[dst], lngs[dst]
+        # Slightly under the great-circle distance, so the heuristic never overestimates
+        scale = 0.995
+
+        def h(n):
+            return scale * math.hypot((lats[n] - tlat) * ky, (lngs[n] - tlng) * kx)
+
+        # Dense per-query state: a list lookup beats a dict in this loop
+        n = len(lats)
+        g = [math.inf] * n
+        parent = [-1] * n
+        closed = bytearray(n)
+        g[src] = 0.0
+        heap = [(h(src), 0.0, src)]
+        push, pop = heapq.heappush, heapq.heappop
+        while heap:
+            _, cost, u = pop(heap)
+            if u == dst:
+                path = [u]
+                while path[-1] != src:
+                    path.append(parent[path[-1]])
+                return cost, path[::-1]
+            if closed[u]:
+                continue
+            closed[u] = 1
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                if closed[v]:
+                    continue
+                new_cost = cost + (weights[e] * penalties.get(v, 1.0) if penalties else weights[e])
+                if new_cost < g[v]:
+                    g[v] = new_cost
+                    parent[v] = u
+                    push(heap, (new_cost + h(v), new_cost, v))
+        return None
+
+    def shortest_tree(self, src, max_cost):
+        """
+        Dijkstra from `src`, stopped at `max_cost` meters: ({node: distance},
+        {node: parent}) for every node reached. Paths back to `src` follow
+        the parents (the graph is undirected, so they work both ways).
+        """
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        dist = {src: 0.0}
+        parent = {src: -1}
+        done = set()
+        heap = [(0.0, src)]
+        push, pop = heapq.heappush, heapq.heappop
+        while heap:
+            cost, u = pop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                new_cost = cost + weights[e]
+                if new_cost <= max_cost and new_cost < dist.get(v, math.inf):
+                    dist[v] = new_cost
+                    parent[v] = u
+                    push(heap, (new_cost, v))
+        return dist, parent
+
+    def stats(self):
+        with self._lock:
+            queries = self._hits + self._misses
+            return {
+                **self.graph.stats(),
+                "cached_routes": len(self._cache),
+                "cache_hits": self._hits,
+                "cache_misses": self._misses,
+                "avg_search_ms": round(self._search_ms / self._misses, 2) if self._misses else None,
+                "hit_rate": round(self._hits / queries, 3) if queries else None,
+            }
+
+    # --- route shaping ---
+
+    def path_length(self, path):
+        return sum(self.edge(u, v)[1] for u, v in zip(path, path[1:]))
+
+    def edge(self, u, v):
+        """(edge index, length) of the shortest edge u -> v."""
+        best = None
+        for e in range(self._indptr[u], self._indptr[u + 1]):
+            if self._indices[e] == v and (best is None or self._weights[e] < self._weights[best]):
+                best = e
+        return best, self._weights[best]
+
+    def _shared(self, path_a, path_b):
+        edges_b = {frozenset(pair) for pair in zip(path_b, path_b[1:])}
+        return sum(self.edge(u, v)[1] for u, v in zip(path_a, path_a[1:]) if frozenset((u, v)) in edges_b)
+
+    def to_route(self, path, route_id):
+        """A node path as a frontend route object, with one step per street."""
+        lats, lngs = self._lats, self._lngs
+        names = self.graph.way_names
+        coords = [{"lat": lats[n], "lng": lngs[n]} for n in path]
+
+        # Group consecutive edges on the same street into steps
+        groups = []
+        for u, v in zip(path, path[1:]):
+            e, length = self.edge(u, v)
+            name = names[self.graph.edge_way[e]]
+            if groups and groups[-1]["name"] == name:
+                groups[-1]["nodes"].append(v)
+                groups[-1]["distance"] += length
+            else:
+                groups.append({"name": name, "nodes": [u, v], "distance": length})
+
+        steps = []
+        for i, group in enumerate(groups):
+            nodes = group["nodes"]
+            if i == 0:
+                maneuver = {"type": "depart", "modifier": _compass(self.bearing(nodes[0], nodes[1]))}
+                instruction = f"Start walking {maneuver['modifier']} on {group['name'] or 'path'}"
+            else:
+                prev = groups[i - 1]["nodes"]
+                modifier = _turn(self.bearing(prev[-2], prev[-1]), self.bearing(nodes[0], nodes[1]))
+                maneuver = {"type": "turn", "modifier": modifier}
+                instruction = f"turn {modifier} {'along ' + group['name'] if group['name'] else ''}".strip()
+            steps.append(self._step(instruction, group["distance"], maneuver, group["name"], nodes))
+        end = path[-1]
+        steps.append(self._step("You have arrived", 0.0, {"type": "arrive"}, "", [end]))
+
+        distance = sum(step["distance"] for step in steps)
+        return {
+            "id": route_id,
+            "coords": coords,
+            "distance": round(distance, 1),
+            "duration": round(distance / WALKING_SPEED_MPS, 1),
+            "steps": steps,
+        }
+
+    def _step(self, instruction, distance, maneuver, name, nodes):
+        first = nodes[0]
+        maneuver["location"] = [self._lngs[first], self._lats[first]]
+        return {
+            "instruction": instruction,
+            "distance": round(distance, 1),
+            "maneuver": maneuver,
+            "name": name,
+            "location": {"lat": self._lats[first], "lng": self._lngs[first]},
+            "geometry": [{"lat": self._lats[n], "lng": self._lngs[n]} for n in nodes],
+        }
+
+    def bearing(self, u, v):
+        lat1, lat2 = math.radians(self._lats[u]), math.radians(self._lats[v])
+        dlng = math.radians(self._lngs[v] - self._lngs[u])
+        x = math.sin(dlng) * math.cos(lat2)
+        y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlng)
+        return math.degrees(math.atan2(x, y)) % 360
+
+
+def _compass(bearing):
+    return ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")[
+        int((bearing + 22.5) // 45) % 8]
+
+
+def _turn(bearing_in, bearing_out):
+    delta = (bearing_out - bearing_in + 180) % 360 - 180
+    side = "right" if delta > 0 else "left"
+    if abs(delta) < 20:
+        return "straight"
+    if abs(delta) < 60:
+        return f"slight {side}"
+    if abs(delta) < 140:
+        return side
+    return f"sharp {side}"
+
+
+# --- SHARED ROUTER ---
+# Loaded once from WALK_GRAPH_PATH (an .osm or Overpass .json extract). Without
+# it local routing is off and the frontend keeps using public OSRM.
+WALK_GRAPH_PATH = os.getenv("WALK_GRAPH_PATH")
+ROUTER = None
+if WALK_GRAPH_PATH:
+    try:
+        _started = time.perf_counter()
+        ROUTER = WalkRouter(load_walk_graph(WALK_GRAPH_PATH),
+                            cache_size=int(os.getenv("ROUTE_CACHE_SIZE", 512)))
+        print(f"✅ Walk graph loaded: {ROUTER.graph.stats()} in {time.perf_counter() - _started:.1f}s")
+    except Exception as e:
+        print(f"⚠️  Could not load walk graph from {WALK_GRAPH_PATH}: {e}")
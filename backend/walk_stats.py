@@ -0,0 +1,244 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import pyodbc
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Walk totals and streaks are kept in rollup tables (see tables.py, section L)
+# so the Profile / History pages read a handful of rows instead of summing
+# the whole history on the client:
+#
+# - WalkStatsDaily:  one row per user and day
+# - WalkStatsWeekly: one row per user and week (weeks start on Monday)
+# - WalkStatsTotals: one row per user - lifetime sums plus the current and
+#   best streak of consecutive walking days
+#
+# record_walk() folds each new walk in, in the same transaction as its
+# WalkHistory insert. Walks logged without a user roll up under UserKey 0.
+# Days are the server's local dates, like WalkDate itself.
+
+STAT_COLUMNS = ("Walks", "DistanceKm", "DurationMinutes", "CaloriesBurned", "PosesCompleted", "StepsEstimated")
+
+RECORD_WALK_SQL = """
+SET NOCOUNT ON;
+DECLARE @key INT = ?, @day DATE = ?, @week DATE = ?;
+DECLARE @distance FLOAT = ?, @minutes INT = ?, @calories INT = ?, @poses INT = ?, @steps INT = ?;
+
+MERGE WalkStatsDaily WITH (HOLDLOCK) AS t
+USING (SELECT @key AS UserKey, @day AS StatDate) AS s
+ON t.UserKey = s.UserKey AND t.StatDate = s.StatDate
+WHEN MATCHED THEN UPDATE SET
+    Walks = t.Walks + 1, DistanceKm = t.DistanceKm + @distance, DurationMinutes = t.DurationMinutes + @minutes,
+    CaloriesBurned = t.CaloriesBurned + @calories, PosesCompleted = t.PosesCompleted + @poses,
+    StepsEstimated = t.StepsEstimated + @steps
+WHEN NOT MATCHED THEN
+    INSERT (UserKey, StatDate, Walks, DistanceKm, DurationMinutes, CaloriesBurned, PosesCompleted, StepsEstimated)
+    VALUES (@key, @day, 1, @distance, @minutes, @calories, @poses, @steps);
+
+MERGE WalkStatsWeekly WITH (HOLDLOCK) AS t
+USING (SELECT @key AS UserKey, @week AS WeekStart) AS s
+ON t.UserKey = s.UserKey AND t.WeekStart = s.WeekStart
+WHEN MATCHED THEN UPDATE SET
+    Walks = t.Walks + 1, DistanceKm = t.DistanceKm + @distance, DurationMinutes = t.DurationMinutes + @minutes,
+    CaloriesBurned = t.CaloriesBurned + @calories, PosesCompleted = t.PosesCompleted + @poses,
+    StepsEstimated = t.StepsEstimated + @steps
+WHEN NOT MATCHED THEN
+    INSERT (UserKey, WeekStart, Walks, DistanceKm, DurationMinutes, CaloriesBurned, PosesCompleted, StepsEstimated)
+    VALUES (@key, @week, 1, @distance, @minutes, @calories, @poses, @steps);
+
+-- Streak: a walk the day after StreakEnd extends it, a later one restarts
+-- it, and one on (or before) StreakEnd leaves it as is
+DECLARE @end DATE, @streak INT;
+SELECT @end = StreakEnd, @streak = CurrentStreak
+FROM WalkStatsTotals WITH (UPDLOCK, HOLDLOCK) WHERE UserKey = @key;
+
+IF @end IS NULL
+    INSERT INTO WalkStatsTotals (UserKey, Walks, DistanceKm, DurationMinutes, CaloriesBurned, PosesCompleted,
+                                 StepsEstimated, FirstWalk, StreakEnd, CurrentStreak, BestStreak)
+    VALUES (@key, 1, @distance, @minutes, @calories, @poses, @steps, @day, @day, 1, 1);
+ELSE
+BEGIN
+    SET @streak = CASE
+        WHEN @day <= @end THEN @streak
+        WHEN @day = DATEADD(DAY, 1, @end) THEN @streak + 1
+        ELSE 1 END;
+    UPDATE WalkStatsTotals SET
+        Walks = Walks + 1, DistanceKm = DistanceKm + @distance, DurationMinutes = DurationMinutes + @minutes,
+        CaloriesBurned = CaloriesBurned + @calories, PosesCompleted = PosesCompleted + @poses,
+        StepsEstimated = StepsEstimated + @steps,
+        FirstWalk = CASE WHEN @day < FirstWalk THEN @day ELSE FirstWalk END,
+        StreakEnd = CASE WHEN @day > StreakEnd THEN @day ELSE StreakEnd END,
+        CurrentStreak = @streak,
+        BestStreak = CASE WHEN @streak > BestStreak THEN @streak ELSE BestStreak END
+    WHERE UserKey = @key;
+END
+
+-- The connection goes back to the pool, so leave the session as found
+SET NOCOUNT OFF;
+"""
+
+
+def user_key(user_id):
+    return user_id if user_id is not None else 0
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def record_walk(cursor, user_id, walk_date, distance_km, duration_minutes, calories, poses, steps):
+    """Adds one walk to the daily, weekly and lifetime rollups (one round-trip, caller's transaction)."""
+    day = walk_date.date() if isinstance(walk_date, datetime) else walk_date
+    cursor.execute(RECORD_WALK_SQL, user_key(user_id), day, week_start(day),
+                   distance_km, duration_minutes, calories, poses, steps)
+
+
+def read_stats(cursor, user_id=None, weeks=12, today=None):
+    """
+    Lifetime totals, streaks and the last `weeks` weeks (oldest first, empty
+    weeks filled with zeros) for one user. Two primary-key reads.
+    """
+    today = today or date.today()
+    key = user_key(user_id)
+    cursor.execute(f"""
+        SELECT {", ".join(STAT_COLUMNS)}, FirstWalk, StreakEnd, CurrentStreak, BestStreak
+        FROM WalkStatsTotals WHERE UserKey = ?
+    """, key)
+    row = cursor.fetchone()
+
+    first_week = week_start(today) - timedelta(weeks=weeks - 1)
+    cursor.execute(f"""
+        SELECT WeekStart, {", ".join(STAT_COLUMNS)}
+        FROM WalkStatsWeekly WHERE UserKey = ? AND WeekStart >= ?
+    """, key, first_week)
+    by_week = {_as_date(r.WeekStart): r for r in cursor.fetchall()}
+
+    weekly = []
+    for i in range(weeks):
+        start = first_week + timedelta(weeks=i)
+        r = by_week.get(start)
+        weekly.append({"week_start": start.isoformat(),
+                       **{column: (getattr(r, column) if r else 0) for column in STAT_COLUMNS}})
+
+    if row is None:
+        return {"lifetime": {column: 0 for column in STAT_COLUMNS}, "first_walk": None, "last_walk_day": None,
+                "current_streak": 0, "best_streak": 0, "weekly": weekly}
+
+    # A streak only counts as current if it ended today or yesterday
+    last_day = _as_date(row.StreakEnd)
+    current = row.CurrentStreak if last_day >= today - timedelta(days=1) else 0
+    return {
+        "lifetime": {column: getattr(row, column) for column in STAT_COLUMNS},
+        "first_walk": _as_date(row.FirstWalk).isoformat(),
+        "last_walk_day": last_day.isoformat(),
+        "current_streak": current,
+        "best_streak": row.BestStreak,
+        "weekly": weekly,
+    }
+
+
+def _as_date(value):
+    # pyodbc hands DATE columns back as date, some drivers as ISO strings
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+REBUILD_SQL = """
+SET NOCOUNT ON;
+DELETE FROM WalkStatsDaily;
+DELETE FROM WalkStatsWeekly;
+DELETE FROM WalkStatsTotals;
+
+INSERT INTO WalkStatsDaily (UserKey, StatDate, Walks, DistanceKm, DurationMinutes, CaloriesBurned,
+                            PosesCompleted, StepsEstimated)
+SELECT ISNULL(UserID, 0), CAST(WalkDate AS DATE), COUNT(*), ISNULL(SUM(DistanceKm), 0),
+       ISNULL(SUM(DurationMinutes), 0), ISNULL(SUM(CaloriesBurned), 0), ISNULL(SUM(PosesCompleted), 0),
+       ISNULL(SUM(StepsEstimated), 0)
+FROM WalkHistory
+WHERE WalkDate IS NOT NULL
+GROUP BY ISNULL(UserID, 0), CAST(WalkDate AS DATE);
+
+-- 1900-01-01 was a Monday, so this is the Monday on or before StatDate
+-- whatever DATEFIRST is set to
+INSERT INTO WalkStatsWeekly (UserKey, WeekStart, Walks, DistanceKm, DurationMinutes, CaloriesBurned,
+                             PosesCompleted, StepsEstimated)
+SELECT UserKey, WeekStart, SUM(Walks), SUM(DistanceKm), SUM(DurationMinutes), SUM(CaloriesBurned),
+       SUM(PosesCompleted), SUM(StepsEstimated)
+FROM (
+    SELECT *, DATEADD(DAY, -(DATEDIFF(DAY, '19000101', StatDate) % 7), StatDate) AS WeekStart
+    FROM WalkStatsDaily
+) AS d
+GROUP BY UserKey, WeekStart;
+
+-- Runs of consecutive days: StatDate minus its row number is constant within a run
+-- (ROW_NUMBER is BIGINT, which DATEADD does not accept)
+SELECT UserKey, COUNT(*) AS Length, MAX(StatDate) AS RunEnd
+INTO #runs
+FROM (
+    SELECT UserKey, StatDate,
+           DATEADD(DAY, -CAST(ROW_NUMBER() OVER (PARTITION BY UserKey ORDER BY StatDate) AS INT),
+                   StatDate) AS RunKey
+    FROM WalkStatsDaily
+) AS d
+GROUP BY UserKey, RunKey;
+
+INSERT INTO WalkStatsTotals (UserKey, Walks, DistanceKm, DurationMinutes, CaloriesBurned, PosesCompleted,
+                             StepsEstimated, FirstWalk, StreakEnd, CurrentStreak, BestStreak)
+SELECT t.UserKey, t.Walks, t.DistanceKm, t.DurationMinutes, t.CaloriesBurned, t.PosesCompleted,
+       t.StepsEstimated, t.FirstWalk, last_run.RunEnd, last_run.Length, best.Length
+FROM (
+    SELECT UserKey, SUM(Walks) AS Walks, SUM(DistanceKm) AS DistanceKm, SUM(DurationMinutes) AS DurationMinutes,
+           SUM(CaloriesBurned) AS CaloriesBurned, SUM(PosesCompleted) AS PosesCompleted,
+           SUM(CAST(StepsEstimated AS BIGINT)) AS StepsEstimated, MIN(StatDate) AS FirstWalk
+    FROM WalkStatsDaily GROUP BY UserKey
+) AS t
+CROSS APPLY (SELECT TOP 1 RunEnd, Length FROM #runs r WHERE r.UserKey = t.UserKey ORDER BY RunEnd DESC) AS last_run
+CROSS APPLY (SELECT MAX(Length) AS Length FROM #runs r WHERE r.UserKey = t.UserKey) AS best;
+
+DROP TABLE #runs;
+DECLARE @users INT = (SELECT COUNT(*) FROM WalkStatsTotals);
+SET NOCOUNT OFF;
+SELECT @users;
+"""
+
+
+def rebuild_stats(conn):
+    """
+    Recomputes every rollup from WalkHistory in one transaction and returns
+    the number of users. Walks already removed by the retention policy are
+    no longer in WalkHistory, so their share of the lifetime totals is lost.
+    """
+    cursor = conn.cursor()
+    cursor.execute(REBUILD_SQL)
+    users = cursor.fetchone()[0]
+    conn.commit()
+    return users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk stats rollups (WalkStatsDaily / Weekly / Totals)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from WalkHistory")
+    parser.add_argument("--user", type=int, help="print the stats of one user (0 = walks without a user)")
+    args = parser.parse_args()
+
+    CONN_STR = (
+        r'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={os.getenv("DB_SERVER")};'
+        f'DATABASE={os.getenv("DB_DATABASE")};'
+        f'UID={os.getenv("DB_USER")};'
+        f'PWD={os.getenv("DB_PASSWORD")};'
+    )
+    try:
+        print("🔌 Connecting to Database...")
+        conn = pyodbc.connect(CONN_STR)
+        if args.rebuild:
+            users = rebuild_stats(conn)
+            print(f"✅ Rebuilt walk stats for {users} user(s)")
+        if args.user is not None or not args.rebuild:
+            print(read_stats(conn.cursor(), args.user or None))
+        conn.close()
+    except Exception as e:
+        print(f"❌ Error: {e}")
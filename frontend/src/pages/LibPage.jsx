@@ -602,8 +602,19 @@ export default function LibPage() {
 
   function handleStartSavedRouteWalk(route) {
     if (!route) return;
-    navigate("/map", { state: { savedRoute: route } });
-    setSelectedSavedRoute(null);
+    // The list only carries summaries - load the full geometry on demand
+    fetch(`${API_BASE}/api/saved_routes/${route.id}`)
+      .then((res) => {
+        if (!res.ok) throw new Error("Failed to load saved route");
+        return res.json();
+      })
+      .then((fullRoute) => {
+        navigate("/map", { state: { savedRoute: fullRoute } });
+        setSelectedSavedRoute(null);
+      })
+      .catch((err) => {
+        console.error("[SavedRoutes Debug] Error loading saved route:", err);
+      });
   }
 
   // --- FILTERING ---
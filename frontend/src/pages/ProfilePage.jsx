@@ -30,15 +30,6 @@ export default function ProfilePage({ onChangePage }) {
       .then((data) => {
         const historyData = data.history || [];
         setHistory(historyData);
-        
-        const totalDist = historyData.reduce((acc, curr) => acc + (curr.DistanceKm || 0), 0);
-        const totalPoses = historyData.reduce((acc, curr) => acc + (curr.PosesCompleted || 0), 0);
-        
-        setStats({
-          walks: historyData.length,
-          km: totalDist.toFixed(1),
-          poses: totalPoses
-        });
         setLoading(false);
       })
       .catch((err) => {
@@ -47,6 +38,24 @@ export default function ProfilePage({ onChangePage }) {
       });
   }, []);
 
+  // Lifetime totals come from the server's rollups, not the (paged) history
+  useEffect(() => {
+    fetch(`${apiBase}/api/stats`)
+      .then((res) => {
+        if (!res.ok) throw new Error("Failed to fetch stats");
+        return res.json();
+      })
+      .then((data) => {
+        const lifetime = data.lifetime || {};
+        setStats({
+          walks: lifetime.Walks || 0,
+          km: (lifetime.DistanceKm || 0).toFixed(1),
+          poses: lifetime.PosesCompleted || 0
+        });
+      })
+      .catch((err) => console.error(err));
+  }, []);
+
   // Fetch walk reflections when a walk is selected
   useEffect(() => {
     if (selectedWalk) {
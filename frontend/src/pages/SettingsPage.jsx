@@ -1,6 +1,19 @@
 import { useState, useEffect } from "react";
 import BackIcon from "../icons/back.svg";
 
+// Subscriptions are stored per endpoint; the timezone lets reminders arrive
+// at the user's local time, and re-saving on load marks the device active.
+function saveSubscription(subscription) {
+  return fetch("http://127.0.0.1:5000/api/subscribe", {
+    method: "POST",
+    body: JSON.stringify({
+      ...subscription.toJSON(),
+      timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
+    }),
+    headers: { "Content-Type": "application/json" },
+  });
+}
+
 function Toggle({ checked, onChange }) {
   return (
     <label className="settingsToggle">
@@ -30,6 +43,7 @@ export default function SettingsPage({ onChangePage }) {
       navigator.serviceWorker.ready.then((registration) => {
         registration.pushManager.getSubscription().then((subscription) => {
           setDailyReminder(!!subscription);
+          if (subscription) saveSubscription(subscription).catch(() => {});
         });
       });
     }
@@ -69,11 +83,7 @@ export default function SettingsPage({ onChangePage }) {
       });
 
       // Send the subscription object to your backend
-      await fetch("http://127.0.0.1:5000/api/subscribe", {
-        method: "POST",
-        body: JSON.stringify(subscription),
-        headers: { "Content-Type": "application/json" },
-      });
+      await saveSubscription(subscription);
 
       setDailyReminder(true);
       alert("Daily reminders enabled! 🌿");